@@ -0,0 +1,86 @@
+"""
+Conditional GET for model viewsets
+Lists and details are validated against `updated_at` before anything is
+serialized, so unchanged resources are answered with 304 Not Modified.
+Lists are validated by ETag only.
+"""
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for `list` and `retrieve`
+
+    The list validator is MAX(updated_at) plus the row count of the filtered
+    queryset, the count catching deletions that leave the maximum untouched.
+    Lists get no Last-Modified: a date alone would miss those deletions, and
+    changes made within the second of the previous response.
+    The detail validator is the object's updated_at. ETags are weak since
+    the same data may be rendered in several formats. Views whose payload
+    embeds other models add their state with `extra_validator` and
+    `last_modified_of`.
+    """
+
+    updated_field = 'updated_at'
+
+    def extra_validator(self):
+        """Part of every validator for data the payload embeds from elsewhere"""
+        return ''
+
+    def last_modified_of(self, instance):
+        return getattr(instance, self.updated_field)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_list(
+            request,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs),
+        )
+
+    def conditional_list(self, request, build):
+        """Answer 304 if the filtered queryset is unchanged, otherwise the response of `build()`"""
+        validator = self.filter_queryset(self.get_queryset()).aggregate(
+            last_modified=Max(self.updated_field),
+            count=Count('pk'),
+        )
+        last_modified = validator['last_modified']
+        return self._conditional(
+            request,
+            f"{last_modified and last_modified.isoformat()}:{validator['count']}:{self.extra_validator()}",
+            None,
+            build,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = self.last_modified_of(instance)
+        return self._conditional(
+            request,
+            f'{instance.pk}:{last_modified.isoformat()}:{self.extra_validator()}',
+            last_modified,
+            lambda: Response(self.get_serializer(instance).data),
+        )
+
+    def _conditional(self, request, validator, last_modified, build):
+        # Representations differ per query string (filters, pages, formats)
+        digest = hashlib.md5(
+            f'{self.basename}:{request.get_full_path()}:{validator}'.encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        etag = f'W/"{digest}"'
+        # HTTP dates have a one second resolution, the ETag catches the rest
+        last_modified = last_modified and int(last_modified.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = build()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -0,0 +1,97 @@
+"""
+Per-request SQL instrumentation
+"""
+
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# QueryStats of the request being handled. A context variable rather than
+# a wrapper entered around the request: connections belong to a thread,
+# and under ASGI sync views run in a worker thread that inherits the
+# request's context but not its connections
+_current_stats = ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    """execute_wrapper counting the queries run and the time spent in the database"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def count_queries(execute, sql, params, many, context):
+    """execute_wrapper adding each query to the QueryStats of the current request, if any"""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver installing count_queries on every connection"""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+class QueryCountMiddleware:
+    """
+    Records the number of SQL queries and the database time of each request
+
+    Both are stored on the response as `query_count` and `query_time` (in
+    seconds), which tests use to enforce per-endpoint query budgets, and
+    sent as X-DB-Query-Count / X-DB-Time-Ms headers when
+    QUERY_COUNT_HEADERS is enabled (defaults to DEBUG).
+
+    Queries are counted by count_queries, which install_query_counter puts
+    on every connection. The middleware runs natively under ASGI too, so
+    async views and streams are not forced through a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._record(response, stats)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._record(response, stats)
+
+    def _record(self, response, stats):
+        response.query_count = stats.count
+        response.query_time = stats.duration
+        if getattr(settings, 'QUERY_COUNT_HEADERS', settings.DEBUG):
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f'{stats.duration * 1000:.2f}'
+        return response
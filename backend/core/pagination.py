@@ -0,0 +1,171 @@
+"""
+Keyset (cursor) pagination
+Pages are fetched with WHERE (ordering) > (last row) instead of OFFSET, so
+every page costs the same however deep it is. Pagination is opt-in: lists
+stay the plain arrays existing clients read unless a page is asked for.
+"""
+
+import base64
+import binascii
+import json
+import operator
+from datetime import date, datetime, time
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the full ordering of the queryset
+
+    The ordering is the view's `ordering` attribute, or the model's
+    Meta.ordering, with the primary key appended as a tie-breaker. The
+    cursor stores the ordering values of the last row of the page, so it
+    should be backed by a composite index on the same columns.
+
+    Requests with neither `page_size` nor `cursor` are not paginated and
+    get the bare array of every row; the first page is ?page_size=<n>.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, queryset, view):
+        ordering = list(getattr(view, 'ordering', None) or queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering.append('id')
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def is_requested(self, request):
+        return any(
+            request.query_params.get(param)
+            for param in (self.page_size_query_param, self.cursor_query_param)
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return self.paginate(queryset, request, view)
+
+    def paginate(self, queryset, request, view=None):
+        """The page of `queryset` the request asks for, the first page without a cursor"""
+        self.request = request
+        self.ordering = self.get_ordering(queryset, view)
+        self.model = queryset.model
+        page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        reverse = False
+        if cursor is not None:
+            reverse, values = cursor
+            queryset = queryset.filter(self._after(values, reverse))
+
+        ordering = [self._flip(field) for field in self.ordering] if reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _field(self, name):
+        name = name.lstrip('-')
+        return self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+
+    def _after(self, values, reverse):
+        """Rows strictly after `values` in the ordering (before them when reverse)"""
+        conditions = []
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            conditions.append(equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value}))
+            equal &= Q(**{name: value})
+        return reduce(operator.or_, conditions)
+
+    def encode_cursor(self, row, reverse):
+        cursor = self.cursor_token(row, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def cursor_token(self, row, reverse):
+        """Cursor value of `row`, for links built on another URL"""
+        values = []
+        for field in self.ordering:
+            attname = self._field(field).attname
+            # Rows are model instances or .values() dicts (see core.rows)
+            value = row[attname] if isinstance(row, dict) else getattr(row, attname)
+            if isinstance(value, (date, datetime, time)):
+                value = value.isoformat()
+            values.append(value)
+        payload = json.dumps({'r': int(reverse), 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values = [
+                self._field(field).to_python(value)
+                for field, value in zip(self.ordering, payload['v'], strict=True)
+            ]
+            return bool(payload['r']), values
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,182 @@
+"""
+Serializer-free read paths
+A RowMapper is compiled once from a serializer class: it knows which
+.values() columns the serializer reads and converts each one the way the
+serializer field would, so hot lists skip model instantiation and
+per-field serializer dispatch while returning the very same payload.
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+# How a step reads the row
+COLUMN, DATETIME, NESTED, COMPUTED = range(4)
+
+
+def _identity(value):
+    return value
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _is_iso(field, default):
+    output_format = getattr(field, 'format', default)
+    return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+
+def _is_plain_datetime(field):
+    """DateTimeField output is only the current time zone's isoformat()"""
+    return (
+        isinstance(field, serializers.DateTimeField)
+        and not hasattr(field, 'timezone')
+        and _is_iso(field, api_settings.DATETIME_FORMAT)
+    )
+
+
+def _current_timezone():
+    # What DateTimeField.default_timezone() returns, looked up once per batch
+    return timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def _converter(field):
+    """Equivalent of field.to_representation for the non-null values of a column"""
+    if isinstance(field, (
+        serializers.CharField,
+        serializers.IntegerField,
+        serializers.BooleanField,
+        serializers.ReadOnlyField,
+    )):
+        # The column already holds what the field would output
+        return _identity
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        # Read from the foreign key column, not the related object
+        return _identity
+    if isinstance(field, serializers.DateField) and _is_iso(field, api_settings.DATE_FORMAT):
+        return _isoformat
+    if isinstance(field, serializers.TimeField) and _is_iso(field, api_settings.TIME_FORMAT):
+        return _isoformat
+    return field.to_representation
+
+
+class RowMapper:
+    """
+    Builds the payload of `serializer_class` from .values() rows
+
+    Model fields and foreign keys map to columns, nested serializers of
+    related models to joined columns (None when the key is null). Other
+    fields, such as annotations, are read from the row under their own
+    name unless `computed` gives a function of the row for them, as model
+    properties need.
+    """
+
+    def __init__(self, serializer_class, computed=None):
+        self.serializer_class = serializer_class
+        self.computed = computed or {}
+        self._columns = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self):
+        """Names to pass to .values()"""
+        self._compile()
+        return self._columns
+
+    def map(self, row):
+        self._compile()
+        return self._map(row, _current_timezone())
+
+    def map_many(self, rows):
+        self._compile()
+        map_row = self._map
+        field_timezone = _current_timezone()
+        return [map_row(row, field_timezone) for row in rows]
+
+    def _compile(self):
+        # Serializer fields are introspected on first use, once models are loaded
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    columns = []
+                    map_row = _compile(self.serializer_class(), '', columns, self.computed)
+                    self._columns = columns
+                    self._map = map_row
+
+
+def _compile(serializer, prefix, columns, computed):
+    model = serializer.Meta.model
+    steps = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in computed:
+            steps.append((COMPUTED, name, None, computed[name]))
+            continue
+
+        if isinstance(field, serializers.BaseSerializer):
+            related = model._meta.get_field(field.source).related_model
+            nested = _compile(field, f'{prefix}{field.source}__', columns, {})
+            steps.append((NESTED, name, f'{prefix}{field.source}__{related._meta.pk.name}', nested))
+            continue
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = None
+        source = model_field.attname if model_field is not None and model_field.concrete else field.source
+        columns.append(f'{prefix}{source}')
+        if _is_plain_datetime(field):
+            steps.append((DATETIME, name, f'{prefix}{source}', field.to_representation))
+        else:
+            steps.append((COLUMN, name, f'{prefix}{source}', _converter(field)))
+
+    def map_row(row, field_timezone):
+        data = {}
+        for kind, name, key, convert in steps:
+            if kind == COLUMN:
+                value = row[key]
+                data[name] = None if value is None else convert(value)
+            elif kind == DATETIME:
+                value = row[key]
+                if value is None:
+                    data[name] = None
+                elif field_timezone is not None and value.tzinfo is not None:
+                    value = value.astimezone(field_timezone).isoformat()
+                    data[name] = value[:-6] + 'Z' if value.endswith('+00:00') else value
+                else:
+                    # Naive values and USE_TZ = False, as DateTimeField handles them
+                    data[name] = convert(value)
+            elif kind == NESTED:
+                data[name] = None if row[key] is None else convert(row, field_timezone)
+            else:
+                data[name] = convert(row)
+        return data
+
+    return map_row
+
+
+class ValuesListMixin:
+    """
+    `list` built from .values() rows by `row_mapper` instead of the serializer
+
+    Filtering and pagination apply as usual, the paginator gets dict rows,
+    so the ordering fields must be among the mapper's columns.
+    """
+
+    row_mapper = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.row_mapper.columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.row_mapper.map_many(page))
+        return Response(self.row_mapper.map_many(queryset))
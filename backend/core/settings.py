@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,9 +83,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds a writer waits for the database lock before failing
+            # with "database is locked" when several workers write at once
+            'timeout': 20,
+        },
+        'TEST': {
+            # A file, unlike the shared in-memory database, lets concurrent
+            # test connections wait for each other
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# BEGIN IMMEDIATE takes the write lock when a transaction starts, so every
+# atomic block, read-only ones included, waits for the other writers. Only
+# worth it for write-heavy runs (load tests) that hit "database is locked"
+# on transactions that read before writing.
+if os.environ.get('SQLITE_TRANSACTION_MODE'):
+    DATABASES['default']['OPTIONS']['transaction_mode'] = os.environ['SQLITE_TRANSACTION_MODE']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -104,6 +123,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds the response cache payloads (matches/cache.py). Their version
+# counters live in the database, so the default local memory cache stays
+# correct with several processes, each just warms its own copy. Use
+# FileBasedCache to share payloads between the workers of one node, or
+# RedisCache for several nodes, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://localhost:6379/1
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'serpens-scout'),
+    }
+}
+
+# Cache alias of the versioned response cache (matches/cache.py) and how
+# long an unused payload is kept; payloads are invalidated by version bumps,
+# which every process reads from the database
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -135,6 +178,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Changed for public access
     ],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # CORS Configuration
@@ -145,5 +193,29 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Send X-DB-Query-Count / X-DB-Time-Ms headers (core.middleware.QueryCountMiddleware)
+QUERY_COUNT_HEADERS = DEBUG
+
+# Serve ranking positions from the in-process leaderboard index
+# (matches/rank_index.py), falling back to database queries when disabled
+LEADERBOARD_INDEX_ENABLED = True
+
 # Optional: Football API Key (get from api-football.com)
 FOOTBALL_API_KEY = None  # Set your API key here when you have one
+
+# (league, season) pairs fetched concurrently by matches.external_api.FootballAPI
+FOOTBALL_API_LEAGUES = [
+    (71, 2024),  # Brasileirão Série A
+]
+
+# On-disk cache of Football API responses (matches/api_cache.py), None to
+# disable. The free tier allows 100 requests a day, the budget keeps a
+# margin for manual checks; fixtures responses stay fresh for 15 minutes,
+# live scores (matches/live.py) for one. The live poller spreads what the
+# scheduled syncs leave of the budget over the day's games.
+FOOTBALL_API_CACHE_DIR = os.environ.get('FOOTBALL_API_CACHE_DIR', BASE_DIR / 'api_cache')
+FOOTBALL_API_DAILY_BUDGET = 90
+FOOTBALL_API_CACHE_TTLS = {
+    'fixtures': 15 * 60,
+    'fixtures:live': 60,
+}
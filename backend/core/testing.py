@@ -0,0 +1,22 @@
+"""
+Test helpers
+"""
+
+
+class QueryBudgetMixin:
+    """
+    Assertions on the query count recorded by QueryCountMiddleware
+
+    Budgets are checked at two table sizes so that a list endpoint doing
+    one query per row fails even if it fits the budget on a small table.
+    """
+
+    def assertQueryBudget(self, path, budget, params=None):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, path)
+        self.assertLessEqual(
+            response.query_count,
+            budget,
+            f'{path} ran {response.query_count} queries, budget is {budget}',
+        )
+        return response
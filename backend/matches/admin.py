@@ -1,3 +1,48 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Match, SyncJob, Team, TeamAlias
+from .settlement import settle_edited_match, settle_matches
+
+
+class TeamAliasInline(admin.TabularInline):
+    model = TeamAlias
+    extra = 1
+
+
+@admin.register(Team)
+class TeamAdmin(admin.ModelAdmin):
+    list_display = ['name', 'short_name', 'slug']
+    search_fields = ['name', 'short_name', 'aliases__name']
+    inlines = [TeamAliasInline]
+
+
+@admin.register(Match)
+class MatchAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'competition', 'status', 'home_score', 'away_score']
+    list_filter = ['status', 'competition']
+    search_fields = ['home_team', 'away_team', 'external_id']
+    list_select_related = ['home_team_ref', 'away_team_ref']
+    raw_id_fields = ['home_team_ref', 'away_team_ref']
+    actions = ['settle_predictions']
+
+    def save_model(self, request, obj, form, change):
+        # The form has already applied the new values to obj
+        previous_outcome = Match.objects.get(pk=obj.pk).result if change else None
+        super().save_model(request, obj, form, change)
+        settle_edited_match(obj, previous_outcome)
+
+    @admin.action(description='Settle predictions of selected finished matches')
+    def settle_predictions(self, request, queryset):
+        results = settle_matches(queryset.filter(status='finished'))
+        settled = sum(result['settled'] for result in results)
+        self.message_user(
+            request,
+            f'{len(results)} matches settled, {settled} predictions scored.'
+        )
+
+
+@admin.register(SyncJob)
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'date_from', 'date_to', 'fetched', 'created', 'updated', 'settled', 'requested_at', 'finished_at']
+    list_filter = ['window', 'status']
+    readonly_fields = [field.name for field in SyncJob._meta.fields]
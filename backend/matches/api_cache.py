@@ -0,0 +1,173 @@
+"""
+On-disk cache of external football API responses
+Keeps the daily request quota of the api-football free tier: fresh entries
+are served without a request, expired ones are revalidated with their ETag,
+and once the day's budget is spent callers get the cached data or an error.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Seconds a response stays fresh, per endpoint or TTL key (see FootballAPI._get)
+DEFAULT_TTLS = {
+    'fixtures': 15 * 60,
+    'fixtures:live': 60,
+}
+DEFAULT_TTL = 60 * 60
+
+COUNTERS = ['requests', 'hits', 'misses', 'revalidated', 'stale', 'refused']
+
+
+def _write_json(path, data):
+    """Write atomically so concurrent readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class APIResponseCache:
+    """
+    Responses and daily usage counters stored as JSON files under `directory`
+
+    The quota day follows UTC, as api-football's does. Counters are shared
+    by every process using the same directory, their updates hold an
+    exclusive lock on a file next to them (a per-process lock where fcntl
+    is not available).
+    """
+
+    def __init__(self, directory, daily_budget=90, ttls=None):
+        self.directory = Path(directory)
+        self.daily_budget = daily_budget
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        """Cache configured by FOOTBALL_API_CACHE_DIR, None when it is unset"""
+        directory = getattr(settings, 'FOOTBALL_API_CACHE_DIR', None)
+        if not directory:
+            return None
+        return cls(
+            directory,
+            daily_budget=getattr(settings, 'FOOTBALL_API_DAILY_BUDGET', 90),
+            ttls=getattr(settings, 'FOOTBALL_API_CACHE_TTLS', None),
+        )
+
+    # Responses
+
+    def _entry_path(self, endpoint, params):
+        key = json.dumps([endpoint, sorted((str(k), str(v)) for k, v in params.items())])
+        return self.directory / 'responses' / f'{hashlib.sha256(key.encode()).hexdigest()}.json'
+
+    def get(self, endpoint, params):
+        """Cached entry {'fetched_at', 'etag', 'body'} or None"""
+        return _read_json(self._entry_path(endpoint, params))
+
+    def is_fresh(self, endpoint, entry, now=None):
+        ttl = self.ttls.get(endpoint, DEFAULT_TTL)
+        return (now or time.time()) - entry['fetched_at'] < ttl
+
+    def store(self, endpoint, params, body, etag=None):
+        _write_json(self._entry_path(endpoint, params), {
+            'fetched_at': time.time(),
+            'etag': etag,
+            'body': body,
+        })
+
+    def touch(self, endpoint, params, entry):
+        """Mark an entry revalidated by a 304"""
+        self.store(endpoint, params, entry['body'], entry['etag'])
+
+    # Usage
+
+    @staticmethod
+    def _today():
+        return datetime.now(dt_timezone.utc).date()
+
+    def _usage_path(self, day):
+        return self.directory / f'usage-{day.isoformat()}.json'
+
+    def _usage(self, day):
+        usage = _read_json(self._usage_path(day)) or {}
+        return {name: usage.get(name, 0) for name in COUNTERS}
+
+    @contextmanager
+    def _usage_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(self.directory / 'usage.lock', 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _update_usage(self, update):
+        # Read-modify-write, two workers must not reserve the same request
+        with self._usage_lock():
+            day = self._today()
+            usage = self._usage(day)
+            result = update(usage)
+            _write_json(self._usage_path(day), usage)
+            return result
+
+    def count(self, counter):
+        def update(usage):
+            usage[counter] += 1
+        self._update_usage(update)
+
+    def reserve_request(self):
+        """Count a request against today's budget, False when it is spent"""
+        def update(usage):
+            if usage['requests'] >= self.daily_budget:
+                usage['refused'] += 1
+                return False
+            usage['requests'] += 1
+            return True
+        return self._update_usage(update)
+
+    def sync_quota(self, limit, remaining):
+        """Align the request counter with the server's rate limit headers"""
+        def update(usage):
+            usage['requests'] = max(usage['requests'], limit - remaining)
+        self._update_usage(update)
+
+    def stats(self):
+        day = self._today()
+        usage = self._usage(day)
+        tomorrow = datetime.combine(day + timedelta(days=1), datetime.min.time(), dt_timezone.utc)
+        return {
+            'date': day.isoformat(),
+            'budget': self.daily_budget,
+            'remaining': max(self.daily_budget - usage['requests'], 0),
+            'resets_at': tomorrow.isoformat(),
+            **usage,
+        }
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class MatchesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'matches'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from core.middleware import install_query_counter
+
+        from . import signals  # noqa: F401
+
+        connection_created.connect(install_query_counter)
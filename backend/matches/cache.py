@@ -0,0 +1,117 @@
+"""
+Versioned response cache
+Payloads are stored under per-namespace version keys; every write bumps the
+version of its namespace, so a cached payload is never served after the
+data it was built from changed, whatever its timeout. The versions live in
+the database (CacheVersion), so bumps made by the sync_worker and
+live_poller processes reach every web process whatever the cache backend;
+payloads may stay in a per-process cache.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+
+# Namespaces and the models whose writes bump them
+MATCHES = 'matches'
+TEAMS = 'teams'
+PREDICTIONS = 'predictions'
+STATS = 'stats'
+
+PAYLOAD_KEY = 'payload:{}:{}:{}'
+
+# Versions pinned for the rest of a block by versions_snapshot
+_snapshot = contextvars.ContextVar('cache_versions', default=None)
+
+
+def get_cache():
+    """Cache holding the payloads, see RESPONSE_CACHE_ALIAS"""
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _create_version(namespace):
+    # Start from the clock so a recreated version never reuses an old number
+    try:
+        with transaction.atomic():
+            CacheVersion.objects.create(name=namespace, version=int(time.time() * 1000))
+    except IntegrityError:
+        pass
+
+
+def get_versions(*namespaces):
+    """Current versions of `namespaces`, in order, read with one query"""
+    snapshot = _snapshot.get()
+    if snapshot is not None and all(namespace in snapshot for namespace in namespaces):
+        return [snapshot[namespace] for namespace in namespaces]
+    versions = dict(CacheVersion.objects.filter(name__in=namespaces).values_list('name', 'version'))
+    missing = [namespace for namespace in namespaces if namespace not in versions]
+    if missing:
+        for namespace in missing:
+            _create_version(namespace)
+        versions.update(CacheVersion.objects.filter(name__in=missing).values_list('name', 'version'))
+    return [versions[namespace] for namespace in namespaces]
+
+
+def get_version(namespace):
+    return get_versions(namespace)[0]
+
+
+@contextmanager
+def versions_snapshot(*namespaces):
+    """Read the versions of `namespaces` once for a block building several payloads, yielding them"""
+    versions = get_versions(*namespaces)
+    token = _snapshot.set(dict(zip(namespaces, versions)))
+    try:
+        yield versions
+    finally:
+        _snapshot.reset(token)
+
+
+def increment_version(namespace):
+    """Add one to a version and return the new value, atomically across processes"""
+    with transaction.atomic():
+        if not CacheVersion.objects.filter(name=namespace).update(version=F('version') + 1):
+            _create_version(namespace)
+            CacheVersion.objects.filter(name=namespace).update(version=F('version') + 1)
+        # The row stays locked by the UPDATE until commit, this reads our value
+        return CacheVersion.objects.values_list('version', flat=True).get(name=namespace)
+
+
+def _bump(namespaces):
+    namespaces = set(namespaces)
+    updated = CacheVersion.objects.filter(name__in=namespaces).update(version=F('version') + 1)
+    if updated < len(namespaces):
+        # Namespaces never read yet start from the clock, already past any old payload
+        for namespace in namespaces:
+            _create_version(namespace)
+
+
+def bump_version(*namespaces):
+    """Invalidate the payloads of the namespaces once the current transaction commits"""
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def cached_payload(namespace, key, build, depends_on=()):
+    """
+    Return the payload cached for `key` in `namespace`, building it on a miss
+
+    `build` must return plain data (lists, dicts, strings, numbers). The
+    versions of `depends_on`, namespaces of data the payload embeds, are
+    part of the key too.
+    """
+    cache = get_cache()
+    versions = ':'.join(str(version) for version in get_versions(namespace, *depends_on))
+    cache_key = PAYLOAD_KEY.format(namespace, versions, key)
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = build()
+        cache.set(cache_key, payload, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return payload
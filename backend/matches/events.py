@@ -0,0 +1,147 @@
+"""
+Live event broadcast (server-sent events)
+One pump per process polls the (updated_at, id) indexes for changed matches
+and user stats while anyone is subscribed, and fans each change out to the
+subscribers' queues as a preformatted SSE message. An idle connection costs
+one small queue and a sleeping coroutine.
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .leaderboard import user_position
+from .models import Match, UserStats
+from .serializers import MatchSerializer, RankedUserStatsSerializer
+
+
+SCORES = 'scores'
+LEADERBOARD = 'leaderboard'
+TOPICS = (SCORES, LEADERBOARD)
+
+# Rows committed this long after their updated_at was set are still caught
+OVERLAP = timedelta(seconds=5)
+
+# Beyond this many changed rows (e.g. a settled match or a season sync)
+# clients are told to reload instead
+MAX_EVENT_ROWS = 50
+
+
+def format_event(topic, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'event: {topic}\ndata: {payload}\n\n'.encode()
+
+
+class Subscription:
+    def __init__(self, topics, queue_size):
+        self.topics = frozenset(topics)
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message):
+        """Queue a message; a subscriber too slow to keep up is sent None and dropped"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return False
+
+
+class Broadcaster:
+    """In-process fan-out of change events to SSE subscribers"""
+
+    def __init__(self, poll_interval=1.0, queue_size=100):
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._task = None
+        self._sent = {}
+        self._watermark = None
+        # The pump's queries run on one thread, holding one database connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='broadcaster')
+
+    def subscribe(self, topics=TOPICS):
+        subscription = Subscription(topics, self.queue_size)
+        self.subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._watermark = timezone.now()
+            self._task = asyncio.get_running_loop().create_task(self._pump())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def publish(self, topic, data):
+        """Send an event to the subscribers of `topic`, serialized once for all"""
+        message = format_event(topic, data)
+        for subscription in list(self.subscribers):
+            if topic in subscription.topics and not subscription.push(message):
+                self.subscribers.discard(subscription)
+
+    async def _pump(self):
+        while self.subscribers:
+            await asyncio.sleep(self.poll_interval)
+            loop = asyncio.get_running_loop()
+            try:
+                events = await loop.run_in_executor(self._executor, self._collect_on_executor)
+            except DatabaseError:
+                continue  # Retried on the next tick
+            for topic, data in events:
+                self.publish(topic, data)
+
+    def _collect_on_executor(self):
+        # Like a request would, drop a connection that broke or outlived CONN_MAX_AGE
+        close_old_connections()
+        return self.collect()
+
+    def _unsent(self, queryset, since):
+        """Rows updated since `since` that were not published yet"""
+        rows = []
+        for row in queryset.filter(updated_at__gte=since).order_by('updated_at', 'id'):
+            key = (row._meta.label_lower, row.pk)
+            if self._sent.get(key) != row.updated_at:
+                self._sent[key] = row.updated_at
+                rows.append(row)
+        return rows
+
+    def collect(self, now=None):
+        """(topic, data) events for the rows changed since the last call"""
+        now = now or timezone.now()
+        since = (self._watermark or now) - OVERLAP
+        self._watermark = now
+        self._sent = {key: updated_at for key, updated_at in self._sent.items() if updated_at >= since}
+
+        events = []
+        matches = self._unsent(Match.objects.with_teams(), since)
+        if len(matches) > MAX_EVENT_ROWS:
+            events.append((SCORES, {'reload': True, 'changed': []}))
+        elif matches:
+            events.append((SCORES, {
+                'reload': False,
+                'changed': MatchSerializer(matches, many=True).data,
+            }))
+
+        users = self._unsent(UserStats.objects.all(), since)
+        if len(users) > MAX_EVENT_ROWS:
+            events.append((LEADERBOARD, {'reload': True, 'changed': []}))
+        elif users:
+            for user in users:
+                user.position, user.dense_position = user_position(user.user_email) or (None, None)
+            events.append((LEADERBOARD, {
+                'reload': False,
+                'changed': RankedUserStatsSerializer(users, many=True).data,
+            }))
+        return events
+
+
+broadcaster = Broadcaster()
@@ -0,0 +1,202 @@
+"""
+Bulk exports
+Full snapshots of predictions, matches and the ranking as CSV or NDJSON,
+read with .iterator() (a server-side cursor on PostgreSQL) and written
+chunk by chunk, optionally gzipped on the fly, so memory stays constant
+however many rows are exported. Used by the export_data command and the
+/api/exports/ endpoint.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time
+
+from django.utils import timezone
+
+from core.streaming import batched
+
+from .leaderboard import ranked_queryset
+from .models import Match, Prediction
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per round trip and written per chunk
+CHUNK_SIZE = 5000
+
+
+class ExportError(Exception):
+    pass
+
+
+def _isoformat(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+# Dataset: (queryset, {column: lookup}, {filter: lookup}). Matches are
+# filtered on their own fields, predictions on their match's.
+DATASETS = {
+    'predictions': (
+        lambda: Prediction.objects.order_by('id'),
+        {
+            'id': 'id',
+            'user_name': 'user_name',
+            'user_email': 'user_email',
+            'match_id': 'match_id',
+            'competition': 'match__competition',
+            'match_date': 'match__match_date',
+            'home_team': 'match__home_team',
+            'away_team': 'match__away_team',
+            'match_status': 'match__status',
+            'home_score': 'match__home_score',
+            'away_score': 'match__away_score',
+            'prediction': 'prediction',
+            'confidence': 'confidence',
+            'is_correct': 'is_correct',
+            'points_earned': 'points_earned',
+            'created_at': 'created_at',
+        },
+        {'competition': 'match__competition', 'date': 'match__match_date', 'status': 'match__status'},
+    ),
+    'matches': (
+        lambda: Match.objects.order_by('id'),
+        {
+            'id': 'id',
+            'external_id': 'external_id',
+            'competition': 'competition',
+            'match_date': 'match_date',
+            'match_time': 'match_time',
+            'kickoff_at': 'kickoff_at',
+            'home_team': 'home_team',
+            'away_team': 'away_team',
+            'home_team_id': 'home_team_ref_id',
+            'away_team_id': 'away_team_ref_id',
+            'status': 'status',
+            'home_score': 'home_score',
+            'away_score': 'away_score',
+            'updated_at': 'updated_at',
+        },
+        {'competition': 'competition', 'date': 'match_date', 'status': 'status'},
+    ),
+    'ranking': (
+        ranked_queryset,
+        {
+            'position': 'position',
+            'dense_position': 'dense_position',
+            'id': 'id',
+            'user_name': 'user_name',
+            'user_email': 'user_email',
+            'total_predictions': 'total_predictions',
+            'correct_predictions': 'correct_predictions',
+            'total_points': 'total_points',
+            'updated_at': 'updated_at',
+        },
+        {},
+    ),
+}
+
+
+class Export:
+    """
+    An export as an iterable of bytes chunks
+
+    Filters: competition, date_from and date_to (match dates, inclusive)
+    and finished (finished matches only); the ranking takes none. `rows`
+    counts the rows written so far.
+    """
+
+    def __init__(self, dataset, export_format='csv', compress=False, chunk_size=CHUNK_SIZE,
+                 competition=None, date_from=None, date_to=None, finished=False):
+        if dataset not in DATASETS:
+            raise ExportError(f"Unknown dataset, use one of {', '.join(DATASETS)}")
+        if export_format not in FORMATS:
+            raise ExportError(f"Unknown format, use one of {', '.join(FORMATS)}")
+
+        queryset, self.columns, filters = DATASETS[dataset]
+        self.queryset = queryset()
+        requested = [
+            ('competition', '', competition),
+            ('date', '__gte', date_from),
+            ('date', '__lte', date_to),
+            ('status', '', 'finished' if finished else None),
+        ]
+        for name, lookup, value in requested:
+            if value is None:
+                continue
+            if name not in filters:
+                raise ExportError(f'The {dataset} export takes no filters')
+            self.queryset = self.queryset.filter(**{filters[name] + lookup: value})
+
+        self.dataset = dataset
+        self.export_format = export_format
+        self.compress = compress
+        self.chunk_size = chunk_size
+        self.rows = 0
+
+    @property
+    def content_type(self):
+        return 'application/gzip' if self.compress else FORMATS[self.export_format]
+
+    @property
+    def filename(self):
+        suffix = '.gz' if self.compress else ''
+        return f'{self.dataset}-{timezone.localdate().isoformat()}.{self.export_format}{suffix}'
+
+    def _rows(self):
+        return self.queryset.values_list(*self.columns.values()).iterator(chunk_size=self.chunk_size)
+
+    def _batches(self):
+        return batched(self._rows(), self.chunk_size)
+
+    def _csv(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(self.columns)
+        for batch in self._batches():
+            # ISO 8601 with a 'T', as in the NDJSON export
+            writer.writerows(
+                [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                for row in batch
+            )
+            self.rows += len(batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def _ndjson(self):
+        columns = list(self.columns)
+        if orjson is not None:
+            dumps = orjson.dumps
+        else:
+            def dumps(data):
+                return json.dumps(data, default=_isoformat, ensure_ascii=False, separators=(',', ':')).encode()
+        for batch in self._batches():
+            self.rows += len(batch)
+            yield b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in batch)
+
+    def __iter__(self):
+        chunks = self._csv() if self.export_format == 'csv' else self._ndjson()
+        if not self.compress:
+            yield from chunks
+            return
+        # wbits=31 writes a gzip container
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
@@ -3,21 +3,106 @@ External Football API Integration
 Uses free API data from multiple sources
 """
 
-import requests
+import asyncio
+import random
+import time
 from datetime import datetime, timedelta
+
+import requests
 from django.conf import settings
+from django.utils.http import parse_http_date_safe
+from requests.adapters import HTTPAdapter
+
+from .api_cache import APIResponseCache
+
+
+DEFAULT_BASE_URL = "https://v3.football.api-sports.io"
+
+# (league, season) pairs fetched by default; league 71 = Brasileirão Série A
+DEFAULT_LEAGUES = [(71, 2024)]
+
+# Responses worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FootballAPIError(Exception):
+    """The external API could not be reached or answered with an error"""
+
+
+class FootballAPIQuotaExceeded(FootballAPIError):
+    """The daily request budget is spent and nothing is cached"""
+
+
+# api-football fixture status codes mapped to Match.status
+STATUS_MAP = {
+    'TBD': 'scheduled',
+    'NS': 'scheduled',
+    '1H': 'live',
+    'HT': 'live',
+    '2H': 'live',
+    'ET': 'live',
+    'BT': 'live',
+    'P': 'live',
+    'SUSP': 'live',
+    'INT': 'live',
+    'LIVE': 'live',
+    'FT': 'finished',
+    'AET': 'finished',
+    'PEN': 'finished',
+    'PST': 'postponed',
+    'CANC': 'cancelled',
+    'ABD': 'cancelled',
+    'AWD': 'finished',
+    'WO': 'finished',
+}
+
+
+def normalize_fixture(fixture):
+    """Convert an api-football fixture into the dict expected by sync_matches"""
+    match_datetime = datetime.fromisoformat(fixture['fixture']['date'].replace('Z', '+00:00'))
+    status = fixture['fixture'].get('status', {}).get('short', 'NS')
+    match = {
+        'home_team': fixture['teams']['home']['name'],
+        'away_team': fixture['teams']['away']['name'],
+        'competition': fixture['league']['name'],
+        'match_date': match_datetime.date().isoformat(),
+        'match_time': match_datetime.time().isoformat(),
+        'status': STATUS_MAP.get(status, 'scheduled'),
+        'external_id': str(fixture['fixture']['id'])
+    }
+    # Goals are null until kickoff, leave the stored scores alone then
+    goals = fixture.get('goals') or {}
+    for side in ('home', 'away'):
+        if goals.get(side) is not None:
+            match[f'{side}_score'] = goals[side]
+    return match
 
 
 class FootballAPI:
     """
     Class to fetch football match data from external APIs
     Using api-football.com free tier or football-data.org
+
+    Requests share one pooled session. Several leagues are fetched
+    concurrently on worker threads, at most `max_concurrency` at a time,
+    and failed requests are retried with exponential backoff, waiting at
+    least as long as the server's Retry-After. Responses go through the
+    on-disk cache of FOOTBALL_API_CACHE_DIR when it is set.
     """
 
-    def __init__(self):
+    timeout = 10
+    max_concurrency = 4
+    max_retries = 3
+    backoff_base = 0.5
+    max_backoff = 30
+
+    def __init__(self, api_key=None, base_url=None, cache=None):
         # You can get a free API key from api-football.com or football-data.org
-        self.api_key = getattr(settings, 'FOOTBALL_API_KEY', None)
-        self.base_url = "https://v3.football.api-sports.io"
+        self.api_key = api_key or getattr(settings, 'FOOTBALL_API_KEY', None)
+        self.base_url = base_url or getattr(settings, 'FOOTBALL_API_BASE_URL', DEFAULT_BASE_URL)
+        # Response cache and daily quota, see matches.api_cache
+        self.cache = cache if cache is not None else APIResponseCache.from_settings()
+        self._session = None
 
     def get_upcoming_matches_mock(self, days_ahead=7):
         """
@@ -121,57 +206,183 @@ class FootballAPI:
 
         return matches
 
-    def get_upcoming_matches_real(self, league_id=71, season=2024):
+    @property
+    def session(self):
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['x-apisports-key'] = self.api_key or ''
+            self._session = session
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _retry_delay(self, attempt, response=None):
+        """Exponential backoff with jitter, never shorter than Retry-After"""
+        delay = self.backoff_base * 2 ** attempt * (1 + random.random()) / 2
+        retry_after = response is not None and response.headers.get('Retry-After')
+        if retry_after:
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            else:
+                retry_at = parse_http_date_safe(retry_after)
+                if retry_at is not None:
+                    delay = max(delay, retry_at - time.time())
+        return min(delay, self.max_backoff)
+
+    async def _get(self, path, params, semaphore, ttl_key=None):
         """
-        Fetch upcoming matches from api-football.com
-        league_id 71 = Brasileirão Série A
-        Requires API key in settings
+        GET `path` on a worker thread, retrying; returns the decoded JSON
+
+        With a response cache, fresh entries are returned without a request,
+        expired ones are revalidated with their ETag, and once the daily
+        budget is spent the expired entry is returned, if there is one.
+        Freshness follows the TTL of `ttl_key`, `path` by default.
         """
-        if not self.api_key:
-            return self.get_upcoming_matches_mock()
+        url = f"{self.base_url}/{path}"
+        cache = self.cache
+        entry = cache.get(path, params) if cache else None
+        if entry and cache.is_fresh(ttl_key or path, entry):
+            cache.count('hits')
+            return entry['body']
+        if cache:
+            cache.count('misses')
 
-        headers = {
-            'x-apisports-key': self.api_key
-        }
+        headers = {'If-None-Match': entry['etag']} if entry and entry['etag'] else {}
+        for attempt in range(self.max_retries + 1):
+            if cache and not cache.reserve_request():
+                if entry:
+                    cache.count('stale')
+                    return entry['body']
+                raise FootballAPIQuotaExceeded(f"Daily budget of {cache.daily_budget} requests spent")
 
-        today = datetime.now().date()
-        date_from = today.isoformat()
-        date_to = (today + timedelta(days=7)).isoformat()
-
-        endpoint = f"{self.base_url}/fixtures"
-        params = {
-            'league': league_id,
-            'season': season,
-            'from': date_from,
-            'to': date_to,
-            'status': 'NS'  # Not Started
-        }
+            response = None
+            async with semaphore:
+                try:
+                    response = await asyncio.to_thread(
+                        self.session.get, url, params=params, headers=headers, timeout=self.timeout
+                    )
+                except requests.exceptions.RequestException as e:
+                    error = e
+                else:
+                    if cache:
+                        self._sync_quota(response)
+                    if response.status_code == 304 and entry:
+                        cache.touch(path, params, entry)
+                        cache.count('revalidated')
+                        return entry['body']
+                    if response.status_code not in RETRY_STATUSES:
+                        return self._decode(url, path, params, response)
+                    error = f"HTTP {response.status_code}"
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, response))
+
+        raise FootballAPIError(f"{url} failed after {self.max_retries + 1} attempts: {error}")
 
+    def _decode(self, url, path, params, response):
         try:
-            response = requests.get(endpoint, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise FootballAPIError(f"{url} failed: {e}") from e
 
-            matches = []
-            if data.get('response'):
-                for fixture in data['response']:
-                    match_datetime = datetime.fromisoformat(fixture['fixture']['date'].replace('Z', '+00:00'))
-
-                    matches.append({
-                        'home_team': fixture['teams']['home']['name'],
-                        'away_team': fixture['teams']['away']['name'],
-                        'competition': fixture['league']['name'],
-                        'match_date': match_datetime.date().isoformat(),
-                        'match_time': match_datetime.time().isoformat(),
-                        'status': 'scheduled',
-                        'external_id': str(fixture['fixture']['id'])
-                    })
-
-            return matches
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching from API: {e}")
-            return self.get_upcoming_matches_mock()
+        # api-football reports bad keys, plans or params with a 200
+        if data.get('errors'):
+            raise FootballAPIError(f"{url} failed: {data['errors']}")
+        if self.cache:
+            self.cache.store(path, params, data, response.headers.get('ETag'))
+        return data
+
+    def _sync_quota(self, response):
+        try:
+            limit = int(response.headers['x-ratelimit-requests-limit'])
+            remaining = int(response.headers['x-ratelimit-requests-remaining'])
+        except (KeyError, ValueError):
+            return
+        self.cache.sync_quota(limit, remaining)
+
+    async def fetch_fixtures(self, league_id, season, semaphore, date_from=None, date_to=None, status=None):
+        """Normalized fixtures of one league season, optionally within dates or of a status"""
+        params = {'league': league_id, 'season': season}
+        if date_from is not None:
+            params['from'] = date_from.isoformat()
+        if date_to is not None:
+            params['to'] = date_to.isoformat()
+        if status is not None:
+            params['status'] = status
+        data = await self._get('fixtures', params, semaphore)
+        return [normalize_fixture(fixture) for fixture in data.get('response') or []]
+
+    async def get_fixtures_async(self, leagues=None, **filters):
+        """Fetch the (league, season) pairs concurrently, FOOTBALL_API_LEAGUES by default"""
+        if leagues is None:
+            leagues = getattr(settings, 'FOOTBALL_API_LEAGUES', DEFAULT_LEAGUES)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(
+            self.fetch_fixtures(league_id, season, semaphore, **filters)
+            for league_id, season in leagues
+        ))
+        return [match for matches in results for match in matches]
+
+    def get_fixtures(self, date_from=None, date_to=None, leagues=None):
+        """
+        Fixtures of any status between two dates, the whole season without them
+        Falls back to the mock data when no API key is set
+        """
+        if not self.api_key:
+            return [
+                match for match in self.get_upcoming_matches_mock()
+                if (date_from is None or match['match_date'] >= date_from.isoformat())
+                and (date_to is None or match['match_date'] <= date_to.isoformat())
+            ]
+        return asyncio.run(self.get_fixtures_async(leagues, date_from=date_from, date_to=date_to))
+
+    async def get_live_fixtures_async(self, fixture_ids=(), leagues=None):
+        """
+        Fixtures in play, in a single request, plus the fixtures of `fixture_ids`
+
+        The live feed drops matches as soon as they end, so the final score
+        of matches that just left it is read by id, up to 20 ids a request.
+        """
+        if leagues is None:
+            leagues = getattr(settings, 'FOOTBALL_API_LEAGUES', DEFAULT_LEAGUES)
+        league_ids = sorted({str(league_id) for league_id, _ in leagues})
+        fixture_ids = sorted(fixture_ids)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        requests_params = [{'live': '-'.join(league_ids) or 'all'}] + [
+            {'ids': '-'.join(fixture_ids[i:i + 20])}
+            for i in range(0, len(fixture_ids), 20)
+        ]
+        results = await asyncio.gather(*(
+            self._get('fixtures', params, semaphore, ttl_key='fixtures:live')
+            for params in requests_params
+        ))
+        return [normalize_fixture(fixture) for data in results for fixture in data.get('response') or []]
+
+    def get_live_fixtures(self, fixture_ids=()):
+        """Normalized live fixtures, none without an API key (the mock data has no live games)"""
+        if not self.api_key:
+            return []
+        return asyncio.run(self.get_live_fixtures_async(fixture_ids))
+
+    def get_upcoming_matches_real(self, leagues=None, days_ahead=7):
+        """
+        Fetch upcoming matches from api-football.com
+        Requires API key in settings, raises FootballAPIError on failure
+        """
+        today = datetime.now().date()
+        return asyncio.run(self.get_fixtures_async(
+            leagues,
+            date_from=today,
+            date_to=today + timedelta(days=days_ahead),
+            status='NS',  # Not Started
+        ))
 
     def get_upcoming_matches(self):
         """Main method to get upcoming matches"""
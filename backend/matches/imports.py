@@ -0,0 +1,168 @@
+"""
+Fixture imports
+Season schedules read from CSV, NDJSON or JSON files (optionally gzipped)
+and upserted through the sync pipeline batch by batch, so a file of any
+size is imported with the memory of a single batch. The columns are those
+of the matches export, which can be imported back as is.
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import date, time
+
+from .models import Match
+from .sync import sync_matches
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+FORMATS = ['csv', 'ndjson', 'json']
+
+# Rows validated and upserted together
+BATCH_SIZE = 1000
+
+REQUIRED_FIELDS = ['external_id', 'home_team', 'away_team', 'competition', 'match_date', 'match_time']
+
+STATUSES = {value for value, _ in Match.STATUS_CHOICES}
+
+
+class FixtureError(ValueError):
+    pass
+
+
+def detect_format(path):
+    """Format from the file name, e.g. season.csv or cups.ndjson.gz"""
+    name = path.lower().removesuffix('.gz')
+    if name.endswith('.jsonl'):
+        return 'ndjson'
+    for file_format in FORMATS:
+        if name.endswith(f'.{file_format}'):
+            return file_format
+    raise FixtureError(f"Cannot tell the format of {path}, use one of {', '.join(FORMATS)}")
+
+
+def open_fixtures(path):
+    """Binary file of `path`, decompressed on the fly when it ends in .gz"""
+    return gzip.open(path, 'rb') if path.lower().endswith('.gz') else open(path, 'rb')
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def read_fixtures(file, file_format):
+    """
+    Yield (line, row dict) from a binary file, line being the row's position in the file
+
+    An NDJSON line that does not parse is yielded as a FixtureError.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'ndjson':
+        for line, data in enumerate(file, 1):
+            if not data.strip():
+                continue
+            try:
+                row = _loads(data)
+            except ValueError as e:
+                # Reported and skipped like any other invalid row
+                row = FixtureError(f'invalid JSON: {e}')
+            yield line, row
+    else:
+        # A JSON document cannot be read in pieces, schedules are small
+        # enough for that; large files should be NDJSON
+        rows = _loads(file.read())
+        if isinstance(rows, dict):
+            rows = rows.get('matches')
+        if not isinstance(rows, list):
+            raise FixtureError('A JSON schedule is a list of matches or {"matches": [...]}')
+        yield from enumerate(rows, 1)
+
+
+def _score(value):
+    if value in (None, ''):
+        return None
+    score = int(value)
+    if score < 0:
+        raise ValueError
+    return score
+
+
+def clean_fixture(row):
+    """
+    The sync_matches dict of a row, raising FixtureError when invalid
+
+    Blank statuses and scores are left out, so a schedule without
+    results neither reopens finished matches nor drops their scores.
+    """
+    if isinstance(row, FixtureError):
+        raise row
+    if not isinstance(row, dict):
+        raise FixtureError('not an object')
+    missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if missing:
+        raise FixtureError(f"missing {', '.join(missing)}")
+
+    fixture = {field: str(row[field]).strip() for field in REQUIRED_FIELDS}
+    try:
+        fixture['match_date'] = date.fromisoformat(fixture['match_date'][:10])
+    except ValueError:
+        raise FixtureError(f"invalid match_date {fixture['match_date']!r}")
+    try:
+        fixture['match_time'] = time.fromisoformat(fixture['match_time'])
+    except ValueError:
+        raise FixtureError(f"invalid match_time {fixture['match_time']!r}")
+
+    status = row.get('status')
+    if status not in (None, ''):
+        if status not in STATUSES:
+            raise FixtureError(f'invalid status {status!r}')
+        fixture['status'] = status
+
+    for field in ('home_score', 'away_score'):
+        try:
+            score = _score(row.get(field))
+        except (TypeError, ValueError):
+            raise FixtureError(f'invalid {field} {row.get(field)!r}')
+        if score is not None:
+            fixture[field] = score
+    return fixture
+
+
+def import_fixtures(rows, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Validate and upsert (line, row) pairs, yielding a report per batch
+
+    Each report has the sync_matches counts (none on a dry run), the
+    number of valid rows and the (line, message) errors of the invalid
+    ones, which are skipped. Batches are committed one at a time.
+    """
+    batch = []
+    errors = []
+    for line, row in rows:
+        try:
+            batch.append(clean_fixture(row))
+        except FixtureError as e:
+            errors.append((line, str(e)))
+        if len(batch) + len(errors) >= batch_size:
+            yield _flush(batch, errors, dry_run)
+            batch = []
+            errors = []
+    if batch or errors:
+        yield _flush(batch, errors, dry_run)
+
+
+def _flush(batch, errors, dry_run):
+    result = {'created': 0, 'updated': 0, 'unchanged': 0, 'total': 0, 'settled': 0}
+    if batch and not dry_run:
+        result = sync_matches(batch)
+    result['valid'] = len(batch)
+    result['errors'] = errors
+    return result
@@ -0,0 +1,184 @@
+"""
+Leaderboard queries
+Ranks over (total_points, correct_predictions), read from the in-process
+leaderboard index when available and computed by the database otherwise
+"""
+
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import DenseRank, Rank
+
+from .models import UserStats
+from .rank_index import get_leaderboard_index
+
+
+RANK_ORDER = [F('total_points').desc(), F('correct_predictions').desc()]
+
+# Ties are listed by id so pages are stable; matches userstats_ranking_idx
+ORDERING = ['-total_points', '-correct_predictions', 'id']
+
+# Annotations of ranked_queryset()
+RANK_COLUMNS = ('position', 'dense_position')
+
+
+def ranked_queryset():
+    """UserStats annotated with RANK() as position and DENSE_RANK() as dense_position"""
+    return UserStats.objects.annotate(
+        position=Window(Rank(), order_by=RANK_ORDER),
+        dense_position=Window(DenseRank(), order_by=RANK_ORDER),
+    ).order_by(*ORDERING)
+
+
+def _db_ranked_range(rank_from=None, rank_to=None):
+    queryset = ranked_queryset()
+    if rank_from is not None:
+        queryset = queryset.filter(position__gte=rank_from)
+    if rank_to is not None:
+        queryset = queryset.filter(position__lte=rank_to)
+    return queryset
+
+
+def db_rank_range(limit=10, offset=0, rank_from=None, rank_to=None):
+    """A page of the ranking, optionally restricted to a range of positions"""
+    return list(_db_ranked_range(rank_from, rank_to)[offset:offset + limit])
+
+
+def _better_than(total_points, correct_predictions):
+    return Q(total_points__gt=total_points) | Q(
+        total_points=total_points,
+        correct_predictions__gt=correct_predictions,
+    )
+
+
+def _worse_than(total_points, correct_predictions):
+    return Q(total_points__lt=total_points) | Q(
+        total_points=total_points,
+        correct_predictions__lt=correct_predictions,
+    )
+
+
+def db_users_around(user_email, span=5):
+    """
+    The user with up to `span` users above and below, with their positions
+
+    Neighbours are fetched by walking userstats_ranking_idx from the user's
+    key in both directions, and positions come from counting the rows ranked
+    ahead of the first neighbour, so the table is never scanned in full.
+    Raises UserStats.DoesNotExist for unknown users.
+    """
+    user = UserStats.objects.get(user_email=user_email)
+    points, correct = user.total_points, user.correct_predictions
+    tied = Q(total_points=points, correct_predictions=correct)
+
+    above = UserStats.objects.filter(
+        _better_than(points, correct) | (tied & Q(id__lt=user.id))
+    ).order_by('total_points', 'correct_predictions', '-id')[:span]
+    below = UserStats.objects.filter(
+        _worse_than(points, correct) | (tied & Q(id__gt=user.id))
+    ).order_by(*ORDERING)[:span]
+    rows = list(above)[::-1] + [user] + list(below)
+
+    first = rows[0]
+    ahead = _better_than(first.total_points, first.correct_predictions)
+    counts = UserStats.objects.aggregate(
+        ahead=Count('id', filter=ahead),
+        tied_before=Count('id', filter=Q(
+            total_points=first.total_points,
+            correct_predictions=first.correct_predictions,
+            id__lt=first.id,
+        )),
+    )
+    dense_ahead = UserStats.objects.filter(ahead).values(
+        'total_points', 'correct_predictions'
+    ).distinct().count()
+
+    row_number = counts['ahead'] + counts['tied_before']
+    position = counts['ahead'] + 1
+    dense_position = dense_ahead + 1
+    previous_key = (first.total_points, first.correct_predictions)
+    for row in rows:
+        row_number += 1
+        key = (row.total_points, row.correct_predictions)
+        if key != previous_key:
+            position = row_number
+            dense_position += 1
+            previous_key = key
+        row.position = position
+        row.dense_position = dense_position
+
+    return rows
+
+
+def db_user_position(user_email):
+    """(position, dense_position) of a user by counting the users ahead, None if unknown"""
+    user = UserStats.objects.filter(user_email=user_email).values(
+        'total_points', 'correct_predictions'
+    ).first()
+    if user is None:
+        return None
+    ahead = UserStats.objects.filter(
+        _better_than(user['total_points'], user['correct_predictions'])
+    )
+    return (
+        ahead.count() + 1,
+        ahead.values('total_points', 'correct_predictions').distinct().count() + 1,
+    )
+
+
+def _with_positions(ranked):
+    """Load the UserStats of (id, position, dense_position) rows in one query"""
+    users = UserStats.objects.in_bulk([stats_id for stats_id, _, _ in ranked])
+    rows = []
+    for stats_id, position, dense_position in ranked:
+        user = users.get(stats_id)
+        if user is None:
+            continue
+        user.position = position
+        user.dense_position = dense_position
+        rows.append(user)
+    return rows
+
+
+def rank_range(limit=10, offset=0, rank_from=None, rank_to=None):
+    index = get_leaderboard_index()
+    if index is None:
+        return db_rank_range(limit, offset, rank_from, rank_to)
+    return _with_positions(index.rank_range(limit, offset, rank_from, rank_to))
+
+
+def rank_range_values(columns, limit=10, offset=0, rank_from=None, rank_to=None):
+    """rank_range as .values() dicts of `columns`, which may name position and dense_position"""
+    index = get_leaderboard_index()
+    if index is None:
+        return list(_db_ranked_range(rank_from, rank_to).values(*columns)[offset:offset + limit])
+
+    ranked = index.rank_range(limit, offset, rank_from, rank_to)
+    model_columns = dict.fromkeys(['id'] + [column for column in columns if column not in RANK_COLUMNS])
+    users = {
+        row['id']: row
+        for row in UserStats.objects.filter(id__in=[stats_id for stats_id, _, _ in ranked]).values(*model_columns)
+    }
+    rows = []
+    for stats_id, position, dense_position in ranked:
+        row = users.get(stats_id)
+        if row is None:
+            continue
+        row['position'] = position
+        row['dense_position'] = dense_position
+        rows.append(row)
+    return rows
+
+
+def users_around(user_email, span=5):
+    index = get_leaderboard_index()
+    ranked = index.around(user_email, span) if index is not None else None
+    if ranked is None:
+        return db_users_around(user_email, span)
+    return _with_positions(ranked)
+
+
+def user_position(user_email):
+    index = get_leaderboard_index()
+    position = index.position(user_email) if index is not None else None
+    if position is None:
+        return db_user_position(user_email)
+    return position
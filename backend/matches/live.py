@@ -0,0 +1,133 @@
+"""
+Live score polling
+Run by the live_poller command. Only matches in play or whose kickoff
+window is open are polled, all of them with one live-feed request, and the
+poller sleeps until the next kickoff when there are none. While games are
+on, polls are spread so the day's request quota lasts until they end.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .cache import MATCHES, bump_version
+from .external_api import DEFAULT_LEAGUES, FootballAPI
+from .models import LIVE_WINDOW, Match
+from .settlement import settle_matches
+from .sync_jobs import WINDOWS
+
+
+# Fields the live feed may change
+LIVE_FIELDS = ['status', 'home_score', 'away_score']
+
+# Fewest seconds between polls while games are on, and most between checks otherwise
+LIVE_INTERVAL = 60
+IDLE_INTERVAL = 15 * 60
+
+
+def poll_live_matches(api=None, now=None):
+    """
+    Update score and status of the matches in their live window
+
+    Costs a single indexed query when no match is in its window. Otherwise
+    fetches the live feed once (plus the final state, by id, of matches
+    that left it), writes the changed rows with one bulk UPDATE and settles
+    the matches that finished. Returns the polled/updated/finished counts.
+    """
+    candidates = {
+        match.external_id: match
+        for match in Match.objects.live_window(now).exclude(external_id=None)
+    }
+    if not candidates:
+        return {'polled': 0, 'updated': 0, 'finished': 0}
+
+    api = api or FootballAPI()
+    fixtures = {fixture['external_id']: fixture for fixture in api.get_live_fixtures()}
+    left_feed = [
+        external_id for external_id, match in candidates.items()
+        if match.status == 'live' and external_id not in fixtures
+    ]
+    if left_feed:
+        fixtures.update(
+            (fixture['external_id'], fixture) for fixture in api.get_live_fixtures(left_feed)
+            if fixture['external_id'] in candidates
+        )
+
+    changed = []
+    finished = []
+    for external_id, fixture in fixtures.items():
+        match = candidates.get(external_id)
+        if match is None:
+            continue
+        values = {field: fixture.get(field, getattr(match, field)) for field in LIVE_FIELDS}
+        if all(getattr(match, field) == value for field, value in values.items()):
+            continue
+        if values['status'] == 'finished' and match.status != 'finished':
+            finished.append(match)
+        for field, value in values.items():
+            setattr(match, field, value)
+        match.updated_at = timezone.now()
+        changed.append(match)
+
+    if changed:
+        with transaction.atomic():
+            Match.objects.bulk_update(changed, LIVE_FIELDS + ['updated_at'])
+            bump_version(MATCHES)
+    settle_matches(finished)
+
+    return {'polled': len(candidates), 'updated': len(changed), 'finished': len(finished)}
+
+
+# Ids of matches that left the live feed read per request
+IDS_PER_REQUEST = 20
+
+
+def live_interval_for(cache, now=None, live_interval=LIVE_INTERVAL, idle_interval=IDLE_INTERVAL):
+    """
+    Seconds between live polls that make the day's remaining quota last
+
+    The requests the scheduled syncs (matches.sync_jobs) and the final
+    scores of today's matches still need are set aside; the rest is spread
+    until the last of today's matches ends or the quota resets, whichever
+    comes first. Kept between `live_interval` and `idle_interval`.
+    """
+    now = now or timezone.now()
+    stats = cache.stats()
+    resets_at = datetime.fromisoformat(stats['resets_at'])
+    today = Match.objects.filter(
+        Q(status='live') | Q(status='scheduled', kickoff_at__gte=now - LIVE_WINDOW, kickoff_at__lt=resets_at)
+    ).aggregate(count=Count('pk'), last_kickoff=Max('kickoff_at'))
+    if not today['count']:
+        return live_interval
+
+    leagues = len(getattr(settings, 'FOOTBALL_API_LEAGUES', DEFAULT_LEAGUES))
+    syncs = leagues * sum(math.ceil((resets_at - now) / interval) for interval, _ in WINDOWS.values())
+    finals = math.ceil(today['count'] / IDS_PER_REQUEST)
+    polls = stats['remaining'] - syncs - finals
+    if polls < 1:
+        return idle_interval
+    ends_at = min(today['last_kickoff'] + LIVE_WINDOW, resets_at)
+    interval = (ends_at - now) / timedelta(seconds=1) / polls
+    return min(idle_interval, max(live_interval, interval))
+
+
+def next_poll_in(now=None, live_interval=LIVE_INTERVAL, idle_interval=IDLE_INTERVAL, cache=None):
+    """
+    Seconds to wait before the next poll: short during games, until the next kickoff otherwise
+
+    With the API's response cache, the interval during games follows the
+    remaining quota (see live_interval_for).
+    """
+    now = now or timezone.now()
+    if Match.objects.live_window(now).exists():
+        if cache is not None:
+            return live_interval_for(cache, now, live_interval, idle_interval)
+        return live_interval
+    kickoff = Match.objects.upcoming(days=1, now=now).values_list('kickoff_at', flat=True).first()
+    if kickoff is None:
+        return idle_interval
+    return max(live_interval, min(idle_interval, (kickoff - now) / timedelta(seconds=1)))
@@ -0,0 +1,98 @@
+"""
+Management command to compare rank lookups between the database and the
+in-process leaderboard index
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from matches.leaderboard import db_user_position
+from matches.models import UserStats
+from matches.rank_index import LeaderboardIndex
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark user rank lookups: database COUNT queries vs in-memory leaderboard index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Number of users for each run (default: 10000 100000 1000000)'
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=200,
+            help='Number of random rank lookups per run (default: 200)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(
+            f"{'users':>10} {'load (s)':>10} {'db (ms/op)':>12} {'index (ms/op)':>14} {'speedup':>9}"
+        )
+        for size in options['sizes']:
+            try:
+                # Synthetic users are rolled back after each run
+                with transaction.atomic():
+                    self._run(size, options['lookups'], rng)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _run(self, size, lookups, rng):
+        UserStats.objects.all().delete()
+        batch = []
+        for i in range(size):
+            correct = rng.randint(0, 150)
+            batch.append(UserStats(
+                user_name=f'Bench {i}',
+                user_email=f'bench{i}@example.com',
+                total_predictions=correct + rng.randint(0, 100),
+                correct_predictions=correct,
+                total_points=correct * rng.randint(10, 50),
+            ))
+            if len(batch) == 5000:
+                UserStats.objects.bulk_create(batch)
+                batch = []
+        UserStats.objects.bulk_create(batch)
+
+        emails = [f'bench{rng.randrange(size)}@example.com' for _ in range(lookups)]
+
+        started = time.perf_counter()
+        index = LeaderboardIndex()
+        index.load(UserStats.objects.values_list(
+            'id', 'user_email', 'total_points', 'correct_predictions'
+        ).iterator(chunk_size=10000))
+        load_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        db_positions = [db_user_position(email) for email in emails]
+        db_time = (time.perf_counter() - started) / lookups * 1000
+
+        started = time.perf_counter()
+        index_positions = [index.position(email) for email in emails]
+        index_time = (time.perf_counter() - started) / lookups * 1000
+
+        if db_positions != index_positions:
+            self.stdout.write(self.style.ERROR(f'[!] Positions differ for {size} users'))
+
+        self.stdout.write(
+            f'{size:>10} {load_time:>10.2f} {db_time:>12.3f} {index_time:>14.4f} '
+            f'{db_time / max(index_time, 1e-9):>8.0f}x'
+        )
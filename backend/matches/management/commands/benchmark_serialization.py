@@ -0,0 +1,124 @@
+"""
+Management command to compare list rendering through the DRF serializers
+and JSONRenderer with the .values() row mappers and the orjson renderer
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from core.renderers import FastJSONRenderer, orjson
+from matches.models import Match, Team, UserStats
+from matches.serializers import MATCH_ROWS, USER_STATS_ROWS, MatchSerializer, UserStatsSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark list payloads: ModelSerializer + JSONRenderer vs .values() row mapper + orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[50, 200, 1000],
+            help='Rows per list for each run (default: 50 200 1000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Renders per measurement, the best one is kept (default: 20)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('[!] orjson is not installed, both paths render with json'))
+
+        self.stdout.write(
+            f"{'list':>10} {'rows':>6} {'serializer (ms)':>16} {'mapper (ms)':>12} {'speedup':>9}"
+        )
+        for size in options['sizes']:
+            try:
+                # Synthetic rows are rolled back after each run
+                with transaction.atomic():
+                    self._run(size, options['repeat'], rng)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _populate(self, size, rng):
+        Match.objects.all().delete()
+        UserStats.objects.all().delete()
+        Team.objects.all().delete()
+        teams = Team.objects.bulk_create(
+            Team(name=f'Bench Team {i}', slug=f'bench-team-{i}', short_name=f'B{i:02}') for i in range(20)
+        )
+        kickoff = date.today()
+        Match.objects.bulk_create(
+            Match(
+                home_team=home.name,
+                away_team=away.name,
+                home_team_ref=home,
+                away_team_ref=away,
+                competition='Brasileirão Série A',
+                match_date=kickoff + timedelta(days=i % 30),
+                match_time=f'{rng.randint(12, 21)}:00',
+                external_id=f'bench_{i}',
+            )
+            for i, (home, away) in enumerate(rng.sample(teams, 2) for _ in range(size))
+        )
+        UserStats.objects.bulk_create(
+            UserStats(
+                user_name=f'Bench {i}',
+                user_email=f'bench{i}@example.com',
+                total_predictions=(total := rng.randint(0, 100)),
+                correct_predictions=rng.randint(0, total),
+                total_points=rng.randint(0, 500),
+            )
+            for i in range(size)
+        )
+
+    def _best(self, repeat, render):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
+
+    def _run(self, size, repeat, rng):
+        self._populate(size, rng)
+
+        cases = [
+            ('matches', MatchSerializer, MATCH_ROWS, Match.objects.with_teams()),
+            ('stats', UserStatsSerializer, USER_STATS_ROWS, UserStats.objects.all()),
+        ]
+        for name, serializer_class, mapper, queryset in cases:
+            def serializer_path():
+                return JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+
+            def mapper_path():
+                return FastJSONRenderer().render(mapper.map_many(queryset.values(*mapper.columns)))
+
+            if serializer_path() != mapper_path():
+                self.stdout.write(self.style.ERROR(f'[!] {name} payloads differ for {size} rows'))
+
+            serializer_time = self._best(repeat, serializer_path)
+            mapper_time = self._best(repeat, mapper_path)
+            self.stdout.write(
+                f'{name:>10} {size:>6} {serializer_time:>16.2f} {mapper_time:>12.2f} '
+                f'{serializer_time / max(mapper_time, 1e-9):>8.1f}x'
+            )
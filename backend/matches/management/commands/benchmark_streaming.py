@@ -0,0 +1,119 @@
+"""
+Management command to compare the peak memory of a materialized prediction
+list with the streamed one (?stream=1) as the number of rows grows
+"""
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from matches.models import Match, Prediction, Team
+from matches.serializers import PredictionSerializer
+from matches.views import PredictionViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark peak memory of /api/predictions/: serializer.data on the full list vs ?stream=1'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Number of predictions for each run (default: 10000 100000 1000000)'
+        )
+        parser.add_argument(
+            '--materialize-limit',
+            type=int,
+            default=100_000,
+            help='Largest run also measured fully materialized, which needs GBs beyond (default: 100000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'rows':>10} {'materialized (MB)':>18} {'time (s)':>9} {'streamed (MB)':>14} "
+            f"{'time (s)':>9} {'body (MB)':>10}"
+        )
+        for size in options['sizes']:
+            try:
+                # Synthetic predictions are rolled back after each run
+                with transaction.atomic():
+                    self._run(size, size <= options['materialize_limit'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _populate(self, size):
+        Prediction.objects.all().delete()
+        Match.objects.all().delete()
+        teams = Team.objects.bulk_create(
+            Team(name=f'Bench Team {i}', slug=f'bench-team-{i}') for i in range(20)
+        )
+        # A season of matches, the users predicting all of them
+        matches = Match.objects.bulk_create(
+            Match(
+                home_team=teams[i % 20].name,
+                away_team=teams[(i + 1 + i // 20) % 20].name,
+                home_team_ref=teams[i % 20],
+                away_team_ref=teams[(i + 1 + i // 20) % 20],
+                competition='Brasileirão Série A',
+                match_date=date.today() + timedelta(days=i // 10),
+                match_time='16:00',
+                external_id=f'bench_{i}',
+            )
+            for i in range(380)
+        )
+        batch = []
+        for i in range(size):
+            batch.append(Prediction(
+                user_name=f'Bench {i // 380}',
+                user_email=f'bench{i // 380}@example.com',
+                match=matches[i % 380],
+                prediction=('home', 'draw', 'away')[i % 3],
+            ))
+            if len(batch) == 10_000:
+                Prediction.objects.bulk_create(batch)
+                batch = []
+        Prediction.objects.bulk_create(batch)
+
+    def _measure(self, render):
+        tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            body_size = render()
+            return tracemalloc.get_traced_memory()[1] / 2 ** 20, time.perf_counter() - started, body_size
+        finally:
+            tracemalloc.stop()
+
+    def _materialized(self):
+        queryset = PredictionViewSet.queryset.all()
+        return len(JSONRenderer().render(PredictionSerializer(queryset, many=True).data))
+
+    def _streamed(self):
+        request = RequestFactory().get('/api/predictions/', {'stream': '1'})
+        response = PredictionViewSet.as_view({'get': 'list'})(request)
+        # A client reading the body: every chunk is dropped once sent
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    def _run(self, size, materialize):
+        self._populate(size)
+
+        materialized = '-'
+        materialized_time = '-'
+        if materialize:
+            peak, elapsed, _ = self._measure(self._materialized)
+            materialized, materialized_time = f'{peak:.1f}', f'{elapsed:.1f}'
+        peak, elapsed, body_size = self._measure(self._streamed)
+
+        self.stdout.write(
+            f'{size:>10} {materialized:>18} {materialized_time:>9} {peak:>14.1f} '
+            f'{elapsed:>9.1f} {body_size / 2 ** 20:>10.1f}'
+        )
@@ -0,0 +1,79 @@
+"""
+Management command to export predictions, matches or the ranking as CSV
+or NDJSON, streamed from the database with constant memory
+"""
+import sys
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from matches.exports import CHUNK_SIZE, DATASETS, FORMATS, Export, ExportError
+
+
+class Command(BaseCommand):
+    help = 'Export predictions, matches or the ranking to a CSV or NDJSON file (or stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=list(FORMATS),
+            default='csv',
+            help='Output format (default: csv)'
+        )
+        parser.add_argument(
+            '--output', '-o',
+            default='-',
+            help='File to write, - for stdout (default: -)'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip'
+        )
+        parser.add_argument('--competition', help='Only matches of this competition')
+        parser.add_argument('--date-from', type=date.fromisoformat, help='First match date, YYYY-MM-DD')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='Last match date, YYYY-MM-DD')
+        parser.add_argument('--finished', action='store_true', help='Only finished matches')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rows fetched per database round trip (default: {CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            export = Export(
+                options['dataset'],
+                export_format=options['export_format'],
+                compress=options['gzip'],
+                chunk_size=options['chunk_size'],
+                competition=options['competition'],
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                finished=options['finished'],
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        written = 0
+        output = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in export:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+            else:
+                output.flush()
+
+        elapsed = time.perf_counter() - started
+        # Reported on stderr so stdout can be piped
+        self.stderr.write(self.style.SUCCESS(
+            f'[+] {export.rows} rows, {written / 2 ** 20:.1f} MB in {elapsed:.1f}s '
+            f'({export.rows / max(elapsed, 1e-9):,.0f} rows/s)'
+        ))
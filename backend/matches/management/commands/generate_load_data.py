@@ -0,0 +1,383 @@
+"""
+Management command to generate a large, reproducible dataset for load tests:
+matches, predictions, the UserStats derived from them and, for the legacy
+ranking app, users, jogos and palpites
+"""
+import io
+import random
+import time
+import unicodedata
+from datetime import time as dt_time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from matches.cache import MATCHES, PREDICTIONS, STATS, bump_version
+from matches.models import Match, Prediction, UserStats, combine_kickoff
+from matches.rank_index import notify_stats_changed
+from matches.teams import get_team_index, resolve_team
+from ranking.models import TIMES_SERIE_A, Jogo, Palpite
+
+
+FIRST_NAMES = [
+    'João', 'Maria', 'José', 'Ana', 'Pedro', 'Juliana', 'Lucas', 'Fernanda',
+    'Gabriel', 'Camila', 'Rafael', 'Beatriz', 'Mateus', 'Larissa', 'Felipe',
+    'Carolina', 'Bruno', 'Amanda', 'Rodrigo', 'Mariana', 'Thiago', 'Letícia',
+    'Diego', 'Gabriela', 'Gustavo', 'Aline', 'Leonardo', 'Bruna', 'Vinicius',
+    'Patrícia', 'Marcelo', 'Renata', 'André', 'Tatiana', 'Carlos', 'Vanessa'
+]
+
+LAST_NAMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves',
+    'Pereira', 'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho',
+    'Rocha', 'Almeida', 'Nascimento', 'Araújo', 'Melo', 'Barbosa', 'Reis',
+    'Cardoso', 'Teixeira', 'Freitas', 'Fernandes', 'Dias', 'Castro', 'Mendes'
+]
+
+# Skill level: (predictions range, accuracy range), as in populate_users
+SKILLS = [
+    ((5, 20), (0.30, 0.50)),    # beginner
+    ((20, 50), (0.50, 0.65)),   # intermediate
+    ((50, 100), (0.65, 0.80)),  # advanced
+    ((80, 150), (0.75, 0.90)),  # expert
+]
+
+# Competition of each match, in proportion; Série A matches get a Jogo
+COMPETITIONS = ['Brasileirão Série A'] * 6 + ['Copa do Brasil'] * 2 + ['Libertadores'] * 2
+
+# Goals per team and their weights, at most 7 as in ranking.models.PLACARES
+GOALS = [0, 1, 2, 3, 4, 5]
+GOAL_WEIGHTS = [25, 33, 22, 12, 5, 3]
+
+# Prefix of the external ids and usernames of generated rows, and domain
+# of the generated emails; --clear deletes only rows carrying them
+PREFIX = 'load-'
+EMAIL_DOMAIN = '@load.example.com'
+
+OUTCOMES = ('home', 'draw', 'away')
+
+# Users generated together, their ids are read back with one IN query
+USER_BATCH = 5000
+
+
+def _ascii(name):
+    return unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+
+
+def _copy_value(value):
+    """Value in PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class RowWriter:
+    """
+    Buffers rows of `fields` and writes them every `batch_size`
+
+    With COPY on PostgreSQL, with one multi-row INSERT (executemany)
+    elsewhere. Values must already be database values, e.g. datetimes
+    through connection.ops.adapt_datetimefield_value, which is what makes
+    this several times faster than bulk_create preparing every field.
+    """
+
+    def __init__(self, model, fields, batch_size, use_copy):
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.rows = []
+        self.written = 0
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+        if use_copy:
+            self.sql = f'COPY {table} ({columns}) FROM STDIN'
+        else:
+            self.sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(fields))})"
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with connection.cursor() as cursor:
+            if not self.use_copy:
+                cursor.executemany(self.sql, self.rows)
+            elif hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                cursor.copy_expert(self.sql, io.StringIO(self._copy_data()))
+            else:
+                with cursor.copy(self.sql) as copy:
+                    copy.write(self._copy_data())
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _copy_data(self):
+        return ''.join('\t'.join(map(_copy_value, row)) + '\n' for row in self.rows)
+
+
+class Command(BaseCommand):
+    help = 'Generate seeded load-test data: matches, predictions, derived user stats, jogos and palpites'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10_000,
+            help='Number of users (default: 10000)'
+        )
+        parser.add_argument(
+            '--matches',
+            type=int,
+            default=2000,
+            help='Number of matches (default: 2000)'
+        )
+        parser.add_argument(
+            '--finished',
+            type=float,
+            default=0.8,
+            help='Share of matches already played, the rest are upcoming (default: 0.8)'
+        )
+        parser.add_argument(
+            '--prediction-scale',
+            type=float,
+            default=1.0,
+            help='Multiplier of the predictions per user, 5-150 by skill level at 1.0 (default: 1.0)'
+        )
+        parser.add_argument(
+            '--no-legacy',
+            action='store_true',
+            help='Skip the users, jogos and palpites of the ranking app'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Rows written per COPY or INSERT (default: 10000)'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use INSERT on PostgreSQL too'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated data first, other rows are kept'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 0 or options['matches'] < 1:
+            raise CommandError('--users must not be negative and --matches must be positive')
+        if not 0 <= options['finished'] <= 1:
+            raise CommandError('--finished must be between 0 and 1')
+
+        self.rng = random.Random(options['seed'])
+        self.now = connection.ops.adapt_datetimefield_value(timezone.now())
+        self.legacy = not options['no_legacy']
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            if options['clear']:
+                self._clear()
+            elif User.objects.filter(username__startswith=PREFIX).exists() or Match.objects.filter(
+                external_id__startswith=PREFIX
+            ).exists():
+                raise CommandError('Load data was already generated, use --clear to rebuild it')
+
+            matches = self._create_matches(options['matches'], options['finished'])
+            self.stdout.write(f'[+] {len(matches)} matches ({sum(1 for m in matches if m.jogo_id)} jogos)')
+
+            self.predictions = RowWriter(Prediction, [
+                'user_name', 'user_email', 'match_id', 'prediction', 'confidence',
+                'is_correct', 'points_earned', 'created_at',
+            ], batch_size, use_copy)
+            self.stats = RowWriter(UserStats, [
+                'user_name', 'user_email', 'total_predictions', 'correct_predictions',
+                'total_points', 'created_at', 'updated_at',
+            ], batch_size, use_copy)
+            self.palpites = RowWriter(Palpite, [
+                'usuario_id', 'jogo_id', 'palpite', 'resultado_correto', 'criado_em',
+            ], batch_size, use_copy)
+            self.users = RowWriter(User, [
+                'username', 'email', 'first_name', 'last_name', 'password',
+                'is_superuser', 'is_staff', 'is_active', 'date_joined',
+            ], batch_size, use_copy)
+
+            self._create_users(options['users'], matches, options['prediction_scale'], started)
+            for writer in (self.predictions, self.stats, self.palpites):
+                writer.flush()
+            if self.legacy:
+                # A Jogo nobody predicted could not be told apart from real ones by --clear
+                Jogo.objects.filter(pk__in=[m.jogo_id for m in matches if m.jogo_id], palpite__isnull=True).delete()
+
+            bump_version(MATCHES, PREDICTIONS, STATS)
+            notify_stats_changed()
+
+        elapsed = time.perf_counter() - started
+        rows = sum(writer.written for writer in (self.users, self.predictions, self.stats, self.palpites))
+        rows += len(matches)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n[+] {rows:,} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s, '
+            f"{'COPY' if use_copy else 'INSERT'}, seed {options['seed']})"
+        ))
+        self.stdout.write(f'  - {self.stats.written:,} user stats')
+        self.stdout.write(f'  - {self.predictions.written:,} predictions')
+        if self.legacy:
+            self.stdout.write(f'  - {self.users.written:,} users, {self.palpites.written:,} palpites')
+
+    def _clear(self):
+        # Through the ORM so deletes leave tombstones for delta sync; the
+        # querysets delete in bulk, none of these models has per-row signals
+        users = User.objects.filter(username__startswith=PREFIX)
+        palpites = Palpite.objects.filter(usuario__in=users)
+        jogo_ids = list(palpites.values_list('jogo_id', flat=True).distinct())
+        palpites.delete()
+        # Jogos of generated matches, unless a real user predicted them since
+        Jogo.objects.filter(pk__in=jogo_ids, palpite__isnull=True).delete()
+        users.delete()
+        # Predictions of real users on generated matches go with the matches
+        Prediction.objects.filter(user_email__endswith=EMAIL_DOMAIN).delete()
+        UserStats.objects.filter(user_email__endswith=EMAIL_DOMAIN).delete()
+        Match.objects.filter(external_id__startswith=PREFIX).delete()
+        self.stdout.write(self.style.WARNING('[!] Previously generated data deleted'))
+
+    def _create_matches(self, count, finished_share):
+        rng = self.rng
+        teams = [name for name, _ in TIMES_SERIE_A]
+        team_index = get_team_index()
+        team_ids = {name: resolve_team(name, team_index) for name in teams}
+        finished_count = round(count * finished_share)
+        today = timezone.localdate()
+
+        matches = []
+        for i in range(count):
+            home, away = rng.sample(teams, 2)
+            # About ten matches a day, played ones before today
+            if i < finished_count:
+                match_date = today - timedelta(days=(finished_count - i) // 10 + 1)
+                status = 'finished'
+                home_score, away_score = rng.choices(GOALS, GOAL_WEIGHTS, k=2)
+            else:
+                match_date = today + timedelta(days=(i - finished_count) // 10 + 1)
+                status = 'scheduled'
+                home_score = away_score = None
+            match_time = dt_time(rng.choice([16, 18, 19, 21]), rng.choice([0, 30]))
+            matches.append(Match(
+                external_id=f'{PREFIX}{i}',
+                home_team=home,
+                away_team=away,
+                home_team_ref_id=team_ids[home],
+                away_team_ref_id=team_ids[away],
+                competition=COMPETITIONS[i % len(COMPETITIONS)],
+                match_date=match_date,
+                match_time=match_time,
+                kickoff_at=combine_kickoff(match_date, match_time),
+                status=status,
+                home_score=home_score,
+                away_score=away_score,
+            ))
+        matches = Match.objects.bulk_create(matches, batch_size=1000)
+
+        for match in matches:
+            match.jogo_id = None
+            # Read once per prediction below
+            match.outcome = match.result
+
+        if self.legacy:
+            league = [match for match in matches if match.competition == COMPETITIONS[0]]
+            jogos = Jogo.objects.bulk_create(
+                [Jogo(time1=match.home_team, time2=match.away_team) for match in league],
+                batch_size=1000,
+            )
+            for match, jogo in zip(league, jogos):
+                match.jogo_id = jogo.pk
+        return matches
+
+    def _create_users(self, count, matches, scale, started):
+        rng = self.rng
+        names = [(first, last, _ascii(first), _ascii(last)) for first in FIRST_NAMES for last in LAST_NAMES]
+        # One unusable password for everyone, hashing per user would dominate
+        password = make_password(None)
+        match_indexes = range(len(matches))
+        report_every = max(count // 10, 1)
+
+        for start in range(0, count, USER_BATCH):
+            batch = []
+            for i in range(start, min(start + USER_BATCH, count)):
+                first, last, first_ascii, last_ascii = rng.choice(names)
+                batch.append((i, f'{first} {last}', f'{first_ascii}.{last_ascii}{i}{EMAIL_DOMAIN}'))
+
+            if self.legacy:
+                for i, name, email in batch:
+                    self.users.add((f'{PREFIX}{i}', email, name, '', password, False, False, True, self.now))
+                self.users.flush()
+                # Neither COPY nor executemany return ids, they are read back
+                usernames = [f'{PREFIX}{i}' for i, _, _ in batch]
+                ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+                user_ids = [ids[username] for username in usernames]
+            else:
+                user_ids = [None] * len(batch)
+
+            for (i, user_name, email), user_id in zip(batch, user_ids):
+                self._create_predictions(user_name, email, user_id, matches, match_indexes, scale)
+                if (i + 1) % report_every == 0:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'  {i + 1:,} users, {self.predictions.written + len(self.predictions.rows):,} '
+                        f'predictions in {elapsed:.1f}s'
+                    )
+
+    def _create_predictions(self, user_name, email, user_id, matches, match_indexes, scale):
+        rng = self.rng
+        (low, high), (accuracy_low, accuracy_high) = rng.choice(SKILLS)
+        count = min(max(round(rng.randint(low, high) * scale), 1), len(matches))
+        accuracy = rng.uniform(accuracy_low, accuracy_high)
+        now = self.now
+
+        correct_count = 0
+        points = 0
+        for index in rng.sample(match_indexes, count):
+            match = matches[index]
+            confidence = rng.randint(1, 5)
+            if match.outcome is None:
+                prediction = rng.choice(OUTCOMES)
+                is_correct = None
+                earned = 0
+            elif rng.random() < accuracy:
+                prediction = match.outcome
+                is_correct = True
+                earned = Prediction.BASE_POINTS * confidence
+                correct_count += 1
+                points += earned
+            else:
+                prediction = rng.choice([outcome for outcome in OUTCOMES if outcome != match.outcome])
+                is_correct = False
+                earned = 0
+            self.predictions.add((user_name, email, match.pk, prediction, confidence, is_correct, earned, now))
+
+            if match.jogo_id is not None and user_id is not None:
+                palpite = {'home': match.home_team, 'away': match.away_team}.get(prediction, 'Empate')
+                placar = None if match.outcome is None else f'{match.home_score}x{match.away_score}'
+                self.palpites.add((user_id, match.jogo_id, palpite, placar, now))
+
+        # What submitting and settling these predictions would have recorded
+        self.stats.add((user_name, email, count, correct_count, points, now, now))
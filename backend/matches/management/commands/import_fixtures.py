@@ -0,0 +1,93 @@
+"""
+Management command to import season schedules from CSV, NDJSON or JSON
+files, upserting the matches in batches without any network access
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from matches.imports import BATCH_SIZE, FORMATS, FixtureError, detect_format, import_fixtures, open_fixtures, read_fixtures
+
+
+class Command(BaseCommand):
+    help = 'Import fixtures from season schedule files (csv, ndjson, json; optionally .gz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Schedule files, - for stdin (needs --format)')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=FORMATS,
+            help='Format of every file (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Rows validated and upserted per batch (default: {BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only validate the files'
+        )
+
+    def handle(self, *args, **options):
+        totals = {'created': 0, 'updated': 0, 'unchanged': 0, 'settled': 0, 'errors': 0}
+        started = time.perf_counter()
+        rows = 0
+
+        for path in options['files']:
+            try:
+                file_format = options['file_format'] or detect_format(path)
+            except FixtureError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'[*] {path} ({file_format})')
+
+            try:
+                file = sys.stdin.buffer if path == '-' else open_fixtures(path)
+            except OSError as e:
+                raise CommandError(f'Cannot read {path}: {e}')
+            try:
+                rows += self._import(file, file_format, options, totals)
+            except (FixtureError, ValueError) as e:
+                # Unreadable file, e.g. malformed JSON; earlier batches stay imported
+                raise CommandError(f'{path}: {e}')
+            finally:
+                if file is not sys.stdin.buffer:
+                    file.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"\n[+] {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s): "
+            f"{totals['created']} created, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['settled']} matches settled"
+        ))
+        if totals['errors']:
+            self.stdout.write(self.style.WARNING(f"[!] {totals['errors']} invalid rows skipped"))
+
+    def _import(self, file, file_format, options, totals):
+        rows = 0
+        batch_started = time.perf_counter()
+        results = import_fixtures(
+            read_fixtures(file, file_format),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        for number, result in enumerate(results, 1):
+            elapsed = time.perf_counter() - batch_started
+            size = result['valid'] + len(result['errors'])
+            rows += size
+            for key in ('created', 'updated', 'unchanged', 'settled'):
+                totals[key] += result[key]
+            totals['errors'] += len(result['errors'])
+
+            self.stdout.write(
+                f"  batch {number}: {size} rows in {elapsed * 1000:.0f}ms "
+                f"({size / max(elapsed, 1e-9):,.0f} rows/s) - {result['created']} created, "
+                f"{result['updated']} updated, {result['unchanged']} unchanged"
+            )
+            for line, message in result['errors']:
+                self.stdout.write(self.style.WARNING(f'  [!] line {line}: {message}'))
+            batch_started = time.perf_counter()
+        return rows
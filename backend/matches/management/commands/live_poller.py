@@ -0,0 +1,55 @@
+"""
+Management command polling live scores of the matches being played
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from matches.external_api import FootballAPI, FootballAPIError
+from matches.live import IDLE_INTERVAL, LIVE_INTERVAL, next_poll_in, poll_live_matches
+
+
+class Command(BaseCommand):
+    help = 'Poll live scores as often as the daily quota allows while games are on, idle until the next kickoff otherwise'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--live-interval',
+            type=int,
+            default=LIVE_INTERVAL,
+            help=f'Fewest seconds between polls while games are on (default: {LIVE_INTERVAL})'
+        )
+        parser.add_argument(
+            '--idle-interval',
+            type=int,
+            default=IDLE_INTERVAL,
+            help=f'Most seconds between checks when no game is on (default: {IDLE_INTERVAL})'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Poll once and exit'
+        )
+
+    def handle(self, *args, **options):
+        api = FootballAPI()
+        try:
+            while True:
+                try:
+                    result = poll_live_matches(api)
+                except FootballAPIError as e:
+                    self.stdout.write(self.style.ERROR(f'[!] {e}'))
+                else:
+                    if result['polled']:
+                        self.stdout.write(
+                            f"[+] {result['polled']} matches polled, {result['updated']} updated, "
+                            f"{result['finished']} finished"
+                        )
+                if options['once']:
+                    return
+                time.sleep(next_poll_in(
+                    live_interval=options['live_interval'],
+                    idle_interval=options['idle_interval'],
+                    cache=api.cache,
+                ))
+        except KeyboardInterrupt:
+            self.stdout.write('\n[+] Live poller stopped')
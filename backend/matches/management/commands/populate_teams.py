@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from matches.models import Team
+from matches.models import Team, TeamAlias, normalize_team_name
+from matches.teams import DEFAULT_ALIASES
 
 
 class Command(BaseCommand):
@@ -173,6 +174,16 @@ class Command(BaseCommand):
                     self.style.WARNING(f'[*] Time atualizado: {team.name}')
                 )
 
+        for team_name, aliases in DEFAULT_ALIASES.items():
+            team = Team.objects.filter(name=team_name).first()
+            if team is None:
+                continue
+            for alias in aliases:
+                TeamAlias.objects.update_or_create(
+                    normalized_name=normalize_team_name(alias),
+                    defaults={'team': team, 'name': alias}
+                )
+
         self.stdout.write(
             self.style.SUCCESS(f'\n[+] Processo concluido!')
         )
@@ -0,0 +1,49 @@
+"""
+Management command to settle predictions of finished matches
+"""
+from django.core.management.base import BaseCommand, CommandError
+from matches.models import Match
+from matches.settlement import settle_match
+
+
+class Command(BaseCommand):
+    help = 'Settle predictions (is_correct, points_earned and user stats) of finished matches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--match',
+            type=int,
+            action='append',
+            dest='match_ids',
+            help='ID of a match to settle (can be repeated). Default: all unsettled finished matches'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-settle every finished match, including already settled ones'
+        )
+
+    def handle(self, *args, **options):
+        matches = Match.objects.filter(status='finished')
+
+        if options['match_ids']:
+            matches = matches.filter(pk__in=options['match_ids'])
+            if not matches.exists():
+                raise CommandError('No finished match found with the given IDs')
+        elif not options['all']:
+            matches = matches.filter(predictions__is_correct__isnull=True).distinct()
+
+        settled_count = 0
+        for match in matches:
+            result = settle_match(match)
+            if result is None:
+                self.stdout.write(self.style.WARNING(f'[!] Sem placar final: {match}'))
+                continue
+
+            settled_count += 1
+            self.stdout.write(
+                f"[+] {match}: {result['settled']} palpites, "
+                f"resultado '{result['outcome']}'"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'\n[+] {settled_count} partidas liquidadas'))
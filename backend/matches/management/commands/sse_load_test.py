@@ -0,0 +1,130 @@
+"""
+Management command opening a swarm of local SSE clients against the events
+stream and measuring how fast a change reaches all of them
+"""
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = 'Load test /api/events/: hold many idle SSE connections, touch a match and time the fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000/api/events/?topics=scores',
+            help='Events stream of a running ASGI server (default: http://127.0.0.1:8000/api/events/?topics=scores)'
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=1000,
+            help='Number of concurrent connections (default: 1000, mind ulimit -n)'
+        )
+        parser.add_argument(
+            '--connect-concurrency',
+            type=int,
+            default=200,
+            help='Connections opened at the same time (default: 200)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=15,
+            help='Seconds to wait for the event after the touch (default: 15)'
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported')
+        if not Match.objects.exists():
+            raise CommandError('At least one match is needed to trigger an event')
+
+        asyncio.run(self._run(url, options))
+
+    async def _connect(self, url, semaphore, connect_times):
+        async with semaphore:
+            started = time.perf_counter()
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            path = url.path + (f'?{url.query}' if url.query else '')
+            writer.write(
+                f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\nAccept: text/event-stream\r\n\r\n'.encode()
+            )
+            await writer.drain()
+            status = await reader.readline()
+            if b' 200 ' not in status:
+                raise ConnectionError(status.decode().strip())
+            # Skip the headers, the stream is open
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            connect_times.append(time.perf_counter() - started)
+            return reader, writer
+
+    async def _wait_for_event(self, reader, touched_at, latencies):
+        async for line in reader:
+            if line.startswith(b'event: scores') and touched_at:
+                latencies.append(time.perf_counter() - touched_at[0])
+                return
+
+    async def _run(self, url, options):
+        semaphore = asyncio.Semaphore(options['connect_concurrency'])
+        connect_times = []
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._connect(url, semaphore, connect_times) for _ in range(options['clients'])),
+            return_exceptions=True,
+        )
+        connections = [result for result in results if not isinstance(result, BaseException)]
+        failures = [result for result in results if isinstance(result, BaseException)]
+        self.stdout.write(
+            f'[+] {len(connections)} connected in {time.perf_counter() - started:.1f}s, '
+            f'{len(failures)} failed'
+        )
+        if failures:
+            self.stdout.write(self.style.WARNING(f'[!] First failure: {failures[0]!r}'))
+        if not connections:
+            return
+
+        touched_at = []
+        latencies = []
+        waiters = [
+            asyncio.create_task(self._wait_for_event(reader, touched_at, latencies))
+            for reader, _ in connections
+        ]
+        # Let the server settle and publish anything pending before the touch
+        await asyncio.sleep(2)
+        touched_at.append(time.perf_counter())
+        await sync_to_async(self._touch)()
+
+        _, pending = await asyncio.wait(waiters, timeout=options['timeout'])
+        for task in pending:
+            task.cancel()
+        for _, writer in connections:
+            writer.close()
+
+        self._report('connect', connect_times)
+        self._report('delivery', latencies)
+        self.stdout.write(f'[+] {len(latencies)}/{len(connections)} clients received the event')
+
+    def _touch(self):
+        match = Match.objects.order_by('id').first()
+        Match.objects.filter(pk=match.pk).update(updated_at=timezone.now())
+
+    def _report(self, name, samples):
+        if not samples:
+            self.stdout.write(self.style.WARNING(f'[!] No {name} samples'))
+            return
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.stdout.write(
+            f'{name:>10}: p50 {statistics.median(samples) * 1000:.0f}ms, '
+            f'p95 {p95 * 1000:.0f}ms, max {samples[-1] * 1000:.0f}ms'
+        )
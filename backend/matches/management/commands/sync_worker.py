@@ -0,0 +1,51 @@
+"""
+Management command running scheduled fixture syncs outside the web workers
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from matches.delta import prune_tombstones
+from matches.sync_jobs import fail_interrupted_jobs, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Sync fixtures in the background: queued jobs plus the due windows (next 7 days, past 48 hours, season)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between checks for due windows and queued jobs (default: 30)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the pending jobs once and exit (e.g. from cron)'
+        )
+
+    def handle(self, *args, **options):
+        interrupted = fail_interrupted_jobs()
+        if interrupted:
+            self.stdout.write(self.style.WARNING(f'[!] {interrupted} interrupted jobs marked as failed'))
+
+        try:
+            while True:
+                for job in run_pending():
+                    self._report(job)
+                # Off the request path, deletes only leave tombstones
+                prune_tombstones()
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('\n[+] Sync worker stopped')
+
+    def _report(self, job):
+        if job.status == 'failed':
+            self.stdout.write(self.style.ERROR(f'[!] {job}: {job.error}'))
+            return
+        self.stdout.write(
+            f'[+] {job}: {job.fetched} fetched, {job.created} created, '
+            f'{job.updated} updated, {job.settled} settled in {job.duration:.1f}s'
+        )
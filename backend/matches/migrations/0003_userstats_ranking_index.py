@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0002_team'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(fields=['-total_points', '-correct_predictions', 'id'], name='userstats_ranking_idx'),
+        ),
+    ]
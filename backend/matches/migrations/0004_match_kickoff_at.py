@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:08
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_kickoff_at(apps, schema_editor):
+    Match = apps.get_model('matches', 'Match')
+    batch = []
+    for match in Match.objects.filter(kickoff_at__isnull=True).only('match_date', 'match_time').iterator(chunk_size=2000):
+        match.kickoff_at = timezone.make_aware(datetime.combine(match.match_date, match.match_time))
+        batch.append(match)
+        if len(batch) == 2000:
+            Match.objects.bulk_update(batch, ['kickoff_at'])
+            batch = []
+    Match.objects.bulk_update(batch, ['kickoff_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0003_userstats_ranking_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='kickoff_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_kickoff_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'kickoff_at'], name='match_status_kickoff_idx'),
+        ),
+    ]
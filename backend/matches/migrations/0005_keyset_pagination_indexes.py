@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0004_match_kickoff_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='match',
+            options={'ordering': ['match_date', 'match_time', 'id'], 'verbose_name': 'Match', 'verbose_name_plural': 'Matches'},
+        ),
+        migrations.AlterModelOptions(
+            name='prediction',
+            options={'ordering': ['-created_at', 'id'], 'verbose_name': 'Prediction', 'verbose_name_plural': 'Predictions'},
+        ),
+        migrations.AlterModelOptions(
+            name='userstats',
+            options={'ordering': ['-total_points', '-correct_predictions', 'id'], 'verbose_name': 'User Stats', 'verbose_name_plural': 'User Stats'},
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['match_date', 'match_time', 'id'], name='match_schedule_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['-created_at', 'id'], name='prediction_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['user_email', '-created_at', 'id'], name='prediction_user_recent_idx'),
+        ),
+    ]
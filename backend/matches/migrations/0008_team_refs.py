@@ -0,0 +1,85 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:25
+
+import django.db.models.deletion
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copied from matches.teams.DEFAULT_ALIASES when the table was created
+ALIASES = {
+    'Athletico Paranaense': ['Athletico-PR', 'Atletico Paranaense'],
+    'Atlético Mineiro': ['Atlético-MG'],
+    'Red Bull Bragantino': ['Bragantino', 'RB Bragantino'],
+    'Vasco': ['Vasco da Gama'],
+}
+
+
+def normalize(name):
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.lower()).split())
+
+
+def backfill_team_refs(apps, schema_editor):
+    Team = apps.get_model('matches', 'Team')
+    TeamAlias = apps.get_model('matches', 'TeamAlias')
+    Match = apps.get_model('matches', 'Match')
+
+    index = {}
+    for team in Team.objects.all():
+        if team.short_name:
+            index.setdefault(normalize(team.short_name), team.id)
+    for team in Team.objects.all():
+        index[normalize(team.name)] = team.id
+    for team_name, aliases in ALIASES.items():
+        team = Team.objects.filter(name=team_name).first()
+        if team is None:
+            continue
+        for alias in aliases:
+            TeamAlias.objects.get_or_create(
+                normalized_name=normalize(alias),
+                defaults={'team': team, 'name': alias},
+            )
+            index[normalize(alias)] = team.id
+
+    matches = list(Match.objects.only('id', 'home_team', 'away_team'))
+    for match in matches:
+        match.home_team_ref_id = index.get(normalize(match.home_team))
+        match.away_team_ref_id = index.get(normalize(match.away_team))
+    Match.objects.bulk_update(matches, ['home_team_ref', 'away_team_ref'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0007_sync_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='away_team_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='away_matches', to='matches.team'),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='home_team_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='home_matches', to='matches.team'),
+        ),
+        migrations.CreateModel(
+            name='TeamAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('normalized_name', models.CharField(editable=False, max_length=200, unique=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='matches.team')),
+            ],
+            options={
+                'verbose_name': 'Team Alias',
+                'verbose_name_plural': 'Team Aliases',
+                'ordering': ['normalized_name'],
+            },
+        ),
+        migrations.RunPython(backfill_team_refs, migrations.RunPython.noop),
+    ]
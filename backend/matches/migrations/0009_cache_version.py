@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:30
+
+import time
+
+from django.db import migrations, models
+
+
+# Copied from matches.cache when the table was created
+NAMESPACES = ['matches', 'teams', 'predictions', 'stats']
+
+
+def create_versions(apps, schema_editor):
+    CacheVersion = apps.get_model('matches', 'CacheVersion')
+    # From the clock, past any version a shared cache may still hold payloads for
+    version = int(time.time() * 1000)
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(name=name, version=version) for name in NAMESPACES],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0008_team_refs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
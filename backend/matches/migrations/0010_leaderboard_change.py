@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:32
+
+import time
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    CacheVersion = apps.get_model('matches', 'CacheVersion')
+    # Copied from matches.rank_index.LEADERBOARD when the table was created
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(name='leaderboard', version=int(time.time() * 1000))],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0009_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardChange',
+            fields=[
+                ('version', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('since', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,60 @@
-from django.db import models
+import re
+import unicodedata
+from datetime import datetime, timedelta
+
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
 from django.utils.text import slugify
 
 
-class Team(models.Model):
+# How long after kickoff a match may still be in play
+LIVE_WINDOW = timedelta(hours=2, minutes=30)
+
+
+def combine_kickoff(match_date, match_time):
+    """Timezone-aware kickoff from the naive match_date/match_time pair"""
+    return timezone.make_aware(datetime.combine(match_date, match_time))
+
+
+def normalize_team_name(name):
+    """Team name folded for lookups: 'Atlético-MG' -> 'atletico mg'"""
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', name.lower()).split())
+
+
+# Sent once per delete() of the models below, inside its transaction and
+# before any row goes, with the queryset about to be deleted. Per-row
+# post_delete receivers would make Django delete row by row instead of
+# with one DELETE; rows removed by a cascade send nothing.
+rows_deleting = Signal()
+
+
+class BulkDeleteQuerySet(models.QuerySet):
+    """delete() announced with one rows_deleting signal for all the rows"""
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            rows_deleting.send(sender=self.model, queryset=self)
+            return super().delete()
+
+
+class BulkDeleteModel(models.Model):
+    """Instance deletes announced with rows_deleting like queryset ones"""
+
+    objects = BulkDeleteQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or self._state.db
+        with transaction.atomic(using=using):
+            rows_deleting.send(sender=type(self), queryset=type(self)._base_manager.using(using).filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
+
+class Team(BulkDeleteModel):
     """Model to store football teams"""
 
     name = models.CharField(max_length=200, unique=True)
@@ -22,6 +74,9 @@ class Team(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='team_updated_idx'),
+        ]
         verbose_name = 'Team'
         verbose_name_plural = 'Teams'
 
@@ -34,21 +89,79 @@ class Team(models.Model):
         super().save(*args, **kwargs)
 
 
-class Match(models.Model):
+class TeamAlias(BulkDeleteModel):
+    """Another name a team goes by (e.g. 'Atlético-MG' for 'Atlético Mineiro')"""
+
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name='aliases')
+    name = models.CharField(max_length=200)
+    # Folded form of name, see normalize_team_name
+    normalized_name = models.CharField(max_length=200, unique=True, editable=False)
+
+    class Meta:
+        ordering = ['normalized_name']
+        verbose_name = 'Team Alias'
+        verbose_name_plural = 'Team Aliases'
+
+    def __str__(self):
+        return f"{self.name} -> {self.team}"
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_team_name(self.name)
+        super().save(*args, **kwargs)
+
+
+class MatchQuerySet(BulkDeleteQuerySet):
+    """Kickoff range filters, each served by the (status, kickoff_at) index"""
+
+    def with_teams(self):
+        """Join the resolved teams, as MatchSerializer embeds them"""
+        return self.select_related('home_team_ref', 'away_team_ref')
+
+    def upcoming(self, days=7, now=None):
+        now = now or timezone.now()
+        return self.filter(
+            status='scheduled',
+            kickoff_at__gte=now,
+            kickoff_at__lte=now + timedelta(days=days),
+        ).order_by('kickoff_at')
+
+    def kicking_off_within(self, hours, now=None):
+        now = now or timezone.now()
+        return self.upcoming(now=now).filter(kickoff_at__lte=now + timedelta(hours=hours))
+
+    def live_window(self, now=None):
+        """Matches in play or whose kickoff was less than LIVE_WINDOW ago"""
+        now = now or timezone.now()
+        return self.filter(
+            models.Q(status='live')
+            | models.Q(status='scheduled', kickoff_at__gte=now - LIVE_WINDOW, kickoff_at__lte=now)
+        ).order_by('kickoff_at')
+
+
+class Match(BulkDeleteModel):
     """Model to store football matches"""
 
     # Match identifiers
     external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
 
-    # Teams
+    # Teams, as named by the feed, and the Team they resolve to (if known)
     home_team = models.CharField(max_length=200)
     away_team = models.CharField(max_length=200)
+    home_team_ref = models.ForeignKey(
+        Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='home_matches'
+    )
+    away_team_ref = models.ForeignKey(
+        Team, on_delete=models.SET_NULL, null=True, blank=True, related_name='away_matches'
+    )
 
     # Match details
     competition = models.CharField(max_length=200)
     match_date = models.DateField()
     match_time = models.TimeField()
 
+    # match_date + match_time as one aware datetime, kept in sync on save
+    kickoff_at = models.DateTimeField(null=True, blank=True)
+
     # Status
     STATUS_CHOICES = [
         ('scheduled', 'Agendado'),
@@ -67,16 +180,69 @@ class Match(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MatchQuerySet.as_manager()
+
     class Meta:
-        ordering = ['match_date', 'match_time']
+        ordering = ['match_date', 'match_time', 'id']
+        indexes = [
+            models.Index(fields=['status', 'kickoff_at'], name='match_status_kickoff_idx'),
+            models.Index(fields=['match_date', 'match_time', 'id'], name='match_schedule_idx'),
+            models.Index(fields=['updated_at', 'id'], name='match_updated_idx'),
+        ]
         verbose_name = 'Match'
         verbose_name_plural = 'Matches'
 
     def __str__(self):
         return f"{self.home_team} vs {self.away_team} - {self.match_date}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_teams()
+        return instance
+
+    def _remember_teams(self):
+        self._loaded_teams = {
+            side: (self.__dict__.get(f'{side}_team'), self.__dict__.get(f'{side}_team_ref_id'))
+            for side in ('home', 'away')
+        }
+
+    def save(self, *args, **kwargs):
+        from .teams import resolve_team
+
+        self.kickoff_at = combine_kickoff(self.match_date, self.match_time)
+        # A ref is resolved when missing or when the name changed, so refs
+        # set by hand (admin) survive saves and names without an alias
+        loaded = getattr(self, '_loaded_teams', {})
+        for side in ('home', 'away'):
+            name = getattr(self, f'{side}_team')
+            ref_id = getattr(self, f'{side}_team_ref_id')
+            loaded_name, loaded_ref_id = loaded.get(side, (None, None))
+            if ref_id is None or (name != loaded_name and ref_id == loaded_ref_id):
+                setattr(self, f'{side}_team_ref_id', resolve_team(name))
+        super().save(*args, **kwargs)
+        self._remember_teams()
+
+    @property
+    def accepts_predictions(self):
+        """Predictions lock at kickoff or once the match leaves 'scheduled'"""
+        if self.status != 'scheduled':
+            return False
+        return self.kickoff_at is None or self.kickoff_at > timezone.now()
 
-class Prediction(models.Model):
+    @property
+    def result(self):
+        """Final outcome ('home', 'draw' or 'away'), None until the match is finished"""
+        if self.status != 'finished' or self.home_score is None or self.away_score is None:
+            return None
+        if self.home_score > self.away_score:
+            return 'home'
+        if self.home_score < self.away_score:
+            return 'away'
+        return 'draw'
+
+
+class Prediction(BulkDeleteModel):
     """Model to store user predictions"""
 
     # User information (simplified for now)
@@ -97,6 +263,9 @@ class Prediction(models.Model):
     # Confidence level (1-5 stars)
     confidence = models.IntegerField(default=3)
 
+    # Points for a correct prediction, multiplied by confidence
+    BASE_POINTS = 10
+
     # Result tracking
     is_correct = models.BooleanField(null=True, blank=True)
     points_earned = models.IntegerField(default=0)
@@ -105,8 +274,12 @@ class Prediction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', 'id']
         unique_together = ['user_email', 'match']
+        indexes = [
+            models.Index(fields=['-created_at', 'id'], name='prediction_recent_idx'),
+            models.Index(fields=['user_email', '-created_at', 'id'], name='prediction_user_recent_idx'),
+        ]
         verbose_name = 'Prediction'
         verbose_name_plural = 'Predictions'
 
@@ -120,12 +293,11 @@ class Prediction(models.Model):
 
         if self.is_correct:
             # Base points * confidence multiplier
-            base_points = 10
-            return base_points * self.confidence
+            return self.BASE_POINTS * self.confidence
         return 0
 
 
-class UserStats(models.Model):
+class UserStats(BulkDeleteModel):
     """Model to track user statistics"""
 
     user_name = models.CharField(max_length=200)
@@ -141,7 +313,14 @@ class UserStats(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-total_points', '-correct_predictions']
+        ordering = ['-total_points', '-correct_predictions', 'id']
+        indexes = [
+            models.Index(
+                fields=['-total_points', '-correct_predictions', 'id'],
+                name='userstats_ranking_idx',
+            ),
+            models.Index(fields=['updated_at', 'id'], name='userstats_updated_idx'),
+        ]
         verbose_name = 'User Stats'
         verbose_name_plural = 'User Stats'
 
@@ -151,6 +330,112 @@ class UserStats(models.Model):
     @property
     def accuracy(self):
         """Calculate prediction accuracy percentage"""
-        if self.total_predictions == 0:
+        return self.accuracy_of(self.correct_predictions, self.total_predictions)
+
+    @staticmethod
+    def accuracy_of(correct_predictions, total_predictions):
+        if total_predictions == 0:
             return 0
-        return round((self.correct_predictions / self.total_predictions) * 100, 1)
+        return round((correct_predictions / total_predictions) * 100, 1)
+
+
+class Tombstone(models.Model):
+    """Record of a deleted row, served to delta sync clients (see matches.delta)"""
+
+    # Model label, e.g. 'matches.match'
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['model', 'deleted_at'], name='tombstone_model_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted {self.deleted_at}"
+
+
+class CacheVersion(models.Model):
+    """
+    Version counter of a response cache namespace (see matches.cache)
+
+    Kept in the database, which every web process and worker shares, and
+    incremented with UPDATE ... SET version = version + 1.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class LeaderboardChange(models.Model):
+    """
+    One bump of the leaderboard version (see matches.rank_index)
+
+    `since` is the updated_at of the UserStats rows the change wrote, None
+    when every worker must reload its index.
+    """
+
+    version = models.BigIntegerField(primary_key=True)
+    since = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"leaderboard v{self.version} since {self.since}"
+
+
+class SyncJob(models.Model):
+    """A fixture sync run of matches.sync_jobs, also the cursor of each window"""
+
+    WINDOW_CHOICES = [
+        ('upcoming', 'Próximos 7 dias'),
+        ('recent', 'Últimas 48 horas'),
+        ('season', 'Temporada completa'),
+    ]
+    window = models.CharField(max_length=20, choices=WINDOW_CHOICES)
+
+    STATUS_CHOICES = [
+        ('queued', 'Na fila'),
+        ('running', 'Em execução'),
+        ('succeeded', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # Fixture dates covered, both null for the whole season
+    date_from = models.DateField(null=True, blank=True)
+    date_to = models.DateField(null=True, blank=True)
+
+    # Metrics
+    fetched = models.IntegerField(default=0)
+    created = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    unchanged = models.IntegerField(default=0)
+    settled = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    requested_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-requested_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'requested_at'], name='syncjob_status_idx'),
+            models.Index(fields=['window', '-requested_at'], name='syncjob_window_idx'),
+        ]
+        verbose_name = 'Sync Job'
+        verbose_name_plural = 'Sync Jobs'
+
+    def __str__(self):
+        return f"{self.window} sync #{self.pk} ({self.status})"
+
+    @property
+    def duration(self):
+        """Run time in seconds, None until finished"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
@@ -0,0 +1,181 @@
+"""
+Prediction writes
+Batch submission of a whole round and idempotent create-or-edit
+"""
+
+from collections import Counter
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .cache import PREDICTIONS, bump_version
+from .models import Match, Prediction
+from .serializers import BulkPredictionSerializer
+from .stats import increment_total_predictions
+
+
+DUPLICATE_ERROR = {
+    'non_field_errors': ['The fields user_email, match must make a unique set.']
+}
+
+
+def _match_ids(items):
+    ids = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            ids.add(int(item.get('match')))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def _insert(predictions):
+    """bulk_create the predictions, falling back to row inserts on a concurrent conflict"""
+    try:
+        with transaction.atomic():
+            return Prediction.objects.bulk_create(predictions), []
+    except IntegrityError:
+        pass
+
+    created, conflicts = [], []
+    for prediction in predictions:
+        try:
+            with transaction.atomic():
+                prediction.save(force_insert=True)
+            created.append(prediction)
+        except IntegrityError:
+            prediction.pk = None
+            conflicts.append(prediction)
+    return created, conflicts
+
+
+def submit_predictions(items):
+    """
+    Validate and store a batch of predictions
+
+    Referenced matches are loaded with one query and existing predictions
+    of the batch users with another. Valid rows are inserted with a single
+    bulk_create and each user's stats are updated once. Returns one result
+    per item, in order: {'index', 'status': 'created', 'prediction'} or
+    {'index', 'status': 'error', 'errors'}.
+    """
+    matches = Match.objects.with_teams().in_bulk(list(_match_ids(items)))
+    results = [None] * len(items)
+
+    valid = []
+    for index, item in enumerate(items):
+        serializer = BulkPredictionSerializer(data=item, context={'matches': matches})
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    emails = {data['user_email'] for _, data in valid if data.get('user_email')}
+    existing = set(
+        Prediction.objects.filter(
+            user_email__in=emails,
+            match_id__in=[data['match'].pk for _, data in valid],
+        ).values_list('user_email', 'match_id')
+    ) if emails else set()
+
+    pending = []
+    for index, data in valid:
+        key = (data.get('user_email'), data['match'].pk)
+        if key[0] and key in existing:
+            results[index] = {'index': index, 'status': 'error', 'errors': DUPLICATE_ERROR}
+            continue
+        existing.add(key)
+        pending.append((index, Prediction(**data)))
+
+    with transaction.atomic():
+        created, conflicts = _insert([prediction for _, prediction in pending])
+        if created:
+            bump_version(PREDICTIONS)
+
+        counts = Counter()
+        names = {}
+        for prediction in created:
+            if prediction.user_email:
+                counts[prediction.user_email] += 1
+                names[prediction.user_email] = prediction.user_name
+        for user_email, count in counts.items():
+            increment_total_predictions(user_email, names[user_email], count)
+
+    conflicts = {id(prediction) for prediction in conflicts}
+    for index, prediction in pending:
+        if id(prediction) in conflicts:
+            results[index] = {'index': index, 'status': 'error', 'errors': DUPLICATE_ERROR}
+        else:
+            results[index] = {'index': index, 'status': 'created', 'prediction': prediction}
+
+    return results
+
+
+# Columns written by upsert_prediction; the last three only matter on insert
+UPSERT_FIELDS = ['user_name', 'user_email', 'match', 'prediction', 'confidence']
+UPSERT_INSERT_ONLY_FIELDS = ['is_correct', 'points_earned', 'created_at']
+UPSERT_INSERT_SQL = (
+    'INSERT INTO {table} ({columns}) VALUES ({placeholders}) '
+    'ON CONFLICT ({user_email}, {match}) DO NOTHING RETURNING *'
+)
+UPSERT_UPDATE_SQL = 'UPDATE {table} SET {updates} WHERE {user_email} = %s AND {match} = %s RETURNING *'
+
+
+def upsert_prediction(data):
+    """
+    Create or edit the prediction of a user for a match
+
+    INSERT ... ON CONFLICT (user_email, match_id) DO NOTHING writes a new
+    row; when it returns nothing the pair exists and an UPDATE edits it.
+    Whether the prediction was created comes from the write itself, and
+    both statements take the write lock first, so concurrent upserts queue
+    instead of failing. The user's total_predictions is only incremented
+    on a true insert. Returns (prediction, created).
+    """
+    opts = Prediction._meta
+    quote = connection.ops.quote_name
+    prediction = Prediction(**data, created_at=timezone.now())
+
+    fields = [opts.get_field(name) for name in UPSERT_FIELDS + UPSERT_INSERT_ONLY_FIELDS]
+    params = {
+        field.name: field.get_db_prep_save(getattr(prediction, field.attname), connection)
+        for field in fields
+    }
+    key = ['user_email', 'match']
+    edited = [field for field in fields[:len(UPSERT_FIELDS)] if field.name not in key]
+    names = {
+        'table': quote(opts.db_table),
+        'user_email': quote(opts.get_field('user_email').column),
+        'match': quote(opts.get_field('match').column),
+    }
+    insert_sql = UPSERT_INSERT_SQL.format(
+        columns=', '.join(quote(field.column) for field in fields),
+        placeholders=', '.join(['%s'] * len(fields)),
+        **names,
+    )
+    update_sql = UPSERT_UPDATE_SQL.format(
+        updates=', '.join(f'{quote(field.column)} = %s' for field in edited),
+        **names,
+    )
+
+    with transaction.atomic():
+        while True:
+            rows = list(Prediction.objects.raw(insert_sql, list(params.values())))
+            created = bool(rows)
+            if not created:
+                rows = list(Prediction.objects.raw(
+                    update_sql,
+                    [params[field.name] for field in edited] + [params[name] for name in key],
+                ))
+            # Empty only if the row was deleted between the two statements
+            if rows:
+                break
+        prediction = rows[0]
+        bump_version(PREDICTIONS)
+        if created:
+            increment_total_predictions(prediction.user_email, prediction.user_name)
+
+    prediction.match = data['match']
+    return prediction, created
@@ -0,0 +1,241 @@
+"""
+In-process leaderboard index
+An order-statistic structure over UserStats answering rank lookups in O(log n)
+
+Each worker loads the index once and keeps it current through a version
+counter stored in the database with the response cache versions (see
+matches.cache): every change to UserStats bumps the version and records
+since when rows changed (LeaderboardChange), and readers apply only the
+rows updated since then. Web processes and the sync_worker and
+live_poller commands all see the same counter.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Min, Q
+from sortedcontainers import SortedList
+
+from .cache import get_version, increment_version
+from .models import LeaderboardChange, UserStats
+
+
+# Name of the leaderboard's CacheVersion
+LEADERBOARD = 'leaderboard'
+
+# Beyond this many pending changes a full reload is cheaper than replaying
+# them, older changes are deleted
+MAX_REPLAYED_CHANGES = 1000
+
+_END = float('inf')
+
+
+class LeaderboardIndex:
+    """
+    Sorted UserStats keys (-total_points, -correct_predictions, id)
+
+    Positions follow the database RANK()/DENSE_RANK() semantics: a user's
+    position is one plus the number of users strictly ahead of them.
+
+    An index returned by get_leaderboard_index is never modified again, so
+    it can be read without locking; refreshes work on a copy.
+    """
+
+    def __init__(self):
+        self._entries = SortedList()
+        self._scores = SortedList()
+        self._score_counts = {}
+        self._keys = {}
+        self._ids_by_email = {}
+        self.version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, rows):
+        """Replace the contents with (id, user_email, total_points, correct_predictions) rows"""
+        keys = {}
+        ids_by_email = {}
+        score_counts = {}
+        for stats_id, user_email, total_points, correct_predictions in rows:
+            score = (-total_points, -correct_predictions)
+            keys[stats_id] = score + (stats_id,)
+            ids_by_email[user_email] = stats_id
+            score_counts[score] = score_counts.get(score, 0) + 1
+
+        self._entries = SortedList(keys.values())
+        self._scores = SortedList(score_counts)
+        self._score_counts = score_counts
+        self._keys = keys
+        self._ids_by_email = ids_by_email
+
+    def copy(self):
+        index = LeaderboardIndex()
+        index._entries = self._entries.copy()
+        index._scores = self._scores.copy()
+        index._score_counts = dict(self._score_counts)
+        index._keys = dict(self._keys)
+        index._ids_by_email = dict(self._ids_by_email)
+        index.version = self.version
+        return index
+
+    def upsert(self, stats_id, user_email, total_points, correct_predictions):
+        key = (-total_points, -correct_predictions, stats_id)
+        if self._keys.get(stats_id) == key:
+            return
+        self.remove(stats_id)
+        self._entries.add(key)
+        self._keys[stats_id] = key
+        self._ids_by_email[user_email] = stats_id
+        score = key[:2]
+        if score not in self._score_counts:
+            self._score_counts[score] = 0
+            self._scores.add(score)
+        self._score_counts[score] += 1
+
+    def remove(self, stats_id):
+        key = self._keys.pop(stats_id, None)
+        if key is None:
+            return
+        self._entries.remove(key)
+        score = key[:2]
+        self._score_counts[score] -= 1
+        if not self._score_counts[score]:
+            del self._score_counts[score]
+            self._scores.remove(score)
+
+    def _positions(self, key):
+        score = key[:2]
+        return (
+            self._entries.bisect_left(score) + 1,
+            self._scores.bisect_left(score) + 1,
+        )
+
+    def _ranked(self, keys):
+        return [(key[2],) + self._positions(key) for key in keys]
+
+    def _group_end(self, index):
+        """Index right after the last entry tied with the entry at `index`"""
+        score = self._entries[index][:2]
+        return self._entries.bisect_right(score + (_END,))
+
+    def position(self, user_email):
+        """(position, dense_position) of a user, None if not indexed"""
+        stats_id = self._ids_by_email.get(user_email)
+        if stats_id is None or stats_id not in self._keys:
+            return None
+        return self._positions(self._keys[stats_id])
+
+    def rank_range(self, limit=10, offset=0, rank_from=None, rank_to=None):
+        """(id, position, dense_position) rows, filtered like leaderboard.db_rank_range"""
+        start, end = 0, len(self._entries)
+        if rank_from is not None and rank_from > 1:
+            start = rank_from - 1
+            if start < end and self._positions(self._entries[start])[0] < rank_from:
+                # Entry belongs to a tie group that starts before rank_from
+                start = self._group_end(start)
+        if rank_to is not None:
+            if rank_to < 1:
+                end = 0
+            elif rank_to < end:
+                end = self._group_end(rank_to - 1)
+        start = min(start + offset, end)
+        end = min(start + limit, end)
+        return self._ranked(self._entries[start:end])
+
+    def around(self, user_email, span=5):
+        """(id, position, dense_position) rows of a user and up to `span` neighbours, None if not indexed"""
+        stats_id = self._ids_by_email.get(user_email)
+        if stats_id is None or stats_id not in self._keys:
+            return None
+        index = self._entries.index(self._keys[stats_id])
+        return self._ranked(self._entries[max(0, index - span):index + span + 1])
+
+    def apply(self, rows):
+        for row in rows:
+            self.upsert(*row)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _rows(queryset):
+    return queryset.values_list(
+        'id', 'user_email', 'total_points', 'correct_predictions'
+    ).iterator(chunk_size=10000)
+
+
+def _changes_since(index, version):
+    """Oldest change timestamp between the index version and `version`, None to reload"""
+    if index.version is None or version < index.version:
+        return None
+    if version - index.version > MAX_REPLAYED_CHANGES:
+        return None
+    changes = LeaderboardChange.objects.filter(
+        version__gt=index.version, version__lte=version,
+    ).aggregate(count=Count('pk'), reloads=Count('pk', filter=Q(since=None)), since=Min('since'))
+    if changes['count'] != version - index.version or changes['reloads']:
+        return None
+    return changes['since']
+
+
+def get_leaderboard_index():
+    """
+    The worker's leaderboard index, refreshed if stats changed since last use
+
+    Returns None when the index is disabled or cannot be loaded, callers
+    then fall back to database queries.
+    """
+    global _index
+
+    if not getattr(settings, 'LEADERBOARD_INDEX_ENABLED', True):
+        return None
+
+    version = get_version(LEADERBOARD)
+    with _lock:
+        if _index is not None and _index.version == version:
+            return _index
+        # Readers may still hold the current index, changes go to a new one
+        # that replaces it once complete
+        try:
+            since = _changes_since(_index, version) if _index is not None else None
+            if since is None:
+                index = LeaderboardIndex()
+                index.load(_rows(UserStats.objects.all()))
+            else:
+                index = _index.copy()
+                index.apply(_rows(UserStats.objects.filter(updated_at__gte=since)))
+        except DatabaseError:
+            _index = None
+            return None
+        index.version = version
+        _index = index
+        return _index
+
+
+def reset_leaderboard_index():
+    """Drop the worker's index, the next lookup loads it again"""
+    global _index
+    with _lock:
+        _index = None
+
+
+def _bump_version(since):
+    # The change is visible with the version that announces it
+    with transaction.atomic():
+        version = increment_version(LEADERBOARD)
+        LeaderboardChange.objects.create(version=version, since=since)
+        LeaderboardChange.objects.filter(version__lte=version - MAX_REPLAYED_CHANGES).delete()
+
+
+def notify_stats_changed(since=None):
+    """
+    Tell every worker that UserStats rows changed
+
+    `since` is the updated_at written by the change, rows updated from then
+    on are re-read. None forces a full reload (e.g. after deletions). The
+    bump is deferred until the surrounding transaction commits.
+    """
+    transaction.on_commit(lambda: _bump_version(since))
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Match, Prediction, UserStats, Team
+
+from core.rows import RowMapper
+
+from .models import Match, Prediction, SyncJob, UserStats, Team
 
 
 class TeamSerializer(serializers.ModelSerializer):
@@ -21,8 +24,23 @@ class TeamSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
 
 
+class MatchTeamSerializer(serializers.ModelSerializer):
+    """Team embedded in a match, for crests and colors"""
+
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'slug', 'short_name', 'logo_url', 'primary_color', 'secondary_color']
+        read_only_fields = fields
+
+
 class MatchSerializer(serializers.ModelSerializer):
-    """Serializer for Match model"""
+    """
+    Serializer for Match model
+    home_team/away_team keep the API's spelling; the *_details resolve them
+    to Team rows (null when unknown), so select_related the refs.
+    """
+    home_team_details = MatchTeamSerializer(source='home_team_ref', read_only=True)
+    away_team_details = MatchTeamSerializer(source='away_team_ref', read_only=True)
 
     class Meta:
         model = Match
@@ -30,15 +48,18 @@ class MatchSerializer(serializers.ModelSerializer):
             'id',
             'home_team',
             'away_team',
+            'home_team_details',
+            'away_team_details',
             'competition',
             'match_date',
             'match_time',
+            'kickoff_at',
             'status',
             'home_score',
             'away_score',
             'external_id',
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'kickoff_at']
 
 
 class PredictionSerializer(serializers.ModelSerializer):
@@ -62,6 +83,51 @@ class PredictionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'is_correct', 'points_earned', 'created_at']
 
+    def validate(self, attrs):
+        match = attrs.get('match') or getattr(self.instance, 'match', None)
+        if match is not None and not match.accepts_predictions:
+            raise serializers.ValidationError({'match': 'Predictions are closed for this match.'})
+        return attrs
+
+
+class PreloadedMatchField(serializers.PrimaryKeyRelatedField):
+    """Resolves match ids against the matches preloaded in context['matches']"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        match = self.context['matches'].get(pk)
+        if match is None:
+            self.fail('does_not_exist', pk_value=data)
+        return match
+
+
+class BulkPredictionSerializer(PredictionSerializer):
+    """
+    Validates one prediction of a batch
+    Matches come from a single preloaded query and duplicates are checked
+    for the whole batch at once, so validating an item runs no queries.
+    """
+
+    match = PreloadedMatchField(queryset=Match.objects.all())
+
+    class Meta(PredictionSerializer.Meta):
+        validators = []
+
+
+class PredictionUpsertSerializer(PredictionSerializer):
+    """Validates a create-or-edit of the prediction keyed on (user_email, match)"""
+
+    user_email = serializers.EmailField(max_length=254)
+
+    class Meta(PredictionSerializer.Meta):
+        # An existing (user_email, match) pair is edited, not rejected
+        validators = []
+
 
 class UserStatsSerializer(serializers.ModelSerializer):
     """Serializer for UserStats model"""
@@ -82,3 +148,50 @@ class UserStatsSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         read_only_fields = ['id', 'total_predictions', 'correct_predictions', 'total_points', 'created_at', 'updated_at']
+
+
+class RankedUserStatsSerializer(UserStatsSerializer):
+    """UserStats with its leaderboard position (RANK) and dense position (DENSE_RANK)"""
+
+    position = serializers.IntegerField(read_only=True)
+    dense_position = serializers.IntegerField(read_only=True)
+
+    class Meta(UserStatsSerializer.Meta):
+        fields = UserStatsSerializer.Meta.fields + ['position', 'dense_position']
+
+
+class SyncJobSerializer(serializers.ModelSerializer):
+    """Serializer for SyncJob model, read-only"""
+
+    duration = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = SyncJob
+        fields = [
+            'id',
+            'window',
+            'status',
+            'date_from',
+            'date_to',
+            'fetched',
+            'created',
+            'updated',
+            'unchanged',
+            'settled',
+            'error',
+            'requested_at',
+            'started_at',
+            'finished_at',
+            'duration',
+        ]
+        read_only_fields = fields
+
+
+# .values() read paths of the hot lists, same payloads as the serializers
+MATCH_ROWS = RowMapper(MatchSerializer)
+PREDICTION_ROWS = RowMapper(PredictionSerializer)
+TEAM_ROWS = RowMapper(TeamSerializer)
+USER_STATS_ROWS = RowMapper(UserStatsSerializer, computed={
+    'accuracy': lambda row: UserStats.accuracy_of(row['correct_predictions'], row['total_predictions']),
+})
+RANKED_USER_STATS_ROWS = RowMapper(RankedUserStatsSerializer, computed=USER_STATS_ROWS.computed)
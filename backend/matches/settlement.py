@@ -0,0 +1,112 @@
+"""
+Prediction settlement
+Scores every prediction of a finished match with set-based updates
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from .cache import PREDICTIONS, STATS, bump_version
+from .models import Match, Prediction, UserStats
+from .rank_index import notify_stats_changed
+
+
+def _apply_stats(predictions, sign, now):
+    """Add (sign=1) or remove (sign=-1) the points of correct predictions in one UPDATE"""
+    correct = predictions.filter(is_correct=True)
+    # unique_together guarantees at most one prediction per user and match
+    points = Subquery(
+        correct.filter(user_email=OuterRef('user_email')).values('points_earned')[:1]
+    )
+    return UserStats.objects.filter(user_email__in=correct.values('user_email')).update(
+        correct_predictions=F('correct_predictions') + sign,
+        total_points=F('total_points') + sign * points,
+        updated_at=now,
+    )
+
+
+def settle_match(match):
+    """
+    Settle all predictions of a finished match
+
+    The outcome is computed once, then every prediction is scored with a
+    single UPDATE and the UserStats deltas are applied with one aggregate
+    UPDATE. Settling again (e.g. after a score correction) first reverts
+    the previous deltas, so the operation is idempotent.
+    Returns None when the match has no final result yet.
+    """
+    with transaction.atomic():
+        match = Match.objects.select_for_update().get(pk=match.pk)
+        outcome = match.result
+        if outcome is None:
+            return None
+
+        now = timezone.now()
+        predictions = Prediction.objects.filter(match=match)
+
+        _apply_stats(predictions, -1, now)
+
+        settled = predictions.update(
+            is_correct=Case(
+                When(prediction=outcome, then=Value(True)),
+                default=Value(False),
+            ),
+            points_earned=Case(
+                When(prediction=outcome, then=F('confidence') * Prediction.BASE_POINTS),
+                default=Value(0),
+            ),
+        )
+
+        users_updated = _apply_stats(predictions, 1, now)
+        notify_stats_changed(now)
+        bump_version(PREDICTIONS, STATS)
+
+    return {
+        'match': match.pk,
+        'outcome': outcome,
+        'settled': settled,
+        'users_updated': users_updated,
+    }
+
+
+def unsettle_match(match):
+    """
+    Revert the settlement of a match that is no longer finished
+
+    The points of its correct predictions are taken back from UserStats and
+    every prediction is marked unsettled again.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        predictions = Prediction.objects.filter(match=match)
+        users_updated = _apply_stats(predictions, -1, now)
+        predictions.update(is_correct=None, points_earned=0)
+        notify_stats_changed(now)
+        bump_version(PREDICTIONS, STATS)
+    return users_updated
+
+
+def settle_edited_match(match, previous_outcome):
+    """
+    Keep predictions in line with a match edited by hand
+
+    `previous_outcome` is match.result before the edit. Predictions are
+    settled again when the outcome changed, and unsettled when the match
+    is no longer finished; a score edit that keeps the winner costs nothing.
+    """
+    if match.result == previous_outcome:
+        return None
+    if match.result is None:
+        return unsettle_match(match)
+    return settle_match(match)
+
+
+def settle_matches(matches):
+    """Settle several matches, skipping those without a final result"""
+    results = []
+    for match in matches:
+        result = settle_match(match)
+        if result is not None:
+            results.append(result)
+    return results
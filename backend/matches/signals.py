@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .cache import MATCHES, PREDICTIONS, STATS, TEAMS, bump_version
+from .delta import record_deletions
+from .models import Match, Prediction, Team, TeamAlias, UserStats, rows_deleting
+from .rank_index import notify_stats_changed
+from .teams import team_names_changed
+
+
+# Cache namespace invalidated by writes to each model
+NAMESPACES = {
+    Match: MATCHES,
+    Team: TEAMS,
+    TeamAlias: TEAMS,
+    Prediction: PREDICTIONS,
+    UserStats: STATS,
+}
+
+# Namespaces of the rows that go with them: predictions cascade with their
+# match, teams leave their matches without a ref
+DELETED_WITH = {
+    Match: [PREDICTIONS],
+    Team: [MATCHES],
+}
+
+
+def model_changed(sender, **kwargs):
+    bump_version(NAMESPACES[sender])
+
+
+for model in NAMESPACES:
+    post_save.connect(model_changed, sender=model, dispatch_uid=f'cache_{model.__name__}_saved')
+
+
+# Models served in delta mode (matches.delta.DeltaSyncMixin)
+TRACKED_DELETIONS = [Match, Team, UserStats]
+
+
+@receiver(rows_deleting)
+def rows_deleted(sender, queryset, **kwargs):
+    """Deletes are handled once per delete() call, see models.rows_deleting"""
+    bump_version(NAMESPACES[sender], *DELETED_WITH.get(sender, []))
+    if sender in TRACKED_DELETIONS:
+        record_deletions(queryset)
+    if sender in (Team, TeamAlias):
+        team_names_changed()
+    if sender is UserStats:
+        notify_stats_changed()
+
+
+def team_names_saved(sender, **kwargs):
+    team_names_changed()
+
+
+for model in (Team, TeamAlias):
+    post_save.connect(team_names_saved, sender=model, dispatch_uid=f'team_index_{model.__name__}_saved')
+
+
+@receiver(post_save, sender=UserStats)
+def user_stats_saved(sender, instance, **kwargs):
+    notify_stats_changed(instance.updated_at)
@@ -0,0 +1,41 @@
+"""
+UserStats counters
+Increments are done in the database so concurrent workers never lose updates
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import STATS, bump_version
+from .models import UserStats
+
+
+def increment_total_predictions(user_email, user_name, count=1):
+    """
+    Add `count` to a user's total_predictions, creating their stats if needed
+
+    The common case is a single UPDATE ... SET total_predictions =
+    total_predictions + count. A first prediction inserts the row instead,
+    and if another worker inserted it meanwhile the UPDATE is retried.
+    Call it inside the transaction that stores the predictions.
+    """
+    def increment():
+        return UserStats.objects.filter(user_email=user_email).update(
+            total_predictions=F('total_predictions') + count,
+            updated_at=timezone.now(),
+        )
+
+    if increment():
+        bump_version(STATS)
+        return
+    try:
+        with transaction.atomic():
+            UserStats.objects.create(
+                user_email=user_email,
+                user_name=user_name,
+                total_predictions=count,
+            )
+    except IntegrityError:
+        increment()
+        bump_version(STATS)
@@ -0,0 +1,147 @@
+"""
+Match sync pipeline
+Shared by the sync_from_api endpoint and the populate scripts
+"""
+
+from datetime import date, time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import MATCHES, bump_version
+from .models import Match, combine_kickoff
+from .settlement import settle_matches, unsettle_match
+from .teams import get_team_index, resolve_team
+
+
+# Fields owned by the external feed; anything else on Match is left alone
+SYNC_FIELDS = [
+    'home_team',
+    'away_team',
+    'competition',
+    'match_date',
+    'match_time',
+    'kickoff_at',
+    'home_team_ref_id',
+    'away_team_ref_id',
+]
+
+# Only written when the feed reports them, so scores entered by hand survive
+# feeds without results, and schedules without a status do not move played
+# matches back to 'scheduled' (new matches get the model default)
+SCORE_FIELDS = ['home_score', 'away_score']
+OPTIONAL_FIELDS = ['status'] + SCORE_FIELDS
+
+
+def _parse_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def _parse_time(value):
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(value)
+
+
+def normalize_match_data(match_data, team_index=None):
+    """Convert a normalized API dict into Match field values"""
+    match_date = _parse_date(match_data['match_date'])
+    match_time = _parse_time(match_data['match_time'])
+    values = {
+        'external_id': match_data.get('external_id'),
+        'home_team': match_data['home_team'],
+        'away_team': match_data['away_team'],
+        'competition': match_data['competition'],
+        'match_date': match_date,
+        'match_time': match_time,
+        'kickoff_at': combine_kickoff(match_date, match_time),
+        'home_team_ref_id': resolve_team(match_data['home_team'], team_index),
+        'away_team_ref_id': resolve_team(match_data['away_team'], team_index),
+    }
+    for field in OPTIONAL_FIELDS:
+        if field in match_data:
+            values[field] = match_data[field]
+    return values
+
+
+def sync_matches(matches_data):
+    """
+    Upsert a batch of fixtures in a fixed number of queries
+
+    Existing rows are loaded with a single query on external_id and diffed
+    in memory. New and changed rows are then written with one
+    INSERT ... ON CONFLICT (external_id) DO UPDATE inside a transaction.
+    Matches that just moved to 'finished', or whose final score was
+    corrected, get their predictions settled, and matches the feed moves
+    back out of 'finished' get them unsettled.
+    Returns the created/updated/unchanged/settled counts.
+    """
+    team_index = get_team_index()
+    incoming = {}
+    without_id = []
+    for match_data in matches_data:
+        values = normalize_match_data(match_data, team_index)
+        if values['external_id']:
+            # Last occurrence wins, a single upsert cannot touch a row twice
+            incoming[values['external_id']] = values
+        else:
+            without_id.append(values)
+
+    existing = Match.objects.in_bulk(list(incoming), field_name='external_id')
+
+    to_write = [Match(**values) for values in without_id]
+    created_count = len(without_id)
+    updated_count = 0
+    unchanged_count = 0
+    finished = []
+    unfinished = []
+
+    for external_id, values in incoming.items():
+        match = existing.get(external_id)
+        if match is None:
+            to_write.append(Match(**values))
+            created_count += 1
+            continue
+
+        fields = SYNC_FIELDS + [field for field in OPTIONAL_FIELDS if field in values]
+        if all(getattr(match, field) == values[field] for field in fields):
+            unchanged_count += 1
+            continue
+
+        rescored = any(getattr(match, field) != values[field] for field in fields if field in SCORE_FIELDS)
+        for field in OPTIONAL_FIELDS:
+            values.setdefault(field, getattr(match, field))
+        to_write.append(Match(**values))
+        updated_count += 1
+        # Result corrections re-settle matches that were already finished
+        if values['status'] == 'finished' and (match.status != 'finished' or rescored):
+            finished.append(external_id)
+        elif values['status'] != 'finished' and match.status == 'finished':
+            unfinished.append(match)
+
+    if to_write:
+        now = timezone.now()
+        for match in to_write:
+            match.updated_at = now
+        with transaction.atomic():
+            Match.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=['external_id'],
+                update_fields=SYNC_FIELDS + OPTIONAL_FIELDS + ['updated_at'],
+            )
+            bump_version(MATCHES)
+
+    for match in unfinished:
+        unsettle_match(match)
+    settled = settle_matches(Match.objects.filter(external_id__in=finished)) if finished else []
+
+    return {
+        'created': created_count,
+        'updated': updated_count,
+        'unchanged': unchanged_count,
+        'total': created_count + updated_count + unchanged_count,
+        'settled': len(settled),
+    }
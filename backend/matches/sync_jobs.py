@@ -0,0 +1,111 @@
+"""
+Scheduled fixture syncs
+Run by the sync_worker command outside the web workers. Only the date
+windows that can still change are synced: the coming week hourly, the past
+48 hours hourly for late results and corrections, the whole season nightly.
+SyncJob rows are both the queue and the per-window cursor.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .external_api import FootballAPI
+from .models import SyncJob
+from .sync import sync_matches
+
+
+# Window: (how often it is synced, days before and after today, None for the season)
+WINDOWS = {
+    'upcoming': (timedelta(hours=1), (0, 7)),
+    'recent': (timedelta(hours=1), (2, 0)),
+    'season': (timedelta(days=1), None),
+}
+
+
+def window_dates(window, today=None):
+    """(date_from, date_to) of a window, (None, None) for the whole season"""
+    _, days = WINDOWS[window]
+    if days is None:
+        return None, None
+    today = today or timezone.localdate()
+    before, after = days
+    return today - timedelta(days=before), today + timedelta(days=after)
+
+
+def enqueue_sync(window, now=None):
+    """Queue a sync of `window`, reusing the queued job of that window if any"""
+    job = SyncJob.objects.filter(window=window, status='queued').first()
+    if job is not None:
+        return job
+    now = now or timezone.now()
+    date_from, date_to = window_dates(window, timezone.localdate(now))
+    return SyncJob.objects.create(window=window, date_from=date_from, date_to=date_to, requested_at=now)
+
+
+def due_windows(now=None):
+    """Windows whose last job was requested more than their interval ago"""
+    now = now or timezone.now()
+    last = dict(
+        SyncJob.objects.values('window').annotate(last=Max('requested_at')).values_list('window', 'last')
+    )
+    return [
+        window for window, (interval, _) in WINDOWS.items()
+        if window not in last or now - last[window] >= interval
+    ]
+
+
+def claim_next_job():
+    """Mark the oldest queued job running and return it, None when the queue is empty"""
+    while True:
+        job = SyncJob.objects.filter(status='queued').order_by('requested_at', 'id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        # Conditional update, so two workers never run the same job
+        if SyncJob.objects.filter(pk=job.pk, status='queued').update(status='running', started_at=now):
+            job.status, job.started_at = 'running', now
+            return job
+
+
+def run_job(job, api=None):
+    """Fetch the job's window and sync it, recording metrics or the error"""
+    api = api or FootballAPI()
+    try:
+        fixtures = api.get_fixtures(job.date_from, job.date_to)
+        result = sync_matches(fixtures)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = f'{type(e).__name__}: {e}'
+    else:
+        job.status = 'succeeded'
+        job.fetched = len(fixtures)
+        for field in ('created', 'updated', 'unchanged', 'settled'):
+            setattr(job, field, result[field])
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def fail_interrupted_jobs():
+    """Jobs left running by a worker that died, to be called when a worker starts"""
+    return SyncJob.objects.filter(status='running').update(
+        status='failed',
+        error='Interrupted',
+        finished_at=timezone.now(),
+    )
+
+
+def run_pending(api=None, now=None):
+    """Queue the due windows, then run every queued job; returns the jobs run"""
+    for window in due_windows(now):
+        enqueue_sync(window, now)
+
+    api = api or FootballAPI()
+    jobs = []
+    while True:
+        job = claim_next_job()
+        if job is None:
+            return jobs
+        jobs.append(run_job(job, api))
@@ -0,0 +1,88 @@
+"""
+Team name resolution
+Feeds and the ranking app spell team names differently ('Atlético Mineiro',
+'Atlético-MG'). Names, short names and aliases are folded with
+normalize_team_name into one in-process dict, so resolving a name is a
+single lookup. The dict is rebuilt when teams or aliases change.
+"""
+
+import threading
+
+from django.db import transaction
+
+from .cache import TEAMS, get_version
+from .models import Team, normalize_team_name
+
+
+# Spellings used by the external API and ranking.models.TIMES_SERIE_A that
+# accent, case and punctuation folding alone do not match
+DEFAULT_ALIASES = {
+    'Athletico Paranaense': ['Athletico-PR', 'Atletico Paranaense'],
+    'Atlético Mineiro': ['Atlético-MG'],
+    'Red Bull Bragantino': ['Bragantino', 'RB Bragantino'],
+    'Vasco': ['Vasco da Gama'],
+}
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+# Whether this thread's open transaction wrote teams or aliases
+_local = threading.local()
+
+
+def build_team_index():
+    """{normalized name: team id} of every name, short name and alias, in one query"""
+    rows = list(Team.objects.values_list('id', 'name', 'short_name', 'aliases__normalized_name'))
+    index = {}
+    for team_id, name, short_name, _ in rows:
+        if short_name:
+            index.setdefault(normalize_team_name(short_name), team_id)
+    for team_id, name, _, _ in rows:
+        index[normalize_team_name(name)] = team_id
+    # Aliases are explicit and win over anything derived
+    index.update((alias, team_id) for team_id, _, _, alias in rows if alias)
+    return index
+
+
+def get_team_index():
+    """The process' team index, rebuilt when the teams namespace version moved"""
+    global _index, _index_version
+
+    if getattr(_local, 'pending', False):
+        if not transaction.get_autocommit():
+            # Would hold names that may still be rolled back, so it is not kept
+            return build_team_index()
+        # The transaction ended without committing, nothing was cached meanwhile
+        _local.pending = False
+
+    version = get_version(TEAMS)
+    with _lock:
+        if _index is None or _index_version != version:
+            _index = build_team_index()
+            _index_version = version
+        return _index
+
+
+def team_names_changed():
+    """Drop the index after a team or alias write, again once its transaction commits"""
+    reset_team_index()
+    if not transaction.get_autocommit():
+        _local.pending = True
+        transaction.on_commit(reset_team_index)
+
+
+def reset_team_index():
+    """Rebuild on next use and forget this thread's uncommitted team writes"""
+    global _index
+    _local.pending = False
+    with _lock:
+        _index = None
+
+
+def resolve_team(name, index=None):
+    """Id of the Team called `name`, None if unknown"""
+    if not name:
+        return None
+    if index is None:
+        index = get_team_index()
+    return index.get(normalize_team_name(name))
@@ -1,3 +1,2153 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from io import StringIO
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+from core.streaming import StreamingListMixin
+from core.testing import QueryBudgetMixin
+from ranking.models import Jogo, Palpite
+
+from .admin import MatchAdmin
+from .api_cache import APIResponseCache
+from .cache import STATS, TEAMS, bump_version
+from .external_api import FootballAPI, FootballAPIError, FootballAPIQuotaExceeded
+from .exports import DATASETS, Export, ExportError
+from .events import SCORES, Broadcaster, Subscription, broadcaster
+from .external_api import normalize_fixture
+from .live import IDLE_INTERVAL, LIVE_INTERVAL, next_poll_in, poll_live_matches
+from .models import LIVE_WINDOW, CacheVersion, Match, Prediction, SyncJob, Team, TeamAlias, Tombstone, UserStats, combine_kickoff, normalize_team_name
+from .leaderboard import rank_range, rank_range_values
+from .rank_index import LeaderboardIndex, get_leaderboard_index, notify_stats_changed, reset_leaderboard_index
+from .serializers import (
+    MATCH_ROWS, PREDICTION_ROWS, RANKED_USER_STATS_ROWS, TEAM_ROWS, USER_STATS_ROWS,
+    MatchSerializer, PredictionSerializer, RankedUserStatsSerializer, TeamSerializer, UserStatsSerializer,
+)
+from .settlement import settle_match
+from .stats import increment_total_predictions
+from .sync import sync_matches
+from .sync_jobs import due_windows, enqueue_sync, run_pending, window_dates
+from .teams import build_team_index, reset_team_index, resolve_team
+
+
+# Predictions are only accepted before kickoff
+FUTURE_DATE = date.today() + timedelta(days=3)
+
+
+def make_fixture(index, **overrides):
+    fixture = {
+        'home_team': f'Home {index}',
+        'away_team': f'Away {index}',
+        'competition': 'Brasileirão Série A',
+        'match_date': (date(2025, 4, 1) + timedelta(days=index % 200)).isoformat(),
+        'match_time': '19:00:00',
+        'status': 'scheduled',
+        'external_id': f'fixture_{index}',
+    }
+    fixture.update(overrides)
+    return fixture
+
+
+class SyncMatchesTests(TestCase):
+
+    def setUp(self):
+        # Teams written by earlier tests were never committed
+        reset_team_index()
+
+    def test_creates_new_matches(self):
+        result = sync_matches([make_fixture(i) for i in range(3)])
+
+        self.assertEqual(result, {'created': 3, 'updated': 0, 'unchanged': 0, 'total': 3, 'settled': 0})
+        match = Match.objects.get(external_id='fixture_1')
+        self.assertEqual(match.match_date, date(2025, 4, 2))
+        self.assertEqual(match.match_time, time(19, 0))
+
+    def test_reports_updated_and_unchanged(self):
+        sync_matches([make_fixture(i) for i in range(3)])
+        created_at = Match.objects.get(external_id='fixture_0').created_at
+
+        result = sync_matches([
+            make_fixture(0, status='postponed'),
+            make_fixture(1),
+            make_fixture(2),
+            make_fixture(3),
+        ])
+
+        self.assertEqual(result, {'created': 1, 'updated': 1, 'unchanged': 2, 'total': 4, 'settled': 0})
+        match = Match.objects.get(external_id='fixture_0')
+        self.assertEqual(match.status, 'postponed')
+        self.assertEqual(match.created_at, created_at)
+        self.assertEqual(Match.objects.count(), 4)
+
+    def test_season_sync_runs_in_constant_queries(self):
+        fixtures = [make_fixture(i) for i in range(380)]
+        # SQLite caps bound parameters, so the upsert may be split in a few batches
+        with CaptureQueriesContext(connection) as queries:
+            sync_matches(fixtures)
+        self.assertLessEqual(len(queries), 11)
+
+        # Each run also reads the teams version of the team index
+        fixtures[0]['status'] = 'postponed'
+        with self.assertNumQueries(5):
+            result = sync_matches(fixtures)
+        self.assertEqual(result['updated'], 1)
+
+        with self.assertNumQueries(2):
+            result = sync_matches(fixtures)
+        self.assertEqual(result['unchanged'], 380)
+
+    def test_sync_endpoint_queues_a_job_for_the_worker(self):
+        response = self.client.post('/api/matches/sync_from_api/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Match.objects.count(), 0)
+        job = response.json()['job']
+        self.assertEqual((job['window'], job['status']), ('upcoming', 'queued'))
+        # A second request joins the queued job
+        self.assertEqual(self.client.post('/api/matches/sync_from_api/').json()['job']['id'], job['id'])
+
+        call_command('sync_worker', once=True, stdout=StringIO())
+
+        job = self.client.get(response['Location']).json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['created'], 10)
+        self.assertEqual(Match.objects.count(), 10)
+
+    def test_feed_scores_are_synced_and_corrections_resettle(self):
+        fixture = make_fixture(1, status='finished', home_score=2, away_score=0)
+        sync_matches([fixture])
+        match = Match.objects.get()
+        Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=match, prediction='home')
+
+        result = sync_matches([dict(fixture, home_score=0, away_score=1)])
+
+        self.assertEqual(result['settled'], 1)
+        self.assertFalse(Prediction.objects.get().is_correct)
+        # Feeds without scores leave them alone
+        sync_matches([make_fixture(1, status='finished')])
+        self.assertEqual(Match.objects.values_list('home_score', 'away_score').get(), (0, 1))
+
+    def test_matches_moved_back_to_live_are_unsettled(self):
+        fixture = make_fixture(1, status='finished', home_score=2, away_score=0)
+        sync_matches([fixture])
+        match = Match.objects.get()
+        Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=match, prediction='home')
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com', total_predictions=1)
+        settle_match(match)
+
+        sync_matches([dict(fixture, status='live')])
+
+        prediction = Prediction.objects.get()
+        self.assertEqual((prediction.is_correct, prediction.points_earned), (None, 0))
+        stats = UserStats.objects.get()
+        self.assertEqual((stats.correct_predictions, stats.total_points), (0, 0))
+
+
+class SettlementTests(TestCase):
+
+    def setUp(self):
+        self.match = Match.objects.create(
+            home_team='Flamengo',
+            away_team='Palmeiras',
+            competition='Brasileirão Série A',
+            match_date=date(2025, 4, 1),
+            match_time=time(19, 0),
+        )
+        picks = ['home', 'home', 'draw', 'away']
+        for index, pick in enumerate(picks):
+            email = f'user{index}@example.com'
+            Prediction.objects.create(
+                user_name=f'User {index}',
+                user_email=email,
+                match=self.match,
+                prediction=pick,
+                confidence=index + 1,
+            )
+            UserStats.objects.create(user_name=f'User {index}', user_email=email, total_predictions=1)
+
+    def finish(self, home_score, away_score):
+        self.match.status = 'finished'
+        self.match.home_score = home_score
+        self.match.away_score = away_score
+        self.match.save()
+
+    def test_unfinished_match_is_not_settled(self):
+        self.assertIsNone(settle_match(self.match))
+        self.assertFalse(Prediction.objects.filter(is_correct__isnull=False).exists())
+
+    def test_settles_predictions_and_stats_in_set_based_updates(self):
+        self.finish(2, 1)
+
+        # select_for_update + revert + predictions + stats, inside a savepoint
+        with self.assertNumQueries(6):
+            result = settle_match(self.match)
+
+        self.assertEqual(result['outcome'], 'home')
+        self.assertEqual(result['settled'], 4)
+        points = dict(Prediction.objects.values_list('user_email', 'points_earned'))
+        self.assertEqual(points, {
+            'user0@example.com': 10,
+            'user1@example.com': 20,
+            'user2@example.com': 0,
+            'user3@example.com': 0,
+        })
+        stats = UserStats.objects.get(user_email='user1@example.com')
+        self.assertEqual((stats.correct_predictions, stats.total_points), (1, 20))
+        self.assertFalse(Prediction.objects.get(user_email='user3@example.com').is_correct)
+
+    def test_resettlement_reverts_previous_result(self):
+        self.finish(2, 1)
+        settle_match(self.match)
+        settle_match(self.match)
+
+        self.finish(0, 1)
+        settle_match(self.match)
+
+        stats = {
+            s.user_email: (s.correct_predictions, s.total_points)
+            for s in UserStats.objects.all()
+        }
+        self.assertEqual(stats, {
+            'user0@example.com': (0, 0),
+            'user1@example.com': (0, 0),
+            'user2@example.com': (0, 0),
+            'user3@example.com': (1, 40),
+        })
+
+    def stats(self):
+        return dict(UserStats.objects.values_list('user_email', 'total_points'))
+
+    def test_api_edits_of_the_result_resettle(self):
+        url = f'/api/matches/{self.match.pk}/'
+        self.client.patch(url, {'status': 'finished', 'home_score': 2, 'away_score': 1}, content_type='application/json')
+        self.assertEqual(self.stats()['user1@example.com'], 20)
+
+        # Same winner, nothing to redo
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(url, {'home_score': 3}, content_type='application/json')
+        self.assertFalse([q for q in queries if 'matches_prediction' in q['sql']])
+
+        self.client.patch(url, {'home_score': 0}, content_type='application/json')
+        self.assertEqual(self.stats()['user3@example.com'], 40)
+        self.assertEqual(self.stats()['user1@example.com'], 0)
+
+        # Reopened by mistake: points are taken back until it finishes again
+        self.client.patch(url, {'status': 'live'}, content_type='application/json')
+        self.assertEqual(set(self.stats().values()), {0})
+        self.assertFalse(Prediction.objects.filter(is_correct__isnull=False).exists())
+
+    def test_admin_edits_of_the_result_resettle(self):
+        model_admin = MatchAdmin(Match, admin.site)
+        self.match.status = 'finished'
+        self.match.home_score, self.match.away_score = 1, 1
+        model_admin.save_model(None, self.match, None, change=True)
+        self.assertEqual(self.stats()['user2@example.com'], 30)
+
+        self.match.away_score = 2
+        model_admin.save_model(None, self.match, None, change=True)
+        self.assertEqual(self.stats(), {
+            'user0@example.com': 0,
+            'user1@example.com': 0,
+            'user2@example.com': 0,
+            'user3@example.com': 40,
+        })
+
+    def test_sync_settles_matches_that_finish(self):
+        self.match.external_id = 'fixture_settle'
+        self.match.home_score = 1
+        self.match.away_score = 1
+        self.match.save()
+
+        result = sync_matches([{
+            'home_team': 'Flamengo',
+            'away_team': 'Palmeiras',
+            'competition': 'Brasileirão Série A',
+            'match_date': '2025-04-01',
+            'match_time': '19:00:00',
+            'status': 'finished',
+            'external_id': 'fixture_settle',
+        }])
+
+        self.assertEqual(result['settled'], 1)
+        self.assertEqual(UserStats.objects.get(user_email='user2@example.com').total_points, 30)
+
+
+class RankingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_leaderboard_index()
+        scores = [(100, 10), (90, 9), (90, 9), (90, 8), (50, 5), (50, 5), (10, 1), (0, 0)]
+        for index, (points, correct) in enumerate(scores):
+            UserStats.objects.create(
+                user_name=f'User {index}',
+                user_email=f'user{index}@example.com',
+                total_points=points,
+                correct_predictions=correct,
+            )
+
+    def positions(self, response):
+        return [
+            (row['user_email'], row['position'], row['dense_position'])
+            for row in response.json()
+        ]
+
+    def test_ties_share_position(self):
+        response = self.client.get('/api/stats/ranking/', {'limit': 5})
+
+        self.assertEqual(self.positions(response), [
+            ('user0@example.com', 1, 1),
+            ('user1@example.com', 2, 2),
+            ('user2@example.com', 2, 2),
+            ('user3@example.com', 4, 3),
+            ('user4@example.com', 5, 4),
+        ])
+
+    def test_offset_and_rank_range(self):
+        response = self.client.get('/api/stats/ranking/', {'offset': 4, 'limit': 2})
+        self.assertEqual([row['position'] for row in response.json()], [5, 5])
+
+        response = self.client.get('/api/stats/ranking/', {'rank_from': 2, 'rank_to': 4})
+        self.assertEqual(
+            [row['user_email'] for row in response.json()],
+            ['user1@example.com', 'user2@example.com', 'user3@example.com'],
+        )
+
+    def test_around_matches_full_ranking(self):
+        full = {
+            row[0]: row
+            for row in self.positions(self.client.get('/api/stats/ranking/', {'limit': 100}))
+        }
+
+        response = self.client.get('/api/stats/ranking/', {'around': 'user4@example.com', 'span': 2})
+
+        rows = self.positions(response)
+        self.assertEqual([row[0] for row in rows], [f'user{i}@example.com' for i in range(2, 7)])
+        self.assertEqual(rows, [full[row[0]] for row in rows])
+
+    def test_around_unknown_user_and_bad_params(self):
+        response = self.client.get('/api/stats/ranking/', {'around': 'nobody@example.com'})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get('/api/stats/ranking/', {'limit': 'ten'})
+        self.assertEqual(response.status_code, 400)
+
+        # Pages are bounded, however they are asked for
+        for params in ({'limit': 201}, {'around': 'user0@example.com', 'span': 101}):
+            self.assertEqual(self.client.get('/api/stats/ranking/', params).status_code, 400)
+        self.assertEqual(self.client.get('/api/bootstrap/', {'limit': 10 ** 6}).status_code, 400)
+
+
+@override_settings(LEADERBOARD_INDEX_ENABLED=False)
+class DatabaseRankingTests(RankingTests):
+    """Same expectations when positions are computed by the database"""
+
+
+class LeaderboardIndexTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_leaderboard_index()
+
+    def test_positions_follow_rank_semantics(self):
+        index = LeaderboardIndex()
+        index.load([
+            (1, 'a@example.com', 30, 3),
+            (2, 'b@example.com', 20, 2),
+            (3, 'c@example.com', 20, 2),
+            (4, 'd@example.com', 10, 1),
+        ])
+
+        self.assertEqual(index.position('c@example.com'), (2, 2))
+        self.assertEqual(index.position('d@example.com'), (4, 3))
+        self.assertEqual(index.rank_range(rank_from=3), [(4, 4, 3)])
+        self.assertEqual(index.rank_range(rank_to=2), [(1, 1, 1), (2, 2, 2), (3, 2, 2)])
+
+        index.upsert(4, 'd@example.com', 40, 4)
+        self.assertEqual(index.position('d@example.com'), (1, 1))
+        self.assertEqual(index.around('a@example.com', span=1), [(4, 1, 1), (1, 2, 2), (2, 3, 3)])
+
+        index.remove(4)
+        self.assertIsNone(index.position('d@example.com'))
+        self.assertEqual(len(index), 3)
+
+    def test_index_follows_stats_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = UserStats.objects.create(user_name='A', user_email='a@example.com', total_points=10)
+            UserStats.objects.create(user_name='B', user_email='b@example.com', total_points=20)
+        self.assertEqual(get_leaderboard_index().position('a@example.com'), (2, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.total_points = 30
+            first.save()
+        self.assertEqual(get_leaderboard_index().position('a@example.com'), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(len(get_leaderboard_index()), 1)
+
+    def test_refresh_leaves_the_held_index_untouched(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = UserStats.objects.create(user_name='A', user_email='a@example.com', total_points=10)
+            UserStats.objects.create(user_name='B', user_email='b@example.com', total_points=20)
+        held = get_leaderboard_index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.total_points = 30
+            first.save()
+        refreshed = get_leaderboard_index()
+
+        self.assertIsNot(refreshed, held)
+        self.assertEqual(held.position('a@example.com'), (2, 2))
+        self.assertEqual(refreshed.position('a@example.com'), (1, 1))
+
+    def test_changes_from_other_processes_reach_the_index(self):
+        first = UserStats.objects.create(user_name='A', user_email='a@example.com', total_points=10)
+        UserStats.objects.create(user_name='B', user_email='b@example.com', total_points=20)
+        self.assertEqual(self.client.get('/api/stats/position/', {'email': 'a@example.com'}).json()['position'], 2)
+        self.client.get('/api/stats/ranking/')
+
+        # A settlement in the sync_worker, whose local cache is its own
+        worker_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'}}
+        with override_settings(CACHES=worker_cache), self.captureOnCommitCallbacks(execute=True):
+            now = timezone.now()
+            UserStats.objects.filter(pk=first.pk).update(total_points=50, updated_at=now)
+            notify_stats_changed(now)
+            bump_version(STATS)
+
+        self.assertEqual(self.client.get('/api/stats/position/', {'email': 'a@example.com'}).json()['position'], 1)
+        top = self.client.get('/api/stats/ranking/').json()[0]
+        self.assertEqual((top['user_email'], top['total_points']), ('a@example.com', 50))
+
+    def test_position_endpoint(self):
+        UserStats.objects.create(user_name='A', user_email='a@example.com', total_points=10)
+
+        response = self.client.get('/api/stats/position/', {'email': 'a@example.com'})
+        self.assertEqual(response.json()['position'], 1)
+
+        response = self.client.get('/api/stats/position/', {'email': 'nobody@example.com'})
+        self.assertEqual(response.status_code, 404)
+
+
+class PredictionStatsConcurrencyTests(TransactionTestCase):
+
+    def test_parallel_creates_keep_exact_counters(self):
+        matches = [
+            Match.objects.create(
+                home_team=f'Home {i}',
+                away_team=f'Away {i}',
+                competition='Brasileirão Série A',
+                match_date=FUTURE_DATE,
+                match_time=time(19, 0),
+            )
+            for i in range(24)
+        ]
+
+        def predict(match):
+            response = Client().post('/api/predictions/', {
+                'user_name': 'Ana',
+                'user_email': 'ana@example.com',
+                'match': match.pk,
+                'prediction': 'home',
+            })
+            connection.close()
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            codes = list(executor.map(predict, matches))
+
+        self.assertEqual(codes, [201] * len(matches))
+        stats = UserStats.objects.get(user_email='ana@example.com')
+        self.assertEqual(stats.total_predictions, len(matches))
+
+    def test_parallel_upserts_do_not_fail(self):
+        matches = [
+            Match.objects.create(
+                home_team=f'Home {i}',
+                away_team=f'Away {i}',
+                competition='Brasileirão Série A',
+                match_date=FUTURE_DATE,
+                match_time=time(19, 0),
+            )
+            for i in range(12)
+        ]
+
+        def upsert(match):
+            response = Client().put('/api/predictions/upsert/', {
+                'user_name': 'Ana',
+                'user_email': 'ana@example.com',
+                'match': match.pk,
+                'prediction': 'home',
+            }, content_type='application/json')
+            connection.close()
+            return response.status_code
+
+        # Every match is upserted twice: the first call creates, the second edits
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            codes = list(executor.map(upsert, matches + matches))
+
+        self.assertEqual(sorted(codes), [200] * len(matches) + [201] * len(matches))
+        stats = UserStats.objects.get(user_email='ana@example.com')
+        self.assertEqual(stats.total_predictions, len(matches))
+
+
+class BulkPredictionTests(TestCase):
+
+    def setUp(self):
+        self.matches = [
+            Match.objects.create(
+                home_team=f'Home {i}',
+                away_team=f'Away {i}',
+                competition='Brasileirão Série A',
+                match_date=FUTURE_DATE,
+                match_time=time(19, 0),
+            )
+            for i in range(10)
+        ]
+
+    def post_round(self, items):
+        return self.client.post('/api/predictions/bulk/', items, content_type='application/json')
+
+    def prediction(self, match, **overrides):
+        item = {
+            'user_name': 'Ana',
+            'user_email': 'ana@example.com',
+            'match': match.pk,
+            'prediction': 'home',
+            'confidence': 3,
+        }
+        item.update(overrides)
+        return item
+
+    def test_creates_a_whole_round_in_constant_queries(self):
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com')
+        items = [self.prediction(match) for match in self.matches]
+
+        # matches + existing + insert + stats update, plus savepoints
+        with self.assertNumQueries(8):
+            response = self.post_round(items)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 10)
+        self.assertEqual(Prediction.objects.count(), 10)
+        self.assertEqual(UserStats.objects.get(user_email='ana@example.com').total_predictions, 10)
+        first = response.json()['results'][0]
+        self.assertEqual(first['prediction']['match_details']['home_team'], 'Home 0')
+
+    def test_reports_errors_per_row(self):
+        Prediction.objects.create(
+            user_name='Ana', user_email='ana@example.com', match=self.matches[0], prediction='draw'
+        )
+
+        response = self.post_round([
+            self.prediction(self.matches[0]),
+            self.prediction(self.matches[1]),
+            self.prediction(self.matches[1], prediction='away'),
+            self.prediction(self.matches[2], prediction='maybe'),
+            dict(self.prediction(self.matches[3]), match=999),
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual([row['status'] for row in body['results']], [
+            'error', 'created', 'error', 'error', 'error',
+        ])
+        self.assertIn('non_field_errors', body['results'][2]['errors'])
+        self.assertIn('prediction', body['results'][3]['errors'])
+        self.assertIn('match', body['results'][4]['errors'])
+        self.assertEqual(UserStats.objects.get(user_email='ana@example.com').total_predictions, 1)
+
+    def test_rejects_non_list_payload(self):
+        response = self.post_round({'predictions': []})
+        self.assertEqual(response.status_code, 400)
+
+
+class PredictionUpsertTests(TestCase):
+
+    def setUp(self):
+        self.match = Match.objects.create(
+            home_team='Flamengo',
+            away_team='Palmeiras',
+            competition='Brasileirão Série A',
+            match_date=FUTURE_DATE,
+            match_time=time(19, 0),
+        )
+
+    def upsert(self, pick, confidence=3):
+        return self.client.put('/api/predictions/upsert/', {
+            'user_name': 'Ana',
+            'user_email': 'ana@example.com',
+            'match': self.match.pk,
+            'prediction': pick,
+            'confidence': confidence,
+        }, content_type='application/json')
+
+    def test_second_call_edits_the_prediction(self):
+        response = self.upsert('home')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['created'])
+        created_at = response.json()['prediction']['created_at']
+
+        # match lookup + the insert that finds the pair and the update,
+        # inside a savepoint
+        with self.assertNumQueries(5):
+            response = self.upsert('away', confidence=5)
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertFalse(body['created'])
+        self.assertEqual(body['prediction']['prediction'], 'away')
+        self.assertEqual(body['prediction']['created_at'], created_at)
+        self.assertEqual(body['prediction']['match_details']['home_team'], 'Flamengo')
+
+        prediction = Prediction.objects.get()
+        self.assertEqual((prediction.prediction, prediction.confidence), ('away', 5))
+        self.assertEqual(UserStats.objects.get(user_email='ana@example.com').total_predictions, 1)
+
+    def test_email_is_required(self):
+        response = self.client.put('/api/predictions/upsert/', {
+            'user_name': 'Ana',
+            'match': self.match.pk,
+            'prediction': 'home',
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class KickoffTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def create_match(self, kickoff, status='scheduled'):
+        kickoff = timezone.localtime(kickoff)
+        return Match.objects.create(
+            home_team='Flamengo',
+            away_team='Palmeiras',
+            competition='Brasileirão Série A',
+            match_date=kickoff.date(),
+            match_time=kickoff.time(),
+            status=status,
+        )
+
+    def test_kickoff_at_follows_date_and_time(self):
+        match = self.create_match(timezone.now() + timedelta(hours=1))
+        self.assertEqual(match.kickoff_at, combine_kickoff(match.match_date, match.match_time))
+
+        match.match_time = time(21, 30)
+        match.save()
+        match.refresh_from_db()
+        self.assertEqual(match.kickoff_at.time(), time(21, 30))
+
+    def test_upcoming_and_live_windows(self):
+        now = timezone.now()
+        started = self.create_match(now - timedelta(minutes=30))
+        soon = self.create_match(now + timedelta(hours=1))
+        later = self.create_match(now + timedelta(days=2))
+        self.create_match(now + timedelta(days=9))
+        self.create_match(now - timedelta(days=1), status='finished')
+
+        self.assertEqual(list(Match.objects.upcoming(days=7)), [soon, later])
+        self.assertEqual(list(Match.objects.kicking_off_within(hours=2)), [soon])
+        self.assertEqual(list(Match.objects.live_window()), [started])
+
+        response = self.client.get('/api/matches/upcoming/')
+        self.assertEqual([row['id'] for row in response.json()], [soon.pk, later.pk])
+        self.assertIn('match_date', response.json()[0])
+        self.assertIn('match_time', response.json()[0])
+
+    def test_predictions_lock_at_kickoff(self):
+        started = self.create_match(timezone.now() - timedelta(minutes=5))
+
+        response = self.client.post('/api/predictions/', {
+            'user_name': 'Ana',
+            'user_email': 'ana@example.com',
+            'match': started.pk,
+            'prediction': 'home',
+        })
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('match', response.json())
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        for index in range(7):
+            UserStats.objects.create(
+                user_name=f'User {index}',
+                user_email=f'user{index}@example.com',
+                total_points=(index // 3) * 10,
+            )
+
+    def walk(self, url, params):
+        emails = []
+        pages = 0
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            emails += [row['user_email'] for row in response.json()['results']]
+            url, params = response.json()['next'], None
+            pages += 1
+        return emails, pages, response
+
+    def test_pages_follow_ordering_with_ties(self):
+        expected = list(UserStats.objects.values_list('user_email', flat=True))
+
+        emails, pages, last = self.walk('/api/stats/', {'page_size': 2})
+
+        self.assertEqual(emails, expected)
+        self.assertEqual(pages, 4)
+
+        previous = self.client.get(last.json()['previous']).json()
+        self.assertEqual([row['user_email'] for row in previous['results']], expected[4:6])
+
+    def test_deep_page_runs_a_single_query(self):
+        first = self.client.get('/api/stats/', {'page_size': 3}).json()
+
+        # The page itself, plus the ETag validator aggregate
+        with self.assertNumQueries(2):
+            response = self.client.get(first['next'])
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_my_predictions_are_paginated(self):
+        match = Match.objects.create(
+            home_team='Flamengo',
+            away_team='Palmeiras',
+            competition='Brasileirão Série A',
+            match_date=date(2025, 4, 1),
+            match_time=time(19, 0),
+        )
+        Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=match, prediction='home')
+
+        response = self.client.get('/api/predictions/my_predictions/', {'email': 'ana@example.com', 'page_size': 10})
+
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNone(response.json()['next'])
+
+    def test_lists_stay_bare_arrays_without_page_params(self):
+        for i in range(3):
+            Match.objects.create(
+                home_team='Flamengo', away_team='Palmeiras', competition='Brasileirão Série A',
+                match_date=date(2025, 4, 1 + i), match_time=time(19, 0), external_id=str(i),
+            )
+
+        response = self.client.get('/api/matches/')
+        self.assertEqual([row['external_id'] for row in response.json()], ['0', '1', '2'])
+        response = self.client.get('/api/predictions/my_predictions/', {'email': 'ana@example.com'})
+        self.assertEqual(response.json(), [])
+
+    def test_matches_paginate_on_schedule(self):
+        sync_matches([make_fixture(i, match_time=f'{10 + i % 3}:00:00') for i in range(5)])
+        expected = list(Match.objects.values_list('external_id', flat=True))
+
+        ids = []
+        url, params = '/api/matches/', {'page_size': 2}
+        while url:
+            body = self.client.get(url, params).json()
+            ids += [row['external_id'] for row in body['results']]
+            url, params = body['next'], None
+
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/matches/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    LEADERBOARD_INDEX_ENABLED=False,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    BUDGETS = [
+        # List validators (ConditionalGetMixin) cost one aggregate query,
+        # cache versions (matches.cache) one more
+        ('/api/matches/', None, 3),
+        ('/api/matches/upcoming/', None, 2),
+        ('/api/teams/', None, 3),
+        ('/api/predictions/', None, 1),
+        ('/api/predictions/my_predictions/', {'email': 'user0@example.com'}, 1),
+        ('/api/stats/', None, 2),
+        ('/api/stats/ranking/', {'limit': 50}, 2),
+    ]
+
+    def populate(self, count):
+        for i in range(count):
+            Team.objects.create(name=f'Home {count} {i}')
+        matches = [
+            Match.objects.create(
+                home_team=f'Home {count} {i}',
+                away_team=f'Away {i}',
+                competition='Brasileirão Série A',
+                match_date=FUTURE_DATE,
+                match_time=time(19, 0),
+                external_id=f'budget_{count}_{i}',
+            )
+            for i in range(count)
+        ]
+        for i, match in enumerate(matches):
+            email = f'user{i % 3}@example.com'
+            Prediction.objects.create(user_name='User', user_email=email, match=match, prediction='home')
+            UserStats.objects.get_or_create(user_email=f'user{i}@example.com', defaults={'user_name': 'User'})
+
+    def test_list_endpoints_stay_within_budget(self):
+        for count in (3, 30):
+            self.populate(count)
+            for path, params, budget in self.BUDGETS:
+                with self.subTest(path=path, rows=count):
+                    self.assertQueryBudget(path, budget, params)
+
+    @override_settings(QUERY_COUNT_HEADERS=True)
+    def test_query_headers(self):
+        response = self.client.get('/api/matches/')
+
+        self.assertEqual(response['X-DB-Query-Count'], '3')
+        self.assertIn('X-DB-Time-Ms', response)
+
+    @override_settings(QUERY_COUNT_HEADERS=True)
+    async def test_query_headers_under_asgi(self):
+        response = await self.async_client.get('/api/matches/')
+
+        self.assertEqual(response['X-DB-Query-Count'], '3')
+
+
+class TeamResolutionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.galo = Team.objects.create(name='Atlético Mineiro', short_name='CAM')
+        self.vasco = Team.objects.create(name='Vasco')
+        TeamAlias.objects.create(team=self.galo, name='Atlético-MG')
+        TeamAlias.objects.create(team=self.vasco, name='Vasco da Gama')
+
+    def test_normalizes_accents_case_and_punctuation(self):
+        self.assertEqual(normalize_team_name('  Atlético-MG '), 'atletico mg')
+        self.assertEqual(normalize_team_name('São Paulo'), normalize_team_name('SAO  PAULO'))
+
+    def test_resolves_names_short_names_and_aliases(self):
+        index = build_team_index()
+
+        self.assertEqual(resolve_team('atletico mineiro', index), self.galo.pk)
+        self.assertEqual(resolve_team('CAM', index), self.galo.pk)
+        self.assertEqual(resolve_team('Atletico MG', index), self.galo.pk)
+        self.assertEqual(resolve_team('VASCO DA GAMA', index), self.vasco.pk)
+        self.assertIsNone(resolve_team('Unknown FC', index))
+        self.assertIsNone(resolve_team('', index))
+
+    def test_alias_wins_over_short_name(self):
+        other = Team.objects.create(name='Other', short_name='Vasco da Gama')
+
+        self.assertNotEqual(other.pk, self.vasco.pk)
+        self.assertEqual(resolve_team('Vasco da Gama', build_team_index()), self.vasco.pk)
+
+    def test_refs_set_on_save_and_after_alias_added(self):
+        match = Match.objects.create(
+            home_team='Atlético-MG', away_team='Bragantino', competition='Brasileirão Série A',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+        self.assertEqual(match.home_team_ref_id, self.galo.pk)
+        self.assertIsNone(match.away_team_ref_id)
+
+        bragantino = Team.objects.create(name='Red Bull Bragantino')
+        TeamAlias.objects.create(team=bragantino, name='Bragantino')
+        match.save()
+
+        self.assertEqual(match.away_team_ref_id, bragantino.pk)
+
+    def test_refs_set_by_hand_survive_saves(self):
+        match = Match.objects.create(
+            home_team='Galo', away_team='Vasco', competition='Brasileirão Série A',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+        self.assertIsNone(match.home_team_ref_id)
+
+        # As the admin's raw id field does
+        match = Match.objects.get(pk=match.pk)
+        match.home_team_ref_id = self.galo.pk
+        match.save()
+        match = Match.objects.get(pk=match.pk)
+        match.status = 'live'
+        match.save()
+        self.assertEqual(Match.objects.get(pk=match.pk).home_team_ref_id, self.galo.pk)
+
+        # A new name is resolved again
+        match.away_team = 'Atlético-MG'
+        match.save()
+        self.assertEqual(match.away_team_ref_id, self.galo.pk)
+
+    def test_sync_resolves_refs(self):
+        sync_matches([make_fixture(0, home_team='Atlético-MG', away_team='Vasco')])
+        match = Match.objects.get(external_id='fixture_0')
+        self.assertEqual((match.home_team_ref_id, match.away_team_ref_id), (self.galo.pk, self.vasco.pk))
+
+        # A team renamed in the feed moves the ref on the next sync
+        result = sync_matches([make_fixture(0, home_team='Atlético-MG', away_team='Unknown FC')])
+        match.refresh_from_db()
+        self.assertEqual(result['updated'], 1)
+        self.assertIsNone(match.away_team_ref_id)
+
+    def test_match_list_embeds_teams_in_one_query(self):
+        for i in range(5):
+            Match.objects.create(
+                home_team='Atlético-MG', away_team='Vasco', competition='Brasileirão Série A',
+                match_date=FUTURE_DATE, match_time=time(16, 0), external_id=f'refs_{i}',
+            )
+
+        # The payload's versions, then the matches with their teams
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/matches/upcoming/')
+
+        match = response.json()[0]
+        self.assertEqual(match['home_team'], 'Atlético-MG')
+        self.assertEqual(match['home_team_details']['name'], 'Atlético Mineiro')
+        self.assertEqual(match['home_team_details']['short_name'], 'CAM')
+        self.assertEqual(match['away_team_details']['slug'], self.vasco.slug)
+
+
+class FastReadPathTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_leaderboard_index()
+        Team.objects.create(name='São Paulo', short_name='SAO', logo_url='https://example.com/sao.png')
+        Team.objects.create(name='Grêmio\u2028FBPA', primary_color='#0D80BF')
+        Match.objects.create(
+            home_team='São Paulo', away_team='Grêmio\u2028FBPA', competition='Brasileirão Série A',
+            match_date=FUTURE_DATE, match_time=time(16, 0, 30), external_id='parity_1',
+        )
+        Match.objects.create(
+            home_team='Unknown FC', away_team='São Paulo', competition='Copa "do" Brasil',
+            match_date=FUTURE_DATE, match_time=time(21, 45), status='finished', home_score=0, away_score=3,
+        )
+        for i, (total, correct, points) in enumerate([(3, 1, 10), (0, 0, 0), (7, 7, 70), (3, 1, 10)]):
+            UserStats.objects.create(
+                user_name=f'Usuário {i} 🐍', user_email=f'user{i}@example.com',
+                total_predictions=total, correct_predictions=correct, total_points=points,
+            )
+        for match in Match.objects.all():
+            Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=match, prediction='draw')
+        # Microseconds exercise DateTimeField formatting
+        UserStats.objects.filter(user_email='user0@example.com').update(
+            updated_at=timezone.now().replace(microsecond=123456)
+        )
+
+    def assertSameBytes(self, serializer_data, mapped):
+        self.assertEqual(FastJSONRenderer().render(mapped), JSONRenderer().render(serializer_data))
+
+    def test_mappers_match_serializers_byte_for_byte(self):
+        cases = [
+            (MatchSerializer, MATCH_ROWS, Match.objects.with_teams()),
+            (TeamSerializer, TEAM_ROWS, Team.objects.all()),
+            (UserStatsSerializer, USER_STATS_ROWS, UserStats.objects.all()),
+            (PredictionSerializer, PREDICTION_ROWS, Prediction.objects.select_related('match__home_team_ref')),
+        ]
+        for serializer_class, mapper, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertSameBytes(
+                    serializer_class(queryset, many=True).data,
+                    mapper.map_many(queryset.values(*mapper.columns)),
+                )
+
+    @override_settings(TIME_ZONE='America/Sao_Paulo')
+    def test_datetimes_follow_the_current_time_zone(self):
+        queryset = UserStats.objects.all()
+        self.assertSameBytes(
+            UserStatsSerializer(queryset, many=True).data,
+            USER_STATS_ROWS.map_many(queryset.values(*USER_STATS_ROWS.columns)),
+        )
+        self.assertIn('-03:00', USER_STATS_ROWS.map_many(queryset.values(*USER_STATS_ROWS.columns))[0]['updated_at'])
+
+    def test_ranking_rows_match_serializer_with_and_without_index(self):
+        for enabled in (True, False):
+            with self.subTest(index=enabled), override_settings(LEADERBOARD_INDEX_ENABLED=enabled):
+                reset_leaderboard_index()
+                self.assertSameBytes(
+                    RankedUserStatsSerializer(rank_range(limit=3, offset=1), many=True).data,
+                    RANKED_USER_STATS_ROWS.map_many(
+                        rank_range_values(RANKED_USER_STATS_ROWS.columns, limit=3, offset=1)
+                    ),
+                )
+
+    def test_endpoints_serve_the_serializer_payload(self):
+        response = self.client.get('/api/matches/', {'page_size': 1})
+        page = response.json()
+        self.assertEqual(page['results'], list(MatchSerializer(Match.objects.with_teams()[:1], many=True).data))
+        # The cursor is read from the dict rows
+        rest = self.client.get(page['next']).json()
+        self.assertEqual([row['external_id'] for row in rest['results']], [None])
+
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.content, JSONRenderer().render(
+            UserStatsSerializer(UserStats.objects.all(), many=True).data
+        ))
+        response = self.client.get('/api/stats/', {'page_size': 10})
+        self.assertEqual(response.content, JSONRenderer().render({
+            'next': None,
+            'previous': None,
+            'results': UserStatsSerializer(UserStats.objects.all(), many=True).data,
+        }))
+
+    def test_renderer_falls_back_to_drf(self):
+        renderer = FastJSONRenderer()
+        self.assertEqual(renderer.render(None), b'')
+        self.assertEqual(renderer.render({'big': 2 ** 70}), JSONRenderer().render({'big': 2 ** 70}))
+        self.assertEqual(
+            renderer.render({1: 'a'}, 'application/json; indent=2'),
+            JSONRenderer().render({1: 'a'}, 'application/json; indent=2'),
+        )
+
+
+class StreamingListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Team.objects.create(name='Santos')
+        for i in range(5):
+            match = Match.objects.create(
+                home_team='Santos', away_team=f'Away {i}', competition='Copa',
+                match_date=FUTURE_DATE, match_time=time(16, i), external_id=f'stream_{i}',
+            )
+            for email in ('ana@example.com', 'bia@example.com'):
+                Prediction.objects.create(user_name='User', user_email=email, match=match, prediction='home')
+        # Small batches, so arrays span several chunks
+        self.addCleanup(setattr, StreamingListMixin, 'stream_chunk_size', StreamingListMixin.stream_chunk_size)
+        StreamingListMixin.stream_chunk_size = 2
+
+    def streamed(self, response):
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_lists_stream_every_row_unpaginated(self):
+        cases = [
+            ('/api/predictions/', PredictionSerializer, Prediction.objects.all()),
+            ('/api/matches/', MatchSerializer, Match.objects.all()),
+            ('/api/stats/', UserStatsSerializer, UserStats.objects.all()),
+        ]
+        for path, serializer_class, queryset in cases:
+            with self.subTest(path=path):
+                response = self.client.get(path, {'stream': '1', 'page_size': 1})
+                self.assertEqual(
+                    self.streamed(response),
+                    json.loads(JSONRenderer().render(serializer_class(queryset, many=True).data)),
+                )
+
+    def test_my_predictions_and_filters_stream(self):
+        rows = self.streamed(self.client.get(
+            '/api/predictions/my_predictions/', {'email': 'bia@example.com', 'stream': 'true'}
+        ))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['user_email'] for row in rows}, {'bia@example.com'})
+
+        empty = self.client.get('/api/predictions/my_predictions/', {'email': 'nobody@example.com', 'stream': '1'})
+        self.assertEqual(self.streamed(empty), [])
+
+    def test_rows_are_read_in_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/predictions/', {'stream': '1'})
+            self.assertEqual(len(queries), 0)
+            chunks = list(response.streaming_content)
+
+        # One query, fetched two rows at a time: '[', five batches, ']'
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(chunks), 7)
+
+    async def test_asgi_streams_asynchronously(self):
+        response = await self.async_client.get('/api/predictions/', {'stream': '1'})
+
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(json.loads(body)), 10)
+
+
+class TeamIndexTransactionTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_team_index()
+        Team.objects.create(name='Santos')
+
+    def test_index_is_kept_between_transactions(self):
+        self.assertIsNotNone(resolve_team('Santos'))
+        # Only the teams version is read
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(resolve_team('SANTOS'))
+
+    def test_rolled_back_team_never_resolves(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Team.objects.create(name='Phantom FC')
+                self.assertIsNotNone(resolve_team('Phantom FC'))
+                raise ValueError
+
+        self.assertIsNone(resolve_team('Phantom FC'))
+        self.assertIsNotNone(resolve_team('Santos'))
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        for i, (competition, status) in enumerate([('Copa', 'finished'), ('Copa', 'scheduled'), ('Liga', 'finished')]):
+            match = Match.objects.create(
+                home_team='Santos', away_team=f'Away {i}', competition=competition, status=status,
+                match_date=FUTURE_DATE + timedelta(days=i), match_time=time(16), external_id=f'export_{i}',
+            )
+            Prediction.objects.create(user_name='Ana, "A"', user_email='ana@example.com', match=match, prediction='home')
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com', total_points=3)
+
+    def export(self, *args, **kwargs):
+        return b''.join(Export(*args, **kwargs))
+
+    def test_csv_has_a_header_and_one_line_per_row(self):
+        rows = list(csv.reader(StringIO(self.export('predictions', chunk_size=2).decode())))
+
+        self.assertEqual(rows[0], list(DATASETS['predictions'][1]))
+        self.assertEqual(len(rows), 4)
+        # Quoted fields survive the round trip
+        self.assertEqual(rows[1][1], 'Ana, "A"')
+        self.assertEqual(rows[1][5], FUTURE_DATE.isoformat())
+
+    def test_ndjson_has_one_object_per_line(self):
+        lines = self.export('matches', export_format='ndjson', chunk_size=2).splitlines()
+
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['external_id'] for row in rows], ['export_0', 'export_1', 'export_2'])
+        self.assertEqual(rows[0]['match_date'], FUTURE_DATE.isoformat())
+
+    def test_filters(self):
+        cases = [
+            ({'competition': 'Copa'}, ['export_0', 'export_1']),
+            ({'finished': True}, ['export_0', 'export_2']),
+            ({'date_from': FUTURE_DATE + timedelta(days=1)}, ['export_1', 'export_2']),
+            ({'date_to': FUTURE_DATE, 'competition': 'Copa'}, ['export_0']),
+        ]
+        for filters, expected in cases:
+            with self.subTest(filters=filters):
+                for dataset, key in (('matches', 'external_id'), ('predictions', 'match_id')):
+                    rows = [json.loads(line) for line in self.export(dataset, 'ndjson', **filters).splitlines()]
+                    ids = [Match.objects.get(external_id=e).id for e in expected] if key == 'match_id' else expected
+                    self.assertEqual([row[key] for row in rows], ids)
+
+        with self.assertRaises(ExportError):
+            Export('ranking', competition='Copa')
+        with self.assertRaises(ExportError):
+            Export('predictions', export_format='xlsx')
+
+    def test_gzip_round_trip(self):
+        export = Export('ranking', compress=True)
+
+        self.assertEqual(export.content_type, 'application/gzip')
+        self.assertTrue(export.filename.endswith('.csv.gz'))
+        self.assertEqual(gzip.decompress(b''.join(export)), self.export('ranking'))
+        self.assertEqual(export.rows, 1)
+
+    def test_endpoint_is_staff_only_and_streams(self):
+        url = '/api/exports/predictions.ndjson'
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(User.objects.create_user('analyst', password='x'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        response = self.client.get(url, {'competition': 'Copa', 'gzip': '1'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="predictions-', response['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 2)
+
+        self.assertEqual(self.client.get('/api/exports/users.csv').status_code, 404)
+        self.assertEqual(self.client.get('/api/exports/matches.xlsx').status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/matches.csv', {'date_from': 'soon'}).status_code, 400)
+
+    def test_command_writes_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/matches.csv'
+            stderr = StringIO()
+            call_command('export_data', 'matches', '--output', path, '--finished', stderr=stderr)
+
+            with open(path, newline='') as output:
+                self.assertEqual(len(list(csv.reader(output))), 3)
+        self.assertIn('2 rows', stderr.getvalue())
+
+
+class ImportFixturesTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = f'{self.directory.name}/{name}'
+        with (gzip.open if name.endswith('.gz') else open)(path, 'wt', encoding='utf-8', newline='') as file:
+            file.write(content)
+        return path
+
+    def import_fixtures(self, *args, **options):
+        stdout = StringIO()
+        call_command('import_fixtures', *args, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_csv_season_is_upserted_in_batches(self):
+        Team.objects.create(name='Home 1')
+        rows = [['external_id', 'home_team', 'away_team', 'competition', 'match_date', 'match_time']]
+        rows += [[f'fixture_{i}', f'Home {i}', f'Away {i}', 'Série A', '2025-04-01', '16:00'] for i in range(380)]
+        path = self.write('season.csv', ''.join(','.join(row) + '\n' for row in rows))
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.import_fixtures(path, batch_size=100)
+
+        self.assertIn('batch 4: 80 rows', output)
+        self.assertIn('380 created', output)
+        self.assertEqual(Match.objects.count(), 380)
+        self.assertEqual(Match.objects.get(external_id='fixture_1').home_team_ref.name, 'Home 1')
+        # A few queries per batch, never one per row
+        self.assertLess(len(queries), 40)
+
+        output = self.import_fixtures(path)
+        self.assertIn('380 unchanged', output)
+
+    def test_json_and_ndjson_update_existing_matches(self):
+        sync_matches([make_fixture(1)])
+        fixture = dict(make_fixture(1), status='finished', home_score=2, away_score=1)
+        cup = dict(make_fixture(2), competition='Copa do Brasil')
+
+        output = self.import_fixtures(
+            self.write('season.json', json.dumps({'matches': [fixture]})),
+            self.write('cup.ndjson.gz', json.dumps(cup) + '\n\n'),
+        )
+
+        self.assertIn('1 matches settled', output)
+        match = Match.objects.get(external_id='fixture_1')
+        self.assertEqual((match.status, match.home_score, match.away_score), ('finished', 2, 1))
+        self.assertEqual(Match.objects.get(external_id='fixture_2').competition, 'Copa do Brasil')
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        rows = [
+            make_fixture(1),
+            make_fixture(2, match_date='01/04/2025'),
+            make_fixture(3, status='abandoned'),
+            make_fixture(4, home_score='two'),
+            make_fixture(5, external_id=''),
+        ]
+        path = self.write('season.ndjson', ''.join(json.dumps(row) + '\n' for row in rows))
+
+        output = self.import_fixtures(path)
+
+        self.assertIn("line 2: invalid match_date '01/04/2025'", output)
+        self.assertIn("line 3: invalid status 'abandoned'", output)
+        self.assertIn("line 4: invalid home_score 'two'", output)
+        self.assertIn('line 5: missing external_id', output)
+        self.assertIn('4 invalid rows skipped', output)
+        self.assertEqual(list(Match.objects.values_list('external_id', flat=True)), ['fixture_1'])
+
+    def test_schedule_without_status_keeps_played_matches(self):
+        sync_matches([make_fixture(1, status='finished', home_score=2, away_score=0)])
+        schedule = {key: value for key, value in make_fixture(1).items() if key != 'status'}
+        new = {key: value for key, value in make_fixture(2).items() if key != 'status'}
+
+        self.import_fixtures(self.write('season.json', json.dumps([schedule, new])))
+
+        match = Match.objects.get(external_id='fixture_1')
+        self.assertEqual((match.status, match.home_score), ('finished', 2))
+        self.assertEqual(Match.objects.get(external_id='fixture_2').status, 'scheduled')
+
+    def test_malformed_ndjson_lines_are_skipped(self):
+        lines = [json.dumps(make_fixture(1)), '{"external_id": ', json.dumps(make_fixture(2))]
+        output = self.import_fixtures(self.write('season.ndjson', '\n'.join(lines)))
+
+        self.assertIn('line 2: invalid JSON', output)
+        self.assertEqual(Match.objects.count(), 2)
+
+    def test_dry_run_and_unreadable_files(self):
+        path = self.write('season.csv', 'external_id,home_team\nfixture_1,Santos\n')
+        self.assertIn('missing away_team', self.import_fixtures(path, dry_run=True))
+
+        path = self.write('season.ndjson', json.dumps(make_fixture(1)))
+        self.import_fixtures(path, dry_run=True)
+        self.assertFalse(Match.objects.exists())
+
+        with self.assertRaisesMessage(CommandError, 'Cannot tell the format'):
+            self.import_fixtures(self.write('season.txt', ''))
+        with self.assertRaises(CommandError):
+            self.import_fixtures(self.write('season.json', '{"matches": 1}'))
+
+    def test_matches_export_imports_back(self):
+        sync_matches([make_fixture(i, status='finished', home_score=i, away_score=0) for i in range(3)])
+        path = self.write('matches.csv', b''.join(Export('matches')).decode())
+        Match.objects.all().delete()
+
+        self.import_fixtures(path)
+
+        self.assertEqual(sorted(Match.objects.values_list('home_score', flat=True)), [0, 1, 2])
+
+
+class GenerateLoadDataTests(TestCase):
+
+    def generate(self, *args):
+        call_command('generate_load_data', '--users', '60', '--matches', '40', '--batch-size', '100', *args, stdout=StringIO())
+
+    def test_stats_are_derived_from_the_predictions(self):
+        self.generate()
+
+        self.assertEqual(UserStats.objects.count(), 60)
+        self.assertEqual(Match.objects.count(), 40)
+        for stats in UserStats.objects.all():
+            predictions = Prediction.objects.filter(user_email=stats.user_email)
+            self.assertEqual(stats.total_predictions, predictions.count())
+            self.assertEqual(stats.correct_predictions, predictions.filter(is_correct=True).count())
+            self.assertEqual(
+                stats.total_points,
+                sum(10 * p.confidence for p in predictions.filter(is_correct=True)),
+            )
+        # Settled only where the match was played
+        self.assertFalse(Prediction.objects.filter(match__status='scheduled', is_correct__isnull=False).exists())
+        self.assertFalse(Prediction.objects.filter(match__status='finished', is_correct__isnull=True).exists())
+
+        # Palpites mirror the predictions on league matches, one Jogo each
+        self.assertLessEqual(Jogo.objects.count(), Match.objects.filter(competition='Brasileirão Série A').count())
+        self.assertFalse(Jogo.objects.filter(palpite__isnull=True).exists())
+        self.assertEqual(
+            Palpite.objects.count(),
+            Prediction.objects.filter(match__competition='Brasileirão Série A').count(),
+        )
+        self.assertEqual(User.objects.filter(palpites__isnull=False).distinct().count(), User.objects.count())
+
+    def test_same_seed_same_data(self):
+        def snapshot():
+            return list(UserStats.objects.order_by('user_email').values_list(
+                'user_email', 'total_predictions', 'correct_predictions', 'total_points'
+            ))
+
+        self.generate()
+        first = snapshot()
+        with self.assertRaises(CommandError):
+            self.generate()
+
+        self.generate('--clear')
+        self.assertEqual(snapshot(), first)
+        self.generate('--clear', '--seed', '7', '--no-legacy')
+        self.assertNotEqual(snapshot(), first)
+        self.assertFalse(Palpite.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_clear_keeps_real_data(self):
+        user = User.objects.create_user('ana')
+        jogo = Jogo.objects.create(time1='Flamengo', time2='Palmeiras')
+        Palpite.objects.create(usuario=user, jogo=jogo, palpite='time1')
+        match = Match.objects.create(
+            home_team='Flamengo', away_team='Palmeiras', competition='Brasileirão Série A',
+            match_date=date(2024, 5, 1), match_time=time(16, 0),
+        )
+        Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=match, prediction='home')
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com')
+
+        self.generate()
+        generated = set(Match.objects.filter(external_id__startswith='load-').values_list('pk', flat=True))
+        self.generate('--clear', '--users', '0')
+
+        self.assertEqual(list(User.objects.all()), [user])
+        self.assertEqual(list(Jogo.objects.all()), [jogo])
+        self.assertEqual(Palpite.objects.count(), 1)
+        self.assertEqual(list(Prediction.objects.values_list('user_email', flat=True)), ['ana@example.com'])
+        self.assertEqual(list(UserStats.objects.values_list('user_email', flat=True)), ['ana@example.com'])
+        self.assertEqual(Match.objects.count(), 41)
+        # Deleted matches reach delta sync clients
+        tombstones = set(Tombstone.objects.filter(model='matches.match').values_list('object_id', flat=True))
+        self.assertEqual(tombstones, generated)
+
+
+class ResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_teams_are_cached_until_a_team_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            team = Team.objects.create(name='Flamengo', short_name='FLA')
+        self.client.get('/api/teams/')
+
+        # Only the ETag validator and the payload's version are read
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/teams/')
+        self.assertEqual(response.json()[0]['short_name'], 'FLA')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            team.short_name = 'CRF'
+            team.save()
+
+        response = self.client.get('/api/teams/')
+        self.assertEqual(response.json()[0]['short_name'], 'CRF')
+
+    def test_bumps_from_other_processes_invalidate_payloads(self):
+        Team.objects.create(name='Flamengo', short_name='FLA')
+        self.client.get('/api/teams/')
+        Team.objects.update(short_name='CRF')
+
+        # What a sync_worker or live_poller commit leaves behind
+        CacheVersion.objects.filter(name=TEAMS).update(version=F('version') + 1)
+        self.assertEqual(self.client.get('/api/teams/').json()[0]['short_name'], 'CRF')
+
+    def test_bulk_sync_invalidates_upcoming(self):
+        fixture = make_fixture(1, match_date=FUTURE_DATE.isoformat())
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_matches([fixture])
+        self.assertEqual(len(self.client.get('/api/matches/upcoming/').json()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sync_matches([fixture, make_fixture(2, match_date=FUTURE_DATE.isoformat())])
+
+        self.assertEqual(len(self.client.get('/api/matches/upcoming/').json()), 2)
+
+    def test_ranking_follows_stats_updates(self):
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com', total_predictions=1)
+        self.client.get('/api/stats/ranking/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            increment_total_predictions('ana@example.com', 'Ana')
+
+        response = self.client.get('/api/stats/ranking/')
+        self.assertEqual(response.json()[0]['total_predictions'], 2)
+
+    def test_ranking_follows_increment_after_a_concurrent_insert(self):
+        UserStats.objects.create(user_name='Bia', user_email='bia@example.com', total_predictions=5)
+        self.client.get('/api/stats/ranking/')
+
+        # Another worker stores Ana's first prediction, and announces it,
+        # between the UPDATE that finds no row and the INSERT
+        def insert_after_update(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if sql.startswith('UPDATE') and not UserStats.objects.filter(user_email='ana@example.com').exists():
+                UserStats.objects.bulk_create([
+                    UserStats(user_name='Ana', user_email='ana@example.com', total_predictions=5),
+                ])
+                notify_stats_changed()
+            return result
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with connection.execute_wrapper(insert_after_update):
+                increment_total_predictions('ana@example.com', 'Ana')
+
+        totals = {row['user_email']: row['total_predictions'] for row in self.client.get('/api/stats/ranking/').json()}
+        self.assertEqual(totals['ana@example.com'], 6)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.team = Team.objects.create(name='Palmeiras', short_name='PAL')
+
+    def test_list_answers_not_modified_without_serializing(self):
+        response = self.client.get('/api/teams/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/teams/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_list_ignores_if_modified_since(self):
+        Team.objects.create(name='Santos', short_name='SAN')
+        since = http_date((timezone.now() + timedelta(minutes=1)).timestamp())
+
+        # Deleting a row other than the newest leaves MAX(updated_at) as is
+        self.team.delete()
+        response = self.client.get('/api/teams/', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_list_etag_changes_on_update_and_delete(self):
+        Team.objects.create(name='Santos', short_name='SAN')
+        etag = self.client.get('/api/teams/')['ETag']
+
+        self.team.short_name = 'SEP'
+        self.team.save()
+        response = self.client.get('/api/teams/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        Team.objects.filter(name='Santos').delete()
+        response = self.client.get('/api/teams/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_validators(self):
+        response = self.client.get(f'/api/teams/{self.team.slug}/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(f'/api/teams/{self.team.slug}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            f'/api/teams/{self.team.slug}/', HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+        Team.objects.filter(pk=self.team.pk).update(updated_at=timezone.now() + timedelta(minutes=1))
+        response = self.client.get(f'/api/teams/{self.team.slug}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_match_and_stats_lists_are_validated(self):
+        Match.objects.create(
+            home_team='Home', away_team='Away', competition='Copa',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com')
+
+        for path in ('/api/matches/', '/api/stats/'):
+            with self.subTest(path=path):
+                etag = self.client.get(path)['ETag']
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                # Other pages or filters are other representations
+                response = self.client.get(path, {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+
+    def test_match_validators_follow_embedded_teams(self):
+        match = Match.objects.create(
+            home_team='Palmeiras', away_team='Away', competition='Copa',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+        list_etag = self.client.get('/api/matches/')['ETag']
+        detail = self.client.get(f'/api/matches/{match.pk}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.logo_url = 'https://example.com/pal.png'
+            self.team.save()
+        # Last-Modified has a one second resolution
+        Team.objects.filter(pk=self.team.pk).update(updated_at=timezone.now() + timedelta(minutes=1))
+
+        response = self.client.get('/api/matches/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        for headers in ({'HTTP_IF_NONE_MATCH': detail['ETag']}, {'HTTP_IF_MODIFIED_SINCE': detail['Last-Modified']}):
+            response = self.client.get(f'/api/matches/{match.pk}/', **headers)
+            self.assertEqual(response.status_code, 200)
+
+
+class BootstrapTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Team.objects.create(name='Palmeiras', short_name='PAL')
+        self.match = Match.objects.create(
+            home_team='Palmeiras', away_team='Santos', competition='Brasileirão Série A',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com', total_points=3)
+        Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=self.match, prediction='home')
+
+    def test_bundles_the_start_up_sections(self):
+        data = self.client.get('/api/bootstrap/', {'email': 'ana@example.com'}).json()
+
+        self.assertEqual(data['teams'], self.client.get('/api/teams/').json())
+        self.assertEqual(data['upcoming'], self.client.get('/api/matches/upcoming/').json())
+        self.assertEqual(data['ranking'], self.client.get('/api/stats/ranking/').json())
+        mine = self.client.get('/api/predictions/my_predictions/', {'email': 'ana@example.com'}).json()
+        self.assertEqual(data['predictions'], {'next': None, 'results': mine})
+        self.assertIsNone(self.client.get('/api/bootstrap/').json()['predictions'])
+
+    def test_warm_sections_and_revalidation_cost_one_query(self):
+        etag = self.client.get('/api/bootstrap/', {'email': 'ana@example.com'})['ETag']
+
+        # The versions, read once for every section
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bootstrap/', {'email': 'ana@example.com'})
+        self.assertEqual(response['ETag'], etag)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bootstrap/', {'email': 'ana@example.com'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_with_any_section(self):
+        params = {'email': 'ana@example.com'}
+        etag = self.client.get('/api/bootstrap/', params)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Prediction.objects.filter(user_email='ana@example.com').get().save()
+        response = self.client.get('/api/bootstrap/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Team.objects.filter(name='Palmeiras').get().save()
+            Team.objects.update(short_name='SEP')
+        response = self.client.get('/api/bootstrap/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['teams'][0]['short_name'], 'SEP')
+        self.assertEqual(data['upcoming'][0]['home_team_details']['short_name'], 'SEP')
+        self.assertEqual(data['predictions']['results'][0]['match_details']['home_team_details']['short_name'], 'SEP')
+
+    def test_predictions_page_continues_on_my_predictions(self):
+        for i in range(2):
+            Prediction.objects.create(
+                user_name='Ana', user_email='ana@example.com', prediction='draw',
+                match=Match.objects.create(
+                    home_team=f'Home {i}', away_team='Away', competition='Copa',
+                    match_date=FUTURE_DATE, match_time=time(18, 0),
+                ),
+            )
+
+        section = self.client.get('/api/bootstrap/', {'email': 'ana@example.com', 'page_size': 2}).json()['predictions']
+        self.assertEqual(len(section['results']), 2)
+        self.assertIn('/api/predictions/my_predictions/?email=', section['next'])
+
+        rest = self.client.get(section['next']).json()
+        seen = [p['id'] for p in section['results'] + rest['results']]
+        self.assertCountEqual(seen, Prediction.objects.values_list('id', flat=True))
+
+
+class DeltaSyncTests(TestCase):
+
+    def create_match(self, index):
+        return Match.objects.create(
+            home_team=f'Home {index}', away_team=f'Away {index}', competition='Copa',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+
+    def test_only_rows_changed_since_are_returned(self):
+        old = self.create_match(1)
+        Match.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        since = timezone.now() - timedelta(minutes=1)
+        changed = self.create_match(2)
+
+        response = self.client.get('/api/matches/', {'since': since.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['results']], [changed.id])
+        self.assertEqual(response.json()['deleted'], [])
+
+    def test_deletions_come_back_as_tombstones(self):
+        since = timezone.now().isoformat()
+        team = Team.objects.create(name='Vasco', short_name='VAS')
+        team_id = team.id
+        team.delete()
+        stats = UserStats.objects.create(user_name='Ana', user_email='ana@example.com')
+        stats_id = stats.id
+        UserStats.objects.filter(pk=stats_id).delete()
+
+        teams = self.client.get('/api/teams/', {'since': since}).json()
+        self.assertEqual(teams['results'], [])
+        self.assertEqual(teams['deleted'], [team_id])
+        self.assertEqual(self.client.get('/api/stats/', {'since': since}).json()['deleted'], [stats_id])
+
+    def test_bulk_deletes_leave_tombstones_in_one_statement(self):
+        UserStats.objects.bulk_create(
+            UserStats(user_name=f'User {i}', user_email=f'user{i}@example.com') for i in range(50)
+        )
+        ids = list(UserStats.objects.values_list('id', flat=True))
+
+        # Tombstones, then one DELETE instead of a fetch and a signal per row
+        with self.assertNumQueries(4):
+            UserStats.objects.filter(user_email__startswith='user').delete()
+
+        self.assertCountEqual(
+            Tombstone.objects.filter(model='matches.userstats').values_list('object_id', flat=True), ids
+        )
+
+    def test_expired_tombstones_are_pruned_by_the_worker(self):
+        Tombstone.objects.create(model='matches.match', object_id=1, deleted_at=timezone.now() - timedelta(days=31))
+        Tombstone.objects.create(model='matches.match', object_id=2)
+
+        call_command('sync_worker', once=True, stdout=StringIO())
+
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [2])
+
+    def test_watermark_feeds_the_next_call(self):
+        first = self.client.get('/api/stats/', {'since': timezone.now().isoformat()}).json()
+        UserStats.objects.create(user_name='Bia', user_email='bia@example.com')
+
+        second = self.client.get('/api/stats/', {'since': first['watermark']}).json()
+
+        self.assertEqual([row['user_email'] for row in second['results']], ['bia@example.com'])
+
+    def test_invalid_or_expired_since_is_rejected(self):
+        for since in ('yesterday', (timezone.now() - timedelta(days=90)).isoformat()):
+            with self.subTest(since=since):
+                response = self.client.get('/api/matches/', {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('since', response.json())
+
+
+class StubFootballAPI:
+    """
+    Local http.server standing in for api-football
+
+    `replies` maps a league id, 'live' or 'ids' to a list of (status,
+    headers, body) served in turn, the last one repeating.
+    """
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                stub.requests.append((self.headers['x-apisports-key'], params))
+                if 'league' in params:
+                    queue = stub.replies[int(params['league'][0])]
+                else:
+                    queue = stub.replies['ids' if 'ids' in params else 'live']
+                status, headers, body = queue.pop(0) if len(queue) > 1 else queue[0]
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def fixtures_body(league, *fixture_ids):
+    return {'errors': [], 'response': [
+        {
+            'fixture': {'id': fixture_id, 'date': '2025-05-10T19:00:00+00:00'},
+            'league': {'name': league},
+            'teams': {'home': {'name': f'Home {fixture_id}'}, 'away': {'name': f'Away {fixture_id}'}},
+        }
+        for fixture_id in fixture_ids
+    ]}
+
+
+@override_settings(FOOTBALL_API_CACHE_DIR=None)
+class FootballAPIClientTests(TestCase):
+
+    def client_for(self, stub):
+        api = FootballAPI(api_key='test-key', base_url=stub.url)
+        api.backoff_base = 0
+        self.addCleanup(api.close)
+        return api
+
+    def test_leagues_are_fetched_and_normalized(self):
+        replies = {
+            71: [(200, {}, fixtures_body('Brasileirão Série A', 1, 2))],
+            72: [(200, {}, fixtures_body('Brasileirão Série B', 3))],
+        }
+        with StubFootballAPI(replies) as stub:
+            matches = self.client_for(stub).get_upcoming_matches_real([(71, 2025), (72, 2025)])
+
+        self.assertEqual([match['external_id'] for match in matches], ['1', '2', '3'])
+        self.assertEqual(matches[2], {
+            'home_team': 'Home 3',
+            'away_team': 'Away 3',
+            'competition': 'Brasileirão Série B',
+            'match_date': '2025-05-10',
+            'match_time': '19:00:00',
+            'status': 'scheduled',
+            'external_id': '3',
+        })
+        self.assertEqual({key for key, _ in stub.requests}, {'test-key'})
+        self.assertEqual(sorted(params['season'][0] for _, params in stub.requests), ['2025', '2025'])
+
+    def test_rate_limits_are_retried_after_the_advertised_delay(self):
+        replies = {71: [
+            (429, {'Retry-After': '0'}, {}),
+            (503, {}, {}),
+            (200, {}, fixtures_body('Brasileirão Série A', 7)),
+        ]}
+        with StubFootballAPI(replies) as stub:
+            api = self.client_for(stub)
+            matches = api.get_upcoming_matches_real([(71, 2025)])
+
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual(matches[0]['external_id'], '7')
+
+        response = type('Response', (), {'headers': {'Retry-After': '12'}})()
+        self.assertEqual(api._retry_delay(0, response), 12)
+
+    def test_live_fixtures_take_one_request_plus_lookups_by_id(self):
+        replies = {
+            'live': [(200, {}, fixtures_body('Série A', 1))],
+            'ids': [(200, {}, fixtures_body('Série A', 2))],
+        }
+        with StubFootballAPI(replies) as stub:
+            api = self.client_for(stub)
+            matches = api.get_live_fixtures()
+            matches += api.get_live_fixtures([str(i) for i in range(25)])
+
+        self.assertEqual([match['external_id'] for match in matches], ['1', '1', '2', '2'])
+        self.assertEqual(stub.requests[0][1], {'live': ['71']})
+        lookups = [params['ids'][0] for _, params in stub.requests if 'ids' in params]
+        self.assertEqual(sorted(len(ids.split('-')) for ids in lookups), [5, 20])
+
+    def test_failures_raise_instead_of_returning_mock_data(self):
+        replies = {
+            71: [(500, {}, {})],
+            72: [(200, {}, {'errors': {'token': 'Invalid key'}, 'response': []})],
+        }
+        with StubFootballAPI(replies) as stub:
+            api = self.client_for(stub)
+            with self.assertRaises(FootballAPIError):
+                api.get_upcoming_matches_real([(71, 2025)])
+            self.assertEqual(len(stub.requests), api.max_retries + 1)
+
+            with self.assertRaises(FootballAPIError):
+                api.get_upcoming_matches_real([(72, 2025)])
+
+
+class APIResponseCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = APIResponseCache(directory.name, daily_budget=3)
+
+    def client_for(self, stub):
+        api = FootballAPI(api_key='test-key', base_url=stub.url, cache=self.cache)
+        api.backoff_base = 0
+        self.addCleanup(api.close)
+        return api
+
+    def test_fresh_responses_are_served_without_a_request(self):
+        replies = {71: [(200, {'ETag': '"v1"'}, fixtures_body('Série A', 1))]}
+        with StubFootballAPI(replies) as stub:
+            api = self.client_for(stub)
+            first = api.get_upcoming_matches_real([(71, 2025)])
+            second = api.get_upcoming_matches_real([(71, 2025)])
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(stub.requests), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['requests']), (1, 1, 1))
+        self.assertEqual(stats['remaining'], 2)
+
+    def test_expired_responses_are_revalidated_with_their_etag(self):
+        self.cache.ttls['fixtures'] = 0
+        replies = {71: [
+            (200, {'ETag': '"v1"'}, fixtures_body('Série A', 1)),
+            (304, {}, {}),
+        ]}
+        with StubFootballAPI(replies) as stub:
+            api = self.client_for(stub)
+            api.get_upcoming_matches_real([(71, 2025)])
+            matches = api.get_upcoming_matches_real([(71, 2025)])
+
+        self.assertEqual(matches[0]['external_id'], '1')
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+
+    def test_spent_budget_degrades_to_cached_data_then_refuses(self):
+        self.cache.ttls['fixtures'] = 0
+        replies = {
+            71: [(200, {}, fixtures_body('Série A', 1))],
+            72: [(200, {}, fixtures_body('Série B', 2))],
+        }
+        with StubFootballAPI(replies) as stub:
+            api = self.client_for(stub)
+            api.get_upcoming_matches_real([(71, 2025)])
+            # The server's counters win when they report more usage
+            self.cache.sync_quota(limit=100, remaining=97)
+
+            matches = api.get_upcoming_matches_real([(71, 2025)])
+            self.assertEqual(matches[0]['external_id'], '1')
+            with self.assertRaises(FootballAPIQuotaExceeded):
+                api.get_upcoming_matches_real([(72, 2025)])
+
+        self.assertEqual(len(stub.requests), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['remaining'], stats['stale'], stats['refused']), (0, 1, 2))
+
+    def test_workers_sharing_a_directory_never_overspend(self):
+        # One cache per worker, as in separate processes
+        caches = [APIResponseCache(self.cache.directory, daily_budget=100) for _ in range(4)]
+        granted = []
+
+        def reserve(cache):
+            granted.extend(cache.reserve_request() for _ in range(40))
+
+        threads = [threading.Thread(target=reserve, args=(cache,)) for cache in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(granted.count(True), 100)
+        stats = self.cache.stats()
+        self.assertEqual((stats['requests'], stats['refused']), (100, 60))
+
+    def test_status_endpoint(self):
+        with override_settings(FOOTBALL_API_CACHE_DIR=self.cache.directory):
+            response = self.client.get('/api/matches/api_status/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['cache_enabled'])
+        self.assertEqual(response.json()['budget'], 90)
+
+
+class StubFixturesAPI:
+    """FootballAPI stand-in recording the windows asked for"""
+
+    def __init__(self, fixtures=(), error=None):
+        self.fixtures = list(fixtures)
+        self.error = error
+        self.calls = []
+
+    def get_fixtures(self, date_from=None, date_to=None):
+        self.calls.append((date_from, date_to))
+        if self.error:
+            raise self.error
+        return self.fixtures
+
+
+class SyncJobTests(TestCase):
+
+    def test_windows_cover_the_dates_that_can_change(self):
+        today = date(2025, 5, 10)
+        self.assertEqual(window_dates('upcoming', today), (today, date(2025, 5, 17)))
+        self.assertEqual(window_dates('recent', today), (date(2025, 5, 8), today))
+        self.assertEqual(window_dates('season', today), (None, None))
+
+    def test_windows_are_due_after_their_interval(self):
+        now = timezone.now()
+        api = StubFixturesAPI([make_fixture(1)])
+
+        jobs = run_pending(api, now)
+
+        self.assertEqual([job.window for job in jobs], ['upcoming', 'recent', 'season'])
+        self.assertTrue(all(job.status == 'succeeded' for job in jobs))
+        self.assertEqual(jobs[0].fetched, 1)
+        self.assertEqual(due_windows(now + timedelta(minutes=30)), [])
+        self.assertEqual(due_windows(now + timedelta(hours=2)), ['upcoming', 'recent'])
+        self.assertEqual(due_windows(now + timedelta(days=1)), ['upcoming', 'recent', 'season'])
+
+    def test_failures_are_recorded(self):
+        enqueue_sync('recent')
+
+        jobs = run_pending(StubFixturesAPI(error=FootballAPIError('HTTP 503')))
+
+        self.assertTrue(all(job.status == 'failed' for job in jobs))
+        self.assertEqual(SyncJob.objects.get(window='recent').error, 'FootballAPIError: HTTP 503')
+
+    def test_worker_fails_jobs_left_running(self):
+        job = enqueue_sync('season')
+        SyncJob.objects.filter(pk=job.pk).update(status='running')
+
+        out = StringIO()
+        call_command('sync_worker', once=True, stdout=out)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'Interrupted'))
+        self.assertIn('1 interrupted', out.getvalue())
+
+    def test_fixture_status_and_goals_are_mapped(self):
+        fixture = fixtures_body('Série A', 9)['response'][0]
+        fixture['fixture']['status'] = {'short': 'AET'}
+        fixture['goals'] = {'home': 1, 'away': 1}
+
+        match = normalize_fixture(fixture)
+
+        self.assertEqual((match['status'], match['home_score'], match['away_score']), ('finished', 1, 1))
+
+    def test_fixture_without_goals_leaves_scores_out(self):
+        fixture = fixtures_body('Série A', 9)['response'][0]
+        fixture['goals'] = {'home': None, 'away': None}
+
+        self.assertFalse({'home_score', 'away_score'} & set(normalize_fixture(fixture)))
+
+
+class StubLiveAPI:
+    """FootballAPI stand-in serving a live feed and fixtures by id"""
+
+    def __init__(self, live=(), by_id=()):
+        self.live = list(live)
+        self.by_id = {fixture['external_id']: fixture for fixture in by_id}
+        self.calls = []
+
+    def get_live_fixtures(self, fixture_ids=()):
+        self.calls.append(list(fixture_ids))
+        if not fixture_ids:
+            return self.live
+        return [self.by_id[external_id] for external_id in fixture_ids if external_id in self.by_id]
+
+
+class StubQuota:
+    """The stats() of an APIResponseCache with `remaining` requests until `resets_at`"""
+
+    def __init__(self, remaining, resets_at):
+        self.remaining = remaining
+        self.resets_at = resets_at
+
+    def stats(self):
+        return {'remaining': self.remaining, 'resets_at': self.resets_at.isoformat()}
+
+
+class LivePollerTests(TestCase):
+
+    def create_match(self, external_id, kickoff, status='scheduled'):
+        return Match.objects.create(
+            home_team='Home', away_team='Away', competition='Série A',
+            match_date=kickoff.date(), match_time=kickoff.time().replace(microsecond=0),
+            status=status, external_id=external_id,
+        )
+
+    def test_no_request_and_one_query_without_games(self):
+        self.create_match('later', timezone.localtime() + timedelta(hours=5))
+        api = StubLiveAPI()
+
+        with self.assertNumQueries(1):
+            result = poll_live_matches(api)
+
+        self.assertEqual(result['polled'], 0)
+        self.assertEqual(api.calls, [])
+
+    def test_changes_are_written_in_one_update_and_finished_games_settled(self):
+        now = timezone.localtime()
+        started = self.create_match('started', now - timedelta(minutes=10))
+        ending = self.create_match('ending', now - timedelta(minutes=100), status='live')
+        Prediction.objects.create(user_name='Ana', user_email='ana@example.com', match=ending, prediction='away')
+        api = StubLiveAPI(
+            live=[make_fixture(0, external_id='started', status='live', home_score=1, away_score=0)],
+            by_id=[make_fixture(0, external_id='ending', status='finished', home_score=0, away_score=2)],
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            result = poll_live_matches(api)
+
+        self.assertEqual(result, {'polled': 2, 'updated': 2, 'finished': 1})
+        self.assertEqual(api.calls, [[], ['ending']])
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "matches_match"')]), 1)
+        started.refresh_from_db()
+        self.assertEqual((started.status, started.home_score), ('live', 1))
+        self.assertTrue(Prediction.objects.get().is_correct)
+
+        # Nothing changed, nothing written
+        api.by_id = {}
+        self.assertEqual(poll_live_matches(api)['updated'], 0)
+
+    def test_poll_interval_adapts_to_the_schedule(self):
+        now = timezone.now()
+        self.assertEqual(next_poll_in(now), IDLE_INTERVAL)
+
+        match = self.create_match('soon', timezone.localtime(now) + timedelta(minutes=5))
+        self.assertAlmostEqual(next_poll_in(now), 5 * 60, delta=1)
+
+        match.status = 'live'
+        match.save()
+        self.assertEqual(next_poll_in(now), LIVE_INTERVAL)
+
+    def test_live_interval_spreads_the_remaining_quota(self):
+        now = timezone.now()
+        match = self.create_match('on', timezone.localtime(now), status='live')
+        quota = StubQuota(60, now + timedelta(hours=10))
+
+        # 21 requests left to the syncs of the next 10 hours, one for the
+        # final score, 38 polls until the match's window closes
+        seconds = (match.kickoff_at + LIVE_WINDOW - now) / timedelta(seconds=1)
+        self.assertAlmostEqual(next_poll_in(now, cache=quota), seconds / 38)
+
+        quota.remaining = 5000
+        self.assertEqual(next_poll_in(now, cache=quota), LIVE_INTERVAL)
+        quota.remaining = 20
+        self.assertEqual(next_poll_in(now, cache=quota), IDLE_INTERVAL)
+
+
+class LiveEventsTests(TestCase):
+
+    def create_match(self):
+        return Match.objects.create(
+            home_team='Home', away_team='Away', competition='Série A',
+            match_date=FUTURE_DATE, match_time=time(16, 0),
+        )
+
+    def test_changes_are_collected_once(self):
+        events = Broadcaster()
+        events.collect()
+        match = self.create_match()
+
+        [(topic, data)] = events.collect()
+        self.assertEqual(topic, SCORES)
+        self.assertEqual([row['id'] for row in data['changed']], [match.id])
+        self.assertEqual(events.collect(), [])
+
+        match.home_score = 1
+        match.save()
+        [(_, data)] = events.collect()
+        self.assertEqual(data['changed'][0]['home_score'], 1)
+
+    def test_leaderboard_changes_carry_positions_or_ask_for_reload(self):
+        events = Broadcaster()
+        events.collect()
+        UserStats.objects.create(user_name='Ana', user_email='ana@example.com', total_points=30)
+
+        [(_, data)] = events.collect()
+        self.assertEqual(data['changed'][0]['position'], 1)
+
+        UserStats.objects.bulk_create(
+            UserStats(user_name='User', user_email=f'user{i}@example.com') for i in range(60)
+        )
+        [(_, data)] = events.collect()
+        self.assertEqual(data, {'reload': True, 'changed': []})
+
+    def test_slow_subscribers_are_reset(self):
+        subscription = Subscription([SCORES], queue_size=2)
+        self.assertTrue(subscription.push(b'1'))
+        self.assertTrue(subscription.push(b'2'))
+
+        self.assertFalse(subscription.push(b'3'))
+        self.assertIsNone(subscription.queue.get_nowait())
+        self.assertTrue(subscription.queue.empty())
+
+    def test_unknown_topics_are_rejected(self):
+        response = self.client.get('/api/events/', {'topics': 'scores,weather'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_stream_relays_published_events(self):
+        response = await self.async_client.get('/api/events/', {'topics': 'scores'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content.__aiter__()
+        self.assertEqual(await stream.__anext__(), b'retry: 5000\n\n')
+
+        broadcaster.publish(SCORES, {'reload': True, 'changed': []})
+        broadcaster.publish('leaderboard', {'reload': True, 'changed': []})
+
+        self.assertEqual(
+            await stream.__anext__(),
+            b'event: scores\ndata: {"reload":true,"changed":[]}\n\n',
+        )
+
+        # A disconnect cancels the response task, which ends the subscription
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(broadcaster.subscribers, set())
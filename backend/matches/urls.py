@@ -1,13 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MatchViewSet, PredictionViewSet, UserStatsViewSet, TeamViewSet
+from .views import MatchViewSet, PredictionViewSet, SyncJobViewSet, UserStatsViewSet, TeamViewSet, bootstrap, export_data, live_events
 
 router = DefaultRouter()
 router.register(r'teams', TeamViewSet, basename='team')
 router.register(r'matches', MatchViewSet, basename='match')
 router.register(r'predictions', PredictionViewSet, basename='prediction')
 router.register(r'stats', UserStatsViewSet, basename='userstats')
+router.register(r'sync-jobs', SyncJobViewSet, basename='syncjob')
 
 urlpatterns = [
+    path('bootstrap/', bootstrap, name='bootstrap'),
+    path('events/', live_events, name='live-events'),
+    path('exports/<str:dataset>.<str:export_format>', export_data, name='export-data'),
     path('', include(router.urls)),
 ]
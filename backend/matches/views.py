@@ -1,16 +1,57 @@
+import asyncio
+import hashlib
+from datetime import date
+from urllib.parse import urlencode
+
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.reverse import reverse
+from rest_framework.permissions import AllowAny, IsAdminUser
+from django.db import transaction
+from django.utils import timezone
 from django.db.models import Count, Q
-from datetime import datetime, timedelta
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+
+from core.conditional import ConditionalGetMixin
+from core.pagination import KeysetPagination
+from core.rows import ValuesListMixin
+from core.streaming import StreamingListMixin, streaming_response
 
-from .models import Match, Prediction, UserStats, Team
-from .serializers import MatchSerializer, PredictionSerializer, UserStatsSerializer, TeamSerializer
+from .models import Match, Prediction, SyncJob, UserStats, Team
+from .serializers import (
+    MatchSerializer, PredictionSerializer, UserStatsSerializer, TeamSerializer,
+    PredictionUpsertSerializer, RankedUserStatsSerializer, SyncJobSerializer,
+    MATCH_ROWS, PREDICTION_ROWS, RANKED_USER_STATS_ROWS, TEAM_ROWS, USER_STATS_ROWS,
+)
+from .cache import MATCHES, PREDICTIONS, STATS, TEAMS, cached_payload, get_version, versions_snapshot
+from .delta import DeltaSyncMixin
+from .events import TOPICS, broadcaster
+from .exports import DATASETS, Export, ExportError
 from .external_api import FootballAPI
+from .leaderboard import rank_range_values, user_position, users_around
+from .predictions import submit_predictions, upsert_prediction
+from .settlement import settle_edited_match
+from .stats import increment_total_predictions
+from .sync_jobs import WINDOWS, enqueue_sync
+
+
+# Largest batch accepted by PredictionViewSet.bulk
+BULK_PREDICTIONS_LIMIT = 100
+
+# Most ranking rows a request may ask for, through limit or 2 * span + 1
+RANKING_MAX_LIMIT = 200
+
+# Cache namespaces the bootstrap sections are built from
+BOOTSTRAP_NAMESPACES = [TEAMS, MATCHES, STATS, PREDICTIONS]
+
+# Seconds between keep-alive comments on idle event streams
+EVENTS_HEARTBEAT = 15
 
 
-class TeamViewSet(viewsets.ReadOnlyModelViewSet):
+class TeamViewSet(DeltaSyncMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Team model
     Provides read-only access to teams
@@ -19,107 +60,180 @@ class TeamViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TeamSerializer
     permission_classes = [AllowAny]
     lookup_field = 'slug'
+    pagination_class = None  # A league fits in one response
 
+    def list(self, request, *args, **kwargs):
+        """List teams, cached until a team changes and validated by ETag"""
+        if request.query_params.get(self.since_query_param):
+            return self.delta_list(request)
 
-class MatchViewSet(viewsets.ModelViewSet):
+        return self.conditional_list(request, lambda: Response(teams_payload()))
+
+
+class MatchViewSet(DeltaSyncMixin, ConditionalGetMixin, StreamingListMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Match model
     Provides CRUD operations and custom actions
     """
-    queryset = Match.objects.all()
+    queryset = Match.objects.with_teams()
     serializer_class = MatchSerializer
+    row_mapper = MATCH_ROWS
     permission_classes = [AllowAny]  # Allow public access for now
 
+    def extra_validator(self):
+        # Matches embed their teams, whose changes leave Match.updated_at alone
+        return f'teams:{get_version(TEAMS)}'
+
+    def last_modified_of(self, instance):
+        teams = [team for team in (instance.home_team_ref, instance.away_team_ref) if team is not None]
+        return max([instance.updated_at] + [team.updated_at for team in teams])
+
+    def perform_update(self, serializer):
+        """Settle predictions again when the edit changes the match's outcome"""
+        previous_outcome = serializer.instance.result
+        match = serializer.save()
+        settle_edited_match(match, previous_outcome)
+
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
-        """Get upcoming matches (next 7 days)"""
-        today = datetime.now().date()
-        upcoming_date = today + timedelta(days=7)
+        """Get upcoming matches (next 7 days), cached until a match changes"""
+        return Response(upcoming_payload())
 
-        matches = Match.objects.filter(
-            match_date__gte=today,
-            match_date__lte=upcoming_date,
-            status='scheduled'
-        ).order_by('match_date', 'match_time')
+    @action(detail=False, methods=['get'])
+    def live(self, request):
+        """Get matches in play or whose kickoff window is open"""
+        matches = Match.objects.with_teams().live_window()
 
         serializer = self.get_serializer(matches, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def api_status(self, request):
+        """Football API response cache counters and today's remaining quota"""
+        cache = FootballAPI().cache
+        if cache is None:
+            return Response({'cache_enabled': False})
+        return Response({'cache_enabled': True, **cache.stats()})
+
     @action(detail=False, methods=['post'])
     def sync_from_api(self, request):
         """
-        Sync matches from external API
-        This endpoint fetches matches from external API and saves to database
-        """
-        api = FootballAPI()
-        matches_data = api.get_upcoming_matches()
-
-        created_count = 0
-        updated_count = 0
-
-        for match_data in matches_data:
-            # Convert string dates to proper format
-            match_date = datetime.fromisoformat(match_data['match_date']).date()
-            match_time = datetime.fromisoformat(match_data['match_time']).time()
-
-            match, created = Match.objects.update_or_create(
-                external_id=match_data.get('external_id'),
-                defaults={
-                    'home_team': match_data['home_team'],
-                    'away_team': match_data['away_team'],
-                    'competition': match_data['competition'],
-                    'match_date': match_date,
-                    'match_time': match_time,
-                    'status': match_data.get('status', 'scheduled'),
-                }
-            )
+        Queue a sync of the coming week's matches from the external API
 
-            if created:
-                created_count += 1
-            else:
-                updated_count += 1
+        The sync_worker command runs it; follow the returned job for counts.
+        Query param: window (upcoming, recent or season).
+        """
+        window = request.data.get('window') or request.query_params.get('window', 'upcoming')
+        if window not in WINDOWS:
+            raise ValidationError({'window': f"Must be one of {', '.join(WINDOWS)}."})
 
+        job = enqueue_sync(window)
+        url = reverse('syncjob-detail', args=[job.pk], request=request)
         return Response({
-            'message': 'Matches synced successfully',
-            'created': created_count,
-            'updated': updated_count,
-            'total': len(matches_data)
-        })
+            'message': 'Sync queued',
+            'job': SyncJobSerializer(job).data,
+            'url': url,
+        }, status=status.HTTP_202_ACCEPTED, headers={'Location': url})
+
+
+class SyncJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for SyncJob model
+    Provides the status and metrics of fixture syncs
+    """
+    queryset = SyncJob.objects.all()
+    serializer_class = SyncJobSerializer
+    permission_classes = [AllowAny]
 
 
-class PredictionViewSet(viewsets.ModelViewSet):
+class PredictionViewSet(StreamingListMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Prediction model
     Allows users to create and view predictions
     """
-    queryset = Prediction.objects.all()
+    queryset = Prediction.objects.select_related('match__home_team_ref', 'match__away_team_ref')
     serializer_class = PredictionSerializer
     permission_classes = [AllowAny]
+    row_mapper = PREDICTION_ROWS
 
     def create(self, request, *args, **kwargs):
         """Create a prediction and update user stats"""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
 
-        # Update user stats
-        user_email = request.data.get('user_email')
-        user_name = request.data.get('user_name')
+        with transaction.atomic():
+            self.perform_create(serializer)
 
-        if user_email:
-            user_stats, created = UserStats.objects.get_or_create(
-                user_email=user_email,
-                defaults={'user_name': user_name}
-            )
-            user_stats.total_predictions += 1
-            user_stats.save()
+            # Update user stats
+            user_email = serializer.validated_data.get('user_email')
+            if user_email:
+                increment_total_predictions(user_email, serializer.validated_data['user_name'])
 
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create several predictions at once (e.g. a whole round)
+
+        Expects a list of predictions. Each item is validated and reported
+        on its own, so duplicates or invalid rows do not fail the batch.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'A non-empty list of predictions is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > BULK_PREDICTIONS_LIMIT:
+            return Response(
+                {'error': f'At most {BULK_PREDICTIONS_LIMIT} predictions per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = submit_predictions(items)
+
+        created = [result for result in results if result['status'] == 'created']
+        serializer = self.get_serializer([result['prediction'] for result in created], many=True)
+        for result, data in zip(created, serializer.data):
+            result['prediction'] = data
+
+        if len(created) == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            'created': len(created),
+            'failed': len(results) - len(created),
+            'results': results,
+        }, status=response_status)
+
+    @action(detail=False, methods=['put'])
+    def upsert(self, request):
+        """
+        Create or edit the prediction of a user for a match
+
+        Keyed on (user_email, match): a second call for the same match
+        changes the pick instead of failing. Answers 201 when the
+        prediction was created and 200 when an existing one was changed.
+        """
+        serializer = PredictionUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        prediction, created = upsert_prediction(serializer.validated_data)
+
+        return Response({
+            'created': created,
+            'prediction': self.get_serializer(prediction).data,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def my_predictions(self, request):
-        """Get predictions for a specific user"""
+        """Get predictions for a specific user, all at once with ?stream=1"""
         user_email = request.query_params.get('email')
 
         if not user_email:
@@ -128,32 +242,276 @@ class PredictionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        predictions = Prediction.objects.filter(user_email=user_email)
-        serializer = self.get_serializer(predictions, many=True)
-        return Response(serializer.data)
+        predictions = self.get_queryset().filter(user_email=user_email)
+        if self.wants_stream(request):
+            return self.stream_list(predictions)
+        rows = predictions.values(*self.row_mapper.columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.row_mapper.map_many(page))
+        return Response(self.row_mapper.map_many(rows))
 
 
-class UserStatsViewSet(viewsets.ReadOnlyModelViewSet):
+class UserStatsViewSet(DeltaSyncMixin, ConditionalGetMixin, StreamingListMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for UserStats model
     Provides ranking and statistics
     """
     queryset = UserStats.objects.all()
     serializer_class = UserStatsSerializer
+    row_mapper = USER_STATS_ROWS
     permission_classes = [AllowAny]
 
     @action(detail=False, methods=['get'])
     def ranking(self, request):
-        """Get top users ranking"""
-        limit = int(request.query_params.get('limit', 10))
+        """
+        Get the users ranking
+
+        Tied users share a position. Responses are cached until stats change.
+        Query params: limit, offset, rank_from, rank_to, or around=<email>
+        with span to get the users right above and below someone.
+        """
+        around = request.query_params.get('around')
+
+        if around:
+            span = _int_param(request, 'span', 5, maximum=RANKING_MAX_LIMIT // 2)
+            key = f'ranking:around:{around}:{span}'
+
+            def build():
+                users = users_around(around, span=span)
+                return list(RankedUserStatsSerializer(users, many=True).data)
+        else:
+            return Response(ranking_payload(
+                limit=_int_param(request, 'limit', 10, maximum=RANKING_MAX_LIMIT),
+                offset=_int_param(request, 'offset', 0),
+                rank_from=_int_param(request, 'rank_from'),
+                rank_to=_int_param(request, 'rank_to'),
+            ))
+
+        try:
+            return Response(cached_payload(STATS, key, build))
+        except UserStats.DoesNotExist:
+            return Response(
+                {'error': 'User not found in ranking'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    @action(detail=False, methods=['get'])
+    def position(self, request):
+        """Get the ranking position of a specific user"""
+        user_email = request.query_params.get('email')
+
+        if not user_email:
+            return Response(
+                {'error': 'Email parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        positions = user_position(user_email)
+        if positions is None:
+            return Response(
+                {'error': 'User not found in ranking'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        position, dense_position = positions
+        return Response({
+            'user_email': user_email,
+            'position': position,
+            'dense_position': dense_position,
+        })
+
+
+# Payloads shared by the viewsets and bootstrap, so both read the same cache entries
+
+def teams_payload():
+    """All teams, cached until a team changes"""
+    def build():
+        return TEAM_ROWS.map_many(Team.objects.values(*TEAM_ROWS.columns))
+    return cached_payload(TEAMS, 'list', build)
+
+
+def upcoming_payload(now=None):
+    """Matches of the next 7 days, cached until a match changes"""
+    now = now or timezone.now()
+
+    def build():
+        return MATCH_ROWS.map_many(Match.objects.upcoming(days=7, now=now).values(*MATCH_ROWS.columns))
+
+    # Matches also leave the window as time passes, hence the minute in the
+    # key, and embed their teams, hence the teams version
+    return cached_payload(MATCHES, f'upcoming:{now:%Y%m%d%H%M}', build, depends_on=[TEAMS])
+
+
+def ranking_payload(limit=10, offset=0, rank_from=None, rank_to=None):
+    """A page of the ranking, cached until stats change"""
+    params = {'limit': limit, 'offset': offset, 'rank_from': rank_from, 'rank_to': rank_to}
+
+    def build():
+        return RANKED_USER_STATS_ROWS.map_many(rank_range_values(RANKED_USER_STATS_ROWS.columns, **params))
+
+    return cached_payload(STATS, 'ranking:{limit}:{offset}:{rank_from}:{rank_to}'.format(**params), build)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def bootstrap(request):
+    """
+    Everything the app shows on start-up in one response
+
+    Sections: teams, upcoming (next 7 days), ranking (top `limit`, default
+    10) and, when `email` is given, the first page of that user's
+    predictions. Each section comes from the response cache when warm. The
+    ETag combines the versions of the cache namespaces the sections are
+    built from, read once for the whole response, so a revalidation is
+    answered with 304 after that single query.
+    """
+    user_email = request.query_params.get('email')
+    limit = _int_param(request, 'limit', 10, maximum=RANKING_MAX_LIMIT)
+    now = timezone.now()
+
+    with versions_snapshot(*BOOTSTRAP_NAMESPACES) as versions:
+        digest = hashlib.md5(
+            f'bootstrap:{request.get_full_path()}:{now:%Y%m%d%H%M}:{versions}'.encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        etag = f'W/"{digest}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response({
+                'teams': teams_payload(),
+                'upcoming': upcoming_payload(now),
+                'ranking': ranking_payload(limit=limit),
+                'predictions': _bootstrap_predictions(request, user_email) if user_email else None,
+            })
+    response['ETag'] = etag
+    return response
+
+
+def _bootstrap_predictions(request, user_email):
+    """A page of my_predictions (page_size and cursor apply), `next` continuing on that endpoint"""
+    paginator = KeysetPagination()
+    key = 'mine:{}:{}:{}'.format(
+        user_email,
+        paginator.get_page_size(request),
+        request.query_params.get(paginator.cursor_query_param, ''),
+    )
+
+    def build():
+        predictions = Prediction.objects.select_related(
+            'match__home_team_ref', 'match__away_team_ref'
+        ).filter(user_email=user_email)
+        page = paginator.paginate(predictions, request)
+        next_link = None
+        if paginator.has_next and page:
+            url = reverse('prediction-my-predictions', request=request)
+            cursor = paginator.cursor_token(page[-1], reverse=False)
+            next_link = f'{url}?{urlencode({"email": user_email, "cursor": cursor})}'
+        return {'next': next_link, 'results': list(PredictionSerializer(page, many=True).data)}
+
+    # Matches and teams are embedded, so their versions are part of the key
+    return cached_payload(PREDICTIONS, key, build, depends_on=[MATCHES, TEAMS])
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_data(request, dataset, export_format):
+    """
+    Full export of a dataset (predictions, matches, ranking) as csv or ndjson
+
+    Query params: competition, date_from and date_to (YYYY-MM-DD, match
+    dates), finished=1 and gzip=1. The file is streamed as it is read from
+    the database, so it can be of any size. Staff only, rows carry emails.
+    """
+    if dataset not in DATASETS:
+        raise Http404
+    try:
+        export = Export(
+            dataset,
+            export_format=export_format,
+            compress=_bool_param(request, 'gzip'),
+            competition=request.query_params.get('competition') or None,
+            date_from=_date_param(request, 'date_from'),
+            date_to=_date_param(request, 'date_to'),
+            finished=_bool_param(request, 'finished'),
+        )
+    except ExportError as e:
+        raise ValidationError({'detail': str(e)})
+
+    response = streaming_response(request, export, content_type=export.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+    return response
+
+
+def _bool_param(request, name):
+    return request.query_params.get(name, '').lower() in ('1', 'true')
+
+
+def _date_param(request, name):
+    """Read a YYYY-MM-DD query param, answering 400 when malformed"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be a date, YYYY-MM-DD.'})
+
+
+def _int_param(request, name, default=None, maximum=None):
+    """Read a non-negative integer query param, answering 400 when malformed or above `maximum`"""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an integer.'})
+    if value < 0:
+        raise ValidationError({name: 'Must not be negative.'})
+    if maximum is not None and value > maximum:
+        raise ValidationError({name: f'Must be at most {maximum}.'})
+    return value
+
+
+async def live_events(request):
+    """
+    Server-sent events stream of score updates and leaderboard changes
+
+    Query param: topics, a comma-separated subset of scores,leaderboard.
+    Needs an ASGI server; each event carries the changed rows, or
+    reload=true when too many changed and the client should refetch.
+    """
+    topics = request.GET.get('topics')
+    topics = topics.split(',') if topics else list(TOPICS)
+    unknown = set(topics) - set(TOPICS)
+    if unknown:
+        return JsonResponse(
+            {'error': f"Unknown topics: {', '.join(sorted(unknown))}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-        top_users = UserStats.objects.all()[:limit]
-        serializer = self.get_serializer(top_users, many=True)
+    subscription = broadcaster.subscribe(topics)
 
-        # Add position to each user
-        ranked_data = []
-        for index, user_data in enumerate(serializer.data, start=1):
-            user_data['position'] = index
-            ranked_data.append(user_data)
+    async def stream():
+        try:
+            yield b'retry: 5000\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b': ping\n\n'
+                    continue
+                if message is None:
+                    # Too slow to keep up, the client reconnects and refetches
+                    yield b'event: reset\ndata: {}\n\n'
+                    return
+                yield message
+        finally:
+            broadcaster.unsubscribe(subscription)
 
-        return Response(ranked_data)
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,22 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from core.testing import QueryBudgetMixin
+
+from .models import Jogo, Palpite
+
+
+class PalpiteQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_palpites_list_runs_constant_queries(self):
+        user = User.objects.create_user('ana', 'ana@example.com', 'secret')
+        self.client.force_login(user)
+
+        for count in (2, 20):
+            for _ in range(count):
+                jogo = Jogo.objects.create(time1='Flamengo', time2='Palmeiras')
+                Palpite.objects.create(usuario=user, jogo=jogo, palpite='Flamengo')
+
+            with self.subTest(rows=count):
+                # session + user + palpites page
+                self.assertQueryBudget('/api/palpites/', 3)
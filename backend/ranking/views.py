@@ -33,7 +33,7 @@ class PalpiteViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         if self.request.user.is_authenticated:
-            return Palpite.objects.filter(usuario=self.request.user)
+            return Palpite.objects.filter(usuario=self.request.user).select_related('usuario', 'jogo')
         return Palpite.objects.none()
 
     def perform_create(self, serializer):
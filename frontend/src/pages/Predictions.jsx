@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react'
 import { motion, AnimatePresence } from 'framer-motion'
 import { useNavigate } from 'react-router-dom'
-import { matchesService, statsService } from '../services/api'
+import { matchesService } from '../services/api'
 
 /**
  * Predictions Page - Football Predictions and Ranking System
@@ -29,11 +29,11 @@ const Predictions = () => {
       setLoading(true)
       setError(null)
 
-      // Fetch matches and ranking in parallel
-      const [matchesResponse, rankingResponse] = await Promise.all([
-        matchesService.getUpcomingMatches(),
-        statsService.getRanking(100) // Fetch more data for pagination
-      ])
+      // Fetch matches and ranking in one request
+      const {
+        upcoming: matchesResponse,
+        ranking: rankingResponse
+      } = await matchesService.getBootstrap({ limit: 100 }) // More ranking data for pagination
 
       // Transform matches data to match frontend format
       const formattedMatches = matchesResponse.map(match => ({
@@ -193,6 +193,15 @@ class MatchesService extends ApiService {
     return this.get('/matches/upcoming/');
   }
 
+  /**
+   * Buscar de uma vez o que o app mostra ao abrir: times, próximas
+   * partidas, ranking (top `limit`) e, com `email`, os palpites do usuário
+   */
+  async getBootstrap({ email, limit = 10 } = {}) {
+    const params = email ? { email, limit } : { limit };
+    return this.get('/bootstrap/', params);
+  }
+
   /**
    * Buscar todas as partidas
    */
@@ -213,6 +222,19 @@ class MatchesService extends ApiService {
   async getMatch(id) {
     return this.get(`/matches/${id}/`);
   }
+
+  /**
+   * Receber placares e mudanças no ranking em tempo real (SSE)
+   * onEvent(topic, data) recebe 'scores' ou 'leaderboard'; data.reload
+   * pede para buscar a lista de novo. Retorna o EventSource (chame close()).
+   */
+  subscribeToLiveEvents(onEvent, topics = ['scores', 'leaderboard']) {
+    const source = new EventSource(`${this.baseURL}/events/?topics=${topics.join(',')}`);
+    topics.forEach((topic) => {
+      source.addEventListener(topic, (event) => onEvent(topic, JSON.parse(event.data)));
+    });
+    return source;
+  }
 }
 
 /**
@@ -226,6 +248,14 @@ class PredictionsService extends ApiService {
     return this.post('/predictions/', predictionData);
   }
 
+  /**
+   * Criar vários palpites de uma vez (ex: rodada inteira)
+   * Retorna um resultado por palpite; a resposta pode ser 207 (parcial)
+   */
+  async createPredictions(predictionsData) {
+    return this.post('/predictions/bulk/', predictionsData);
+  }
+
   /**
    * Buscar palpites do usuário
    */